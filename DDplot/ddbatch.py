@@ -0,0 +1,176 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : ddbatch.py
+# Time       ：2026/10/19 11:20
+# Author     ：oWoo
+# Description：Batch DD maps over elements x potentials (replaces batch-run.sh).
+#              LAMMPS (in.disl_generate) still runs one potential at a time, while the
+#              DD maps are rendered in a process pool straight from the cfg frames
+#              (ddplot.read_cfg + the --window map, no atomsk). A folder is skipped when
+#              ddmap.json holds the hash of its current inputs (potential files,
+#              in.disl_generate, <elem>-perf.lmp, lc, ddplot.py), not when a png exists.
+#              cfg frames left in a folder are only reused when cfg.json holds the same hash.
+# Usage:
+#   python ddbatch.py [--elem W Mo] [-j 8] [--lmp "mpiexec.openmpi -np 32 lmp_g++_openmpi"]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shlex
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from ddplot import read_cfg, window_map
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# lattice constants used for the maps, units: Å
+lattice = {'Nb': 3.3, 'Mo': 3.147, 'Ta': 3.301, 'W': 3.165}
+
+
+def read_potential_list(filename):
+    # lines "folder type file" or "folder meam file1 file2"; '#' and empty lines are skipped
+    entries = []
+    with open(filename, 'r') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            words = line.split()
+            entries.append({'folder': words[0], 'type': words[1], 'files': words[2:]})
+    return entries
+
+
+def input_key(path, elem, lc, entry):
+    # sha256 of everything the map depends on
+    h = hashlib.sha256()
+    h.update(json.dumps([elem, lc, entry['type'], entry['files']]).encode())
+    folder = f"{path}/{entry['folder']}"
+    inputs = [f'{HERE}/in.disl_generate', f'{path}/{elem}-perf.lmp', f'{HERE}/ddplot.py']
+    inputs += [os.path.join(folder, name) for name in entry['files']]
+    for filename in inputs:
+        h.update(filename.encode())
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()
+
+
+def cached(folder, key):
+    cache = f'{folder}/ddmap.json'
+    if not (os.path.exists(cache) and os.path.exists(f'{folder}/ddmap.png')):
+        return False
+    with open(cache, 'r') as f:
+        return json.load(f).get('key') == key
+
+
+def frames_key(folder):
+    # hash of the inputs the cfg frames of folder were generated with (cfg.json), or None
+    cache = f'{folder}/cfg.json'
+    if not os.path.exists(cache):
+        return None
+    with open(cache, 'r') as f:
+        return json.load(f).get('key')
+
+
+def remove_frames(folder):
+    for filename in glob.glob(f'{folder}/*.cfg') + glob.glob(f'{folder}/cfg.json'):
+        os.remove(filename)
+
+
+def pick_frames(folder, elem):
+    # base and dislocation frames: the first two <elem><num>.cfg with num % 100 != 0, in numeric order
+    frames = []
+    for filename in glob.glob(f'{folder}/{elem}*.cfg'):
+        m = re.fullmatch(rf'{elem}(\d+)\.cfg', os.path.basename(filename))
+        if m and int(m.group(1)) % 100 != 0:
+            frames.append((int(m.group(1)), filename))
+    frames.sort()
+    if len(frames) < 2:
+        raise FileNotFoundError(f"There is not enough cfg files for {elem} in {folder}")
+    return frames[0][1], frames[1][1]
+
+
+def run_lammps(folder, elem, lc, entry, lmp, key):
+    remove_frames(folder)
+    if entry['type'] == 'meam':
+        files = ['-var', 'file1', entry['files'][0], '-var', 'file2', entry['files'][1]]
+    else:
+        files = ['-var', 'file', entry['files'][0]]
+    cmd = shlex.split(lmp) + ['-var', 'type', entry['type']] + files + \
+        ['-var', 'lc', str(lc), '-var', 'elem', elem, '-in', f'{HERE}/in.disl_generate']
+    with open(f'{folder}/log.lammps', 'w') as log:
+        subprocess.run(cmd, cwd=folder, stdout=log, stderr=subprocess.STDOUT, check=True)
+    with open(f'{folder}/cfg.json', 'w') as f:
+        json.dump({'key': key}, f, indent=1)
+
+
+def render(folder, elem, lc, key, keep_cfg=False):
+    # worker: DD map of one potential folder from its cfg frames
+    file_base, file_disl = pick_frames(folder, elem)
+    base_pos, L = read_cfg(file_base)
+    disl_pos, _ = read_cfg(file_disl)
+    window_map(base_pos, disl_pos, L[2], (L[0] / 2, L[1] / 2), lc, f'{folder}/ddmap.png')
+    with open(f'{folder}/ddmap.json', 'w') as f:
+        json.dump({'key': key, 'base': os.path.basename(file_base), 'disl': os.path.basename(file_disl)}, f, indent=1)
+    if not keep_cfg:
+        remove_frames(folder)
+    return folder
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='DD maps of the screw dislocation core for many potentials.')
+    parser.add_argument('--root', default='/home/jyzhang/lammps/BDT/DDplot/potentials')
+    parser.add_argument('--elem', nargs='+', default=list(lattice), choices=list(lattice))
+    parser.add_argument('-j', '--workers', type=int, default=4, help='DD maps rendered in parallel')
+    parser.add_argument('--lmp', default='mpiexec.openmpi -np 32 lmp_g++_openmpi', help='LAMMPS command')
+    parser.add_argument('--keep-cfg', action='store_true', help='keep the cfg frames after the map is drawn')
+    parser.add_argument('--force', action='store_true', help='ignore ddmap.json')
+    args = parser.parse_args()
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {}
+        for elem in args.elem:
+            lc = lattice[elem]
+            path = f'{args.root}/{elem}'
+            print("==========================")
+            print(f"Processing element: {elem}")
+            print("==========================")
+            for entry in read_potential_list(f'{path}/potential-list.txt'):
+                folder = f"{path}/{entry['folder']}"
+                key = input_key(path, elem, lc, entry)
+                if not args.force and cached(folder, key):
+                    print(f"{folder}/ddmap.png is up to date, skipping this folder.")
+                    continue
+                try:
+                    if frames_key(folder) != key:
+                        raise FileNotFoundError(f"No cfg frames of the current inputs in {folder}")
+                    pick_frames(folder, elem)
+                    print(f"Reusing the cfg frames in {folder}")
+                except FileNotFoundError:
+                    print(f"Processing potential: {entry['folder']}", flush=True)
+                    try:
+                        run_lammps(folder, elem, lc, entry, args.lmp, key)
+                    except subprocess.CalledProcessError:
+                        print(f"LAMMPS failed in {folder}, see {folder}/log.lammps")
+                        failed.append(folder)
+                        continue
+                futures[pool.submit(render, folder, elem, lc, key, args.keep_cfg)] = folder
+
+        for future, folder in futures.items():
+            try:
+                future.result()
+                print(f"Finished processing {folder} ✌️✌️✌️")
+            except Exception as e:
+                print(f"Error: {folder}: {e}")
+                failed.append(folder)
+
+    if failed:
+        print(f"{len(failed)} folders failed:")
+        for folder in failed:
+            print(f"  {folder}")
@@ -6,6 +6,9 @@
 # Time       ：2025/7/7 21:23
 # Author     ：oWoo
 # Description：compute dd
+#              --window: both configurations are cropped to the plotted core window plus a
+#              cutoff skin (cKDTree, periodic along z), the DD vectors are computed only for
+#              the neighbour pairs centred in the window and drawn as one quiver collection.
 # Source     : https://www.ctcms.nist.gov/potentials/atomman/tutorial/4.10_Differential_Displacement_Maps.html
 """
 
@@ -20,10 +23,10 @@ import numpy as np
 # https://matplotlib.org/
 import matplotlib.pyplot as plt
 
-# https://github.com/usnistgov/atomman
-import atomman as am
-import atomman.unitconvert as uc
+# https://scipy.org/
+from scipy.spatial import cKDTree
 
+import argparse
 import sys
 import glob
 import re
@@ -47,16 +50,135 @@ def read_box_half(filename):
     yhalf = (yhi + ylo) / 2
     return xhalf, yhalf
 
-if __name__ == '__main__':
-    if len(sys.argv) != 5:
-        print(f"Usage: python {sys.argv[0]} <file_perf> <file_disl> <lc> <elem>")
-        sys.exit(1)
-    file_base = sys.argv[1]
-    file_disl =  sys.argv[2]
-    lc = float(sys.argv[3])
-    elem = sys.argv[4]
+def read_cfg(filename):
+    """
+    Positions (N,3) and cell lengths (3,) of a LAMMPS "dump cfg" file with
+    mass type xs ys zs (orthogonal cell, origin at 0 as after atomsk).
+    """
+    H = np.zeros((3, 3))
+    with open(filename, 'r') as f:
+        lines = f.read().splitlines()
+    natoms = None
+    entry_count = 3
+    pos = 0
+    for pos, line in enumerate(lines):
+        if line.startswith('Number of particles'):
+            natoms = int(line.split('=')[1])
+        elif line.startswith('H0('):
+            i, j = int(line[3]) - 1, int(line[5]) - 1
+            H[i, j] = float(line.split('=')[1].split()[0])
+        elif line.startswith('entry_count'):
+            entry_count = int(line.split('=')[1])
+        elif line.startswith('auxiliary') or line.startswith('.NO_VELOCITY') or line.startswith('A ='):
+            continue
+        elif natoms is not None and line.strip() and not line.startswith('#'):
+            break
+    # the rest: a mass line and an element line before the atoms of each element
+    rows = [line.split() for line in lines[pos:] if line.strip()]
+    s = np.array([r[:3] for r in rows if len(r) == entry_count], dtype=float)
+    if len(s) != natoms:
+        raise ValueError(f"{filename}: expected {natoms} atoms, found {len(s)}")
+    return s @ H, np.diag(H).copy()
+
+
+def crop_window(pos, xlim, ylim, skin):
+    # indices of the atoms inside the plotted x-y window plus skin (all z)
+    x, y = pos[:, 0], pos[:, 1]
+    return np.flatnonzero((x >= xlim[0] - skin) & (x <= xlim[1] + skin) &
+                          (y >= ylim[0] - skin) & (y <= ylim[1] + skin))
+
+
+def window_dd(base_pos, disl_pos, lz, xlim, ylim, zlim, cutoff, burgers):
+    """
+    Differential displacements of the neighbour pairs (within cutoff in the base
+    configuration, periodic along z with length lz) whose centres are inside xlim,
+    ylim and zlim. Only the atoms of the window plus a cutoff skin are used.
+    The z components are wrapped into [-|b|/2, |b|/2].
+    Returns (atom indices of the crop, pairs (M,2) of crop rows, arrow centres (M,3),
+    dd vectors (M,3)).
+    """
+    rows = crop_window(base_pos, xlim, ylim, cutoff)
+    base = base_pos[rows]
+    disl = disl_pos[rows]
+
+    pts = np.array(base)
+    pts[:, 2] = np.mod(pts[:, 2], lz)
+    pts[:, :2] -= pts[:, :2].min(axis=0)
+    boxsize = np.concatenate([pts[:, :2].max(axis=0) + 2 * cutoff + 1, [lz]])
+    pairs = cKDTree(pts, boxsize=boxsize).query_pairs(cutoff, output_type='ndarray')
+
+    dbase = base[pairs[:, 1]] - base[pairs[:, 0]]
+    dbase[:, 2] -= lz * np.round(dbase[:, 2] / lz)
+    centers = base[pairs[:, 0]] + dbase / 2
+    ddisl = disl[pairs[:, 1]] - disl[pairs[:, 0]]
+    dd = ddisl - dbase
+    dd[:, 2] -= lz * np.round(dd[:, 2] / lz)
+    bz = np.linalg.norm(burgers)
+    dd[:, 2] -= bz * np.round(dd[:, 2] / bz)
+
+    z = centers[:, 2]
+    inside = ((centers[:, 0] >= xlim[0]) & (centers[:, 0] <= xlim[1]) &
+              (centers[:, 1] >= ylim[0]) & (centers[:, 1] <= ylim[1]))
+    inside &= np.mod(z - zlim[0], lz) <= zlim[1] - zlim[0]
+    return rows, pairs[inside], centers[inside], dd[inside]
+
+
+def plot_window(base_pos, rows, pairs, centers, dd, lz, xlim, ylim, zlim, ddmax, figsize=10, atomcmap='gray'):
+    """
+    DD map of the screw component: one arrow per pair, along the pair direction
+    projected on x-y and dd_z/ddmax times the projected pair distance long
+    (as atomman's DifferentialDisplacement.plot), drawn in one quiver call.
+    """
+    base = base_pos[rows]
+    d = base[pairs[:, 1], :2] - base[pairs[:, 0], :2]
+    arrows = d * np.clip(dd[:, 2] / ddmax, -1, 1)[:, None]
+
+    z = np.mod(base[:, 2] - zlim[0], lz)
+    atoms = (z <= zlim[1] - zlim[0]) & (base[:, 0] >= xlim[0]) & (base[:, 0] <= xlim[1]) & \
+            (base[:, 1] >= ylim[0]) & (base[:, 1] <= ylim[1])
+
+    fig, ax = plt.subplots(figsize=(figsize, figsize))
+    ax.scatter(base[atoms, 0], base[atoms, 1], c=z[atoms], cmap=atomcmap, s=400 * figsize / 10,
+               edgecolors='k', zorder=1)
+    ax.quiver(centers[:, 0], centers[:, 1], arrows[:, 0], arrows[:, 1], angles='xy', scale_units='xy',
+              scale=1, pivot='middle', width=0.005, zorder=2)
+    ax.set_xlim(xlim)
+    ax.set_ylim(ylim)
+    ax.set_aspect('equal')
+    return fig
+
+
+def window_map(base_pos, disl_pos, lz, center, lc, output, dpi=600):
+    # --window DD map of the +-2lc core window around center (x, y), saved to output
+    alat = lc
+    burgers = np.array([0.0, 0.0, alat / 2 * np.sqrt(3)])
+    xlim = (center[0] - 2 * lc, center[0] + 2 * lc)
+    ylim = (center[1] - 2 * lc, center[1] + 2 * lc)
+    zlim = (8, alat * 3 ** 0.5 + 8)  # one periodic length along the dislocation line
+    rows, pairs, centers, dd = window_dd(base_pos, disl_pos, lz, xlim, ylim, zlim, 0.9 * alat, burgers)
+    fig = plot_window(base_pos, rows, pairs, centers, dd, lz, xlim, ylim, zlim, np.linalg.norm(burgers) / 2)
+    fig.savefig(output, dpi=dpi)
+    plt.close(fig)
 
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Differential displacement map of a screw dislocation core.')
+    parser.add_argument('file_base')
+    parser.add_argument('file_disl')
+    parser.add_argument('lc', type=float)
+    parser.add_argument('elem')
+    parser.add_argument('--window', action='store_true',
+                        help='neighbours and DD vectors only in the plotted window plus a cutoff skin')
+    args = parser.parse_args()
+    file_base = args.file_base
+    file_disl = args.file_disl
+    lc = args.lc
+    elem = args.elem
+
+    # https://github.com/usnistgov/atomman
+    import atomman as am
+    import atomman.unitconvert as uc
+
     # Load dislocation configurations that were previously constructed using Dislocation class
     base_system = am.load('atom_data', file_base)
     disl_system = am.load('atom_data', file_disl)
@@ -69,6 +191,12 @@ if __name__ == '__main__':
     ylim_l = yhalf - 2 * lc
     ylim_r = yhalf + 2 * lc
 
+    zlim = (8, alat * 3 ** 0.5 + 8)  # Should be one periodic length of the crystal along the dislocation line direction
+
+    if args.window:
+        window_map(base_system.atoms.pos, disl_system.atoms.pos, base_system.box.lz, (xhalf, yhalf), lc, 'ddmap.png')
+        sys.exit(0)
+
     base_neighbors = base_system.neighborlist(cutoff=0.9 * alat)
     disl_neighbors = disl_system.neighborlist(cutoff=0.9 * alat)
 
@@ -88,7 +216,7 @@ if __name__ == '__main__':
 
     params['xlim'] = (xlim_l, xlim_r)  # Plotting limits for the plotting x-axis.  Large as this is along the slip plane
     params['ylim'] = (ylim_l, ylim_r)  # Plotting limits for the plotting y-axis.  Small as this is perpendicular to the slip plane
-    params['zlim'] = (8, alat * 3 ** 0.5 +8)  # Should be one periodic length of the crystal along the dislocation line direction
+    params['zlim'] = zlim
 
     params['atomcmap'] = 'gray'
 
@@ -7,11 +7,26 @@
 # Author     ：oWoo
 # Description：Read crack systems from Excel, rotate cubic stiffness tensor,
 #              compute stiffness (C), compliance (S), and extract a1, a2, p1, p2, q1, q2.
+#              --sweep N: Griffith KIc of every crack plane / crack front pair with Miller
+#              indices up to N, one orientation per class of the 48 cubic symmetry
+#              operations, all computed in one batch. Writes KIc-map-{T}K.txt and a
+#              stereographic map KIc-map-{T}K.png (lowest KIc of each plane).
+#              KIc.txt, KIc-T.txt and the map share one crack frame (system_B: x along the
+#              propagation, y along the plane normal c, z along the front a of the table);
+#              CS-{T}K.txt and apq-{T}K.txt keep the rotation of process().
+#              --material W.json: C(T) and surface energies from the model of materials.py,
+#              so any T can be used; --curve T0 T1 N writes KIc(T) of the crack systems.
 """
+import argparse
+import itertools
+from math import gcd
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from materials import MaterialModel, family
+
 # Voigt notation mappings
 voigt_pairs = {
     0: (0, 0),
@@ -164,57 +179,341 @@ def process(input, output, apq_output, C11, C12, C44):
             f2.write("\n" + "-" * 50 + "\n")
     return S
 
+
+# ------------ batch versions (same as apq.py in Ktest-aniso-eam) ------------
+voigt_index = np.array([[0, 5, 4],
+                        [5, 1, 3],
+                        [4, 3, 2]])
+voigt_i = np.array([voigt_pairs[I][0] for I in range(6)])
+voigt_j = np.array([voigt_pairs[I][1] for I in range(6)])
+
+
+def cubic_stiffness(C11, C12, C44):
+    return np.array([
+        [C11, C12, C12, 0, 0, 0],
+        [C12, C11, C12, 0, 0, 0],
+        [C12, C12, C11, 0, 0, 0],
+        [0, 0, 0, C44, 0, 0],
+        [0, 0, 0, 0, C44, 0],
+        [0, 0, 0, 0, 0, C44]
+    ])
+
+
+def rotation_matrices(a, b, c):
+    # a, b, c: (N,3) directions of the x, y, z axes of the crack frame
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    c = c / np.linalg.norm(c, axis=1, keepdims=True)
+    return np.stack([a, b, c], axis=2)      # columns are a, b, c, same as np.vstack([a, b, c]).T
+
+
+def rotate_stiffness_batch(C_voigt, R):
+    # C_voigt: (6,6), R: (N,3,3) -> (N,6,6)
+    C_tensor = C_voigt[voigt_index[:, :, None, None], voigt_index[None, None, :, :]]
+    # contract one index at a time, (N*81*3) work per step instead of the full 8-index einsum
+    C_rot = np.einsum('nld,abcd->nabcl', R, C_tensor)
+    C_rot = np.einsum('nkc,nabcl->nabkl', R, C_rot)
+    C_rot = np.einsum('njb,nabkl->najkl', R, C_rot)
+    C_rot = np.einsum('nia,najkl->nijkl', R, C_rot)
+    i, j = voigt_i[:, None], voigt_j[:, None]
+    k, l = voigt_i[None, :], voigt_j[None, :]
+    return 0.25 * (C_rot[:, i, j, k, l] + C_rot[:, j, i, k, l] +
+                   C_rot[:, i, j, l, k] + C_rot[:, j, i, l, k])
+
+
+def griffith_B(S):
+    # S: (..., 6, 6) rotated compliance (1/GPa) -> B, with G = K^2 * B (plane strain along axis 3)
+    S11, S22, S33 = S[..., 0, 0], S[..., 1, 1], S[..., 2, 2]
+    S12, S13, S23 = S[..., 0, 1], S[..., 0, 2], S[..., 1, 2]
+    S66, S26 = S[..., 5, 5], S[..., 1, 5]
+
+    b11 = (S11*S33 - S13**2) / S33
+    b22 = (S22*S33 - S23**2) / S33
+    b12 = (S12*S33 - S13*S23) / S33
+    b66 = (S66*S33 - S26**2) / S33
+    return np.sqrt(b11*b22/2 * (np.sqrt(b22/b11) + (2*b12+b66)/2/b11))
+
+
+def griffith_K(B, gamma):
+    # gamma: J/m2 -> KIc, unit: MPa/sqrt(m)
+    return np.sqrt(2 * gamma / B) / (10**1.5)
+
+
+# ------------ orientation sweep ------------
+def cubic_operations():
+    # the 48 signed permutation matrices of the cubic point group m-3m
+    ops = []
+    for perm in itertools.permutations(range(3)):
+        for signs in itertools.product([1, -1], repeat=3):
+            g = np.zeros((3, 3), dtype=int)
+            g[range(3), perm] = signs
+            ops.append(g)
+    return np.array(ops)
+
+
+def primitive(v):
+    # smallest integer vector along v
+    g = gcd(gcd(abs(int(v[0])), abs(int(v[1]))), abs(int(v[2])))
+    return tuple(int(x) // g for x in v) if g else tuple(int(x) for x in v)
+
+
+def enumerate_systems(max_index):
+    """
+    Crack plane normal n (hkl) and crack front f [uvw], both primitive with indices
+    up to max_index and n.f = 0, one pair per class of equivalent orientations:
+    (n, f) ~ (g n, g f) for the 48 cubic operations g, and ~ (n, -f). The pair kept is
+    the lexicographically largest of its class, so n = (h, k, l) with h >= k >= l >= 0.
+    Returns (n, f), both (N,3) int arrays.
+    """
+    m = max_index
+    grid = np.array(list(itertools.product(range(-m, m + 1), repeat=3)))
+    grid = grid[np.any(grid != 0, axis=1)]
+    grid = grid[np.array([primitive(v) == tuple(v) for v in grid])]
+    # one plane per family is enough: the operations then only act through its stabiliser
+    planes = grid[(grid[:, 0] >= grid[:, 1]) & (grid[:, 1] >= grid[:, 2]) & (grid[:, 2] >= 0)]
+
+    dot = planes @ grid.T
+    i, j = np.nonzero(dot == 0)
+    n, f = planes[i], grid[j]
+
+    canon, keys = canonical(n, f, m)
+    _, first = np.unique(keys, return_index=True)
+    canon = canon[np.sort(first)]
+    return canon[:, :3], canon[:, 3:]
+
+
+def canonical(n, f, m):
+    # lexicographically largest (g n, +-g f) of each crack system, (N,6), and its integer key
+    ops = cubic_operations()
+    gn = np.einsum('gij,nj->ngi', ops, n)
+    gf = np.einsum('gij,nj->ngi', ops, f)
+    variants = np.concatenate([np.concatenate([gn, gf], axis=2),
+                               np.concatenate([gn, -gf], axis=2)], axis=1)      # (N, 96, 6)
+    base = 2 * m + 1
+    keys = ((variants + m) * base**np.arange(5, -1, -1)).sum(axis=2)
+    best = keys.argmax(axis=1)
+    return variants[np.arange(len(keys)), best], keys[np.arange(len(keys)), best]
+
+
+def read_gammas(input, T):
+    # surface energy of each plane family in the crack systems table, unit: J/m2
+    df = pd.read_excel(input)
+    gammas = {}
+    for surface, gamma in zip(df['crack surface'], df[f'{T}K (J/m2)']):
+        if not pd.isna(gamma):
+            gammas.setdefault(family(surface), float(gamma))
+    return gammas
+
+
+def system_B(C_voigt, n, f):
+    """
+    B of crack systems (n, f), both (N,3). Crack frame: x along the crack propagation
+    direction d = f x n, y along the plane normal n and z along the crack front f.
+    The rows of the rotation are d, n, f (crystal -> crack frame), as rotate_stiffness_batch
+    takes it. Used for the crack systems table too (table_systems), so KIc.txt, KIc-T.txt
+    and the sweep give the same B for the same system.
+    """
+    d = np.cross(f, n)
+    R = rotation_matrices(d.astype(float), n.astype(float), f.astype(float)).transpose(0, 2, 1)
+    return griffith_B(np.linalg.inv(rotate_stiffness_batch(C_voigt, R)))
+
+
+def table_systems(df):
+    # crack plane normal (c) and crack front (a) of the crack systems table, (N,3) int arrays
+    return df[['c1', 'c2', 'c3']].to_numpy(dtype=int), df[['a1', 'a2', 'a3']].to_numpy(dtype=int)
+
+
+def symmetry_spread(C_voigt, n, f):
+    # largest relative spread of B over the 48 cubic images of each crack system, ~1e-15 if B is invariant
+    ops = cubic_operations()
+    gn = np.einsum('gij,nj->ngi', ops, n).reshape(-1, 3)
+    gf = np.einsum('gij,nj->ngi', ops, f).reshape(-1, 3)
+    B = system_B(C_voigt, gn, gf).reshape(len(n), len(ops))
+    return np.max((B.max(axis=1) - B.min(axis=1)) / B.mean(axis=1))
+
+
+def sweep(C11, C12, C44, max_index, gammas, gamma_default=None, tol=1e-10, table=None):
+    """
+    Griffith KIc of all crack systems up to max_index. Crack frame: x along the crack
+    propagation direction d = f x n, y along the plane normal n and z along the crack
+    front f, so that G = K^2 * B with plane strain along the front.
+    gammas: {plane family: J/m2}; planes not in it take gamma_default (NaN KIc if None).
+    One system is kept per class of equivalent orientations, so B has to be the same
+    for all the cubic images of a system (checked up to tol).
+    table: (n, f) of the crack systems table; those within max_index have to get the
+    same B from the sweep as from system_B directly (checked up to tol).
+    Returns dict of (N,) arrays: n, f, d, B, K_norm = KIc / sqrt(gamma), gamma, KIc.
+    """
+    n, f = enumerate_systems(max_index)
+    d = np.array([primitive(v) for v in np.cross(f, n)])
+    C = cubic_stiffness(C11, C12, C44)
+    B = system_B(C, n, f)
+    spread = symmetry_spread(C, n, f)
+    if spread > tol:
+        raise ValueError(f"B differs by {spread:.2e} between equivalent crack systems")
+    if table is not None:
+        diff = table_mismatch(C, n, f, B, *table, max_index)
+        if diff > tol:
+            raise ValueError(f"B of the crack systems table differs by {diff:.2e} from the sweep")
+
+    default = np.nan if gamma_default is None else gamma_default
+    gamma = np.array([gammas.get(family(v), default) for v in n])
+    return {'n': n, 'f': f, 'd': d, 'B': B,
+            'K_norm': griffith_K(B, 1.0), 'gamma': gamma, 'KIc': griffith_K(B, gamma)}
+
+
+def table_mismatch(C_voigt, n, f, B, n_table, f_table, max_index):
+    # largest relative difference of B between the table systems and their sweep entries
+    inside = np.max(np.abs(np.concatenate([n_table, f_table], axis=1)), axis=1) <= max_index
+    if not np.any(inside):
+        return 0.0
+    n_table, f_table = n_table[inside], f_table[inside]
+    _, keys = canonical(n, f, max_index)
+    _, table_keys = canonical(np.array([primitive(v) for v in n_table]),
+                              np.array([primitive(v) for v in f_table]), max_index)
+    where = {k: i for i, k in enumerate(keys)}
+    B_sweep = B[[where[k] for k in table_keys]]
+    B_table = system_B(C_voigt, n_table, f_table)
+    return np.max(np.abs(B_sweep - B_table) / B_table)
+
+
+def miller_str(v, brackets='()'):
+    return brackets[0] + ' '.join(str(x) for x in v) + brackets[1]
+
+
+def write_map(res, output):
+    order = np.lexsort((res['K_norm'], res['KIc']))     # NaN KIc last
+    with open(output, 'w') as f:
+        f.write('# plane front direction B(1/GPa) KIc/sqrt(gamma) gamma(J/m2) KIc(MPa*m^1/2)\n')
+        for i in order:
+            f.write(f"{miller_str(res['n'][i]):>12s} {miller_str(res['f'][i], '[]'):>12s} "
+                    f"{miller_str(res['d'][i], '[]'):>14s} {res['B'][i]:.6e} {res['K_norm'][i]:.6f} "
+                    f"{res['gamma'][i]:.5f} {res['KIc'][i]:.6f}\n")
+
+
+def plot_map(res, output, T):
+    # stereographic projection of the plane normals in the standard triangle [001]-[101]-[111],
+    # coloured by the lowest KIc over the crack fronts of each plane
+    value = res['KIc'] if np.any(np.isfinite(res['KIc'])) else res['K_norm']
+    label = 'min KIc (MPa*m^1/2)' if value is res['KIc'] else 'min KIc/sqrt(gamma)'
+    planes, inverse = np.unique(res['n'], axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    lowest = np.full(len(planes), np.inf)
+    np.minimum.at(lowest, inverse, np.where(np.isfinite(value), value, np.inf))
+
+    v = planes / np.linalg.norm(planes, axis=1, keepdims=True)     # h >= k >= l: z = h, x = k, y = l
+    X = v[:, 1] / (1 + v[:, 0])
+    Y = v[:, 2] / (1 + v[:, 0])
+    ok = np.isfinite(lowest)
+
+    fig, ax = plt.subplots(figsize=(6, 5))
+    s = np.linspace(0, 1, 50)
+    for edge in ([s, 0 * s, 1 + 0 * s], [1 + 0 * s, s, 1 + 0 * s], [s[::-1], s[::-1], 1 + 0 * s]):
+        x, y, z = np.array(edge) / np.linalg.norm(edge, axis=0)    # [001] -> [101] -> [111] -> [001]
+        ax.plot(x / (1 + z), y / (1 + z), 'k-', lw=0.8)
+    sc = ax.scatter(X[ok], Y[ok], c=lowest[ok], cmap='viridis', s=40)
+    for p, x, y in zip(planes[ok], X[ok], Y[ok]):
+        if max(p) <= 2:
+            ax.annotate(miller_str(p), (x, y), fontsize=7, xytext=(3, 3), textcoords='offset points')
+    fig.colorbar(sc, label=label)
+    ax.set_aspect('equal')
+    ax.set_title(f'Griffith KIc, T = {T} K')
+    ax.axis('off')
+    fig.savefig(output, dpi=200, bbox_inches='tight')
+    plt.close(fig)
+
+
+def kic_curve(input, model, temps, output):
+    # KIc(T) of the crack systems table with C(T) and gamma(T) from the material model
+    df = pd.read_excel(input)
+    n_table, f_table = table_systems(df)
+    planes = [family(v) for v in df['crack surface']]
+    C11, C12, C44 = model.elastic(temps)
+    K = np.zeros((len(temps), len(df)))
+    for n, T in enumerate(temps):
+        B = system_B(cubic_stiffness(C11[n], C12[n], C44[n]), n_table, f_table)
+        K[n] = griffith_K(B, np.array([model.gamma(f, T) for f in planes]))
+    header = 'T(K) ' + ' '.join(f'system{int(i)}' for i in df['No.'])
+    np.savetxt(output, np.column_stack([temps, K]), header=header, fmt='%.6f')
+    return K
+
+
+# elastic constants of W, unit: GPa
+elastic = {
+    0: (473.742, 192.266, 148.021),
+    300: (482.307622629103, 241.5676203231, 175.734071829075),
+    1600: (372.238833127147, 207.969015952456, 151.257713350696),
+}
+
+
 if __name__ == '__main__':
-    T_arrays = [0, 300, 1600]
-    
-    filepath = '/home/jyzhang/lammps/BDT/KG'
+    parser = argparse.ArgumentParser(description='Griffith KIc of the crack systems, or of all systems up to a Miller index.')
+    parser.add_argument('--filepath', default='/home/jyzhang/lammps/BDT/KG')
+    parser.add_argument('-T', type=float, nargs='+', default=[0, 300, 1600],
+                        help='temperatures; without --material only 0, 300 and 1600')
+    parser.add_argument('--sweep', type=int, metavar='MAX_INDEX', help='map all crack plane / front pairs up to this Miller index')
+    parser.add_argument('--gamma', type=float, help='surface energy (J/m2) of the planes not in the crack systems table')
+    parser.add_argument('--material', help='json model of materials.py: C(T) and surface energies at any T')
+    parser.add_argument('--curve', type=float, nargs=3, metavar=('T0', 'T1', 'N'), help='KIc(T) of the crack systems (--material)')
+    parser.add_argument('--extrapolate', action='store_true', help='use --material outside its fitted temperatures')
+    args = parser.parse_args()
+
+    T_arrays = args.T
+    filepath = args.filepath
     input = f'{filepath}/crack systems.xlsx'
+    model = MaterialModel.load(args.material) if args.material else None
+    if model is not None:
+        model.extrapolate = args.extrapolate
+
+    if args.curve:
+        if model is None:
+            parser.error('--curve needs --material')
+        temps = np.linspace(args.curve[0], args.curve[1], int(args.curve[2]))
+        try:
+            kic_curve(input, model, temps, f'{filepath}/KIc-T.txt')
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"KIc(T) of the crack systems written to {filepath}/KIc-T.txt")
+        raise SystemExit
 
     for T in T_arrays:
-        if T == 0:
-            C11 = 473.742   # unit: GPa
-            C12 = 192.266
-            C44 = 148.021
-        elif T == 300:
-            C11 = 482.307622629103
-            C12 = 241.5676203231
-            C44 = 175.734071829075
+        model_gammas = None
+        if model is not None:
+            try:
+                C11, C12, C44 = (float(v) for v in model.elastic(T))
+                if args.sweep:
+                    model_gammas = model.gammas(T)
+                else:
+                    model_gammas = np.array([model.gamma(f, T) for f in pd.read_excel(input)['crack surface']])
+            except ValueError as e:
+                parser.error(str(e))
+        elif T in elastic:
+            C11, C12, C44 = elastic[int(T)]
         else:
-            C11 = 372.238833127147
-            C12 = 207.969015952456
-            C44 = 151.257713350696            
+            parser.error(f'no elastic constants at {T:g}K, use --material')
+        T = f'{T:g}'
+
+        if args.sweep:
+            gammas = model_gammas if model is not None else read_gammas(input, T)
+            res = sweep(C11, C12, C44, args.sweep, gammas, args.gamma, table=table_systems(pd.read_excel(input)))
+            write_map(res, f'{filepath}/KIc-map-{T}K.txt')
+            plot_map(res, f'{filepath}/KIc-map-{T}K.png', T)
+            print(f"T = {T}K: {len(res['B'])} crack systems, {len(np.unique(res['n'], axis=0))} planes")
+            continue
 
         output = f'{filepath}/CS-{T}K.txt'
         apq_output = f'{filepath}/apq-{T}K.txt'
-        S = process(input, output, apq_output, C11, C12, C44)
-    
-        # compute theoretical fracture toughness according to the Griffith concept
-        gammas = list(pd.read_excel(input)[f'{T}K (J/m2)'])    # unit: J/m2
-    
-        K_I = []
-        for i in range(len(gammas)):
-            Si = S[i]
-            G_I = 2 * gammas[i]
-    
-            S11 = Si[0,0]   # unit: 1/GPa
-            S22 = Si[1,1]
-            S33 = Si[2,2]
-            S13 = Si[0,2]
-            S12 = Si[0,1]
-            S23 = Si[1,2]
-            S66 = Si[5,5]
-            S26 = Si[1,5]
-    
-            b11 = (S11*S33 - S13**2) / S33
-            b22 = (S22*S33 - S23**2) / S33
-            b12 = (S12*S33 - S13*S23) / S33
-            b66 = (S66*S33 - S26**2) / S33
-            B = np.sqrt(b11*b22/2 * (np.sqrt(b22/b11) + (2*b12+b66)/2/b11))
-    
-            Ki = np.sqrt(G_I/B) / (10**1.5)     # unit: MPa/sqrt(m)
-            K_I.append(Ki)
+        process(input, output, apq_output, C11, C12, C44)
+
+        # compute theoretical fracture toughness according to the Griffith concept,
+        # with B in the crack frame of system_B, the same as the sweep
+        if model is not None:
+            gammas = model_gammas
+        else:
+            gammas = np.array(pd.read_excel(input)[f'{T}K (J/m2)'])    # unit: J/m2
+        B = system_B(cubic_stiffness(C11, C12, C44), *table_systems(pd.read_excel(input)))
+        K_I = griffith_K(B, gammas)           # unit: MPa/sqrt(m)
         with open(f"{filepath}/KIc.txt", 'a') as f:
             f.write(f"Temp = {T}K\n")
             np.savetxt(f, K_I)
             f.write("\n" + "=" * 60 + "\n\n")
-
@@ -0,0 +1,147 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : born_converge.py
+# Time       ：2026/10/19 09:40
+# Author     ：oWoo
+# Description：Runs in.metal through the LAMMPS python module, with the production
+#              run split in chunks. After every chunk the new lines of vir-T.out and
+#              born-T.out are reduced (compute_born.py) and the run stops once the
+#              block-averaged standard errors of C11, C12 and C44 are all below tol,
+#              or at max_steps. The rest of in.metal (its own C11, C12, C44) runs as
+#              before, and the matrices are written as by compute_born.py.
+# Usage:
+#   python born_converge.py <T> [--tol 0.5] [--max-steps 1000000] [--check 10000]
+#   mpirun -np 8 python born_converge.py <T> ...
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from compute_born import born_windows, chunk_stats, merge_stats, block_estimate, write_matrices, bar2Pa
+
+RUN_BEGIN = '# ---- production run ----'
+RUN_END = '# ---- end of production run ----'
+
+
+def split_input(filename):
+    # in.metal before and after the production run
+    with open(filename) as f:
+        text = f.read()
+    head, rest = text.split(RUN_BEGIN, 1)
+    _, tail = rest.split(RUN_END, 1)
+    return head, tail
+
+
+class StressMonitor:
+    """
+    Statistics of vir-{T}.out per Born output window, read incrementally while
+    LAMMPS is appending to the files (fix ave/time flushes every output).
+    """
+    def __init__(self, T):
+        self.vir = f'vir-{T}.out'
+        self.born = f'born-{T}.out'
+        self.offset = 0             # bytes of vir-T.out already read
+        self.last_step = -1
+        self.steps = np.zeros(0)
+        self.windows = np.zeros((0, 21))
+        self.stats = (np.zeros(0), np.zeros((0, 6)), np.zeros((0, 6, 6)))
+
+    def update(self):
+        self.steps, self.windows = born_windows(self.born)
+        grow = len(self.steps) - len(self.stats[0])
+        if grow > 0:
+            self.stats = tuple(np.concatenate([s, np.zeros((grow,) + s.shape[1:])]) for s in self.stats)
+
+        with open(self.vir, 'rb') as f:
+            f.seek(self.offset)
+            buf = f.read()
+        end = buf.rfind(b'\n') + 1          # complete lines only
+        self.offset += end
+        lines = [line for line in buf[:end].split(b'\n') if line.strip() and not line.startswith(b'#')]
+        if not lines:
+            return
+        vir = np.array(b' '.join(lines).split(), dtype=float).reshape(len(lines), -1)
+        vir = vir[vir[:, 0] > self.last_step]        # a step written again at the start of a run
+        if len(vir) == 0:
+            return
+        self.last_step = vir[-1, 0]
+        stre_voigt = -vir[:, [1, 2, 3, 6, 5, 4]] * bar2Pa   # -> Pa
+        group = np.minimum(np.searchsorted(self.steps, vir[:, 0], side='left'), len(self.steps) - 1)
+        self.stats = merge_stats(self.stats, chunk_stats(stre_voigt, group, len(self.steps)))
+
+
+def converge(lmp, T, head, tail, tol, max_steps, check, nblocks):
+    """
+    Production run of in.metal in chunks of check steps until the errors of C11, C12
+    and C44 (GPa) are below tol. Returns (steps run, block_estimate(...)).
+    """
+    rank = lmp.extract_setting('world_rank')
+    if lmp.extract_setting('world_size') > 1:
+        from mpi4py import MPI
+        bcast = MPI.COMM_WORLD.bcast
+    else:
+        bcast = lambda obj, root=0: obj
+
+    lmp.commands_string(head)
+    N = int(lmp.extract_variable('Nat'))
+    vol = lmp.extract_variable('Myvol')     # m^3
+    monitor = StressMonitor(T)
+
+    done = 0
+    est = None
+    while done < max_steps:
+        n = min(check, max_steps - done)
+        lmp.command(f'run {n} post no' if done == 0 else f'run {n} pre no post no')
+        done += n
+
+        stop = False
+        if rank == 0:
+            monitor.update()
+            est = block_estimate(monitor.windows, monitor.stats, N, vol, T, nblocks)
+            Cc, eCc = est[5] * 10**-9, est[6] * 10**-9
+            stop = len(monitor.steps) >= nblocks and bool(np.all(eCc < tol))
+            print("step {:d}: C11 = {:f} ± {:f}; C12 = {:f} ± {:f}; C44 = {:f} ± {:f}".format(
+                done, Cc[0], eCc[0], Cc[1], eCc[1], Cc[2], eCc[2]), flush=True)
+        if bcast(stop, root=0):
+            break
+
+    lmp.commands_string(tail)
+    return done, est
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Born/fluctuation elastic constants, run until converged.')
+    parser.add_argument('T', type=int)
+    parser.add_argument('--tol', type=float, default=0.5, help='target standard error of C11, C12 and C44, units: GPa')
+    parser.add_argument('--max-steps', type=int, default=1000000, help='longest production run')
+    parser.add_argument('--check', type=int, default=10000, help='steps between convergence checks, a multiple of nthermo')
+    parser.add_argument('--nthermo', type=int, default=1000, help='Born output interval of in.metal')
+    parser.add_argument('--blocks', type=int, default=10, help='number of blocks for the error bars')
+    parser.add_argument('--input', default='in.metal')
+    args = parser.parse_args()
+
+    if args.check % args.nthermo:
+        sys.exit(f"Error: --check ({args.check}) must be a multiple of nthermo ({args.nthermo})")
+
+    from lammps import lammps
+    lmp = lammps(cmdargs=['-log', f'log-{args.T}.lammps', '-var', 'T', str(args.T),
+                          '-var', 'nthermo', str(args.nthermo), '-var', 'nsteps', str(args.max_steps)])
+    head, tail = split_input(args.input)
+    steps, est = converge(lmp, args.T, head, tail, args.tol, args.max_steps, args.check, args.blocks)
+
+    if lmp.extract_setting('world_rank') == 0:
+        CB, Cs, Ct, C, eC, Cc, eCc, nsamples = est
+        write_matrices(args.T, CB, Cs, Ct, C, eC)
+        Cc, eCc = Cc * 10**-9, eCc * 10**-9
+        converged = np.all(eCc < args.tol)
+        print(f"T = {args.T} K: {steps} steps ({nsamples} stress samples), "
+              f"{'converged' if converged else 'NOT converged'} to {args.tol} GPa")
+        print("C11 = {:f} ± {:f}; C12 = {:f} ± {:f}; C44 = {:f} ± {:f}".format(
+            Cc[0], eCc[0], Cc[1], eCc[1], Cc[2], eCc[2]))
+        with open('converge.txt', 'a') as f:
+            f.write(f"{args.T} {steps} {Cc[0]:.6f} {eCc[0]:.6f} {Cc[1]:.6f} {eCc[1]:.6f} "
+                    f"{Cc[2]:.6f} {eCc[2]:.6f} {int(converged)}\n")
+    lmp.close()
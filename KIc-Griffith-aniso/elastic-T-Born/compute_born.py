@@ -1,7 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import pandas as pd
+
+kb = 1.380649 * 10**-23  # J/K
+eV2J = 1.602176634e-19
+bar2Pa = 100000
 
 def reduce_Born(Cf):
     C = np.zeros((6,6), dtype=np.float64)
@@ -72,41 +81,172 @@ def write_matrix(C, filename):
             )
     return
 
-def main():
+def read_volumes(filename='vol.txt'):
+    # "T vol(m^3)" lines printed by in.metal; the last run of each T wins
+    vols = {}
+    with open(filename) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2:
+                vols[int(float(parts[0]))] = float(parts[1])
+    return vols
 
-    N = 6750
-    vol = 1.10850187557644e-25  # m^3
-    T = 300  # K
-    kb = 1.380649 * 10**-23  # J/K
-    kbT = T*kb  # J
-    eV2J = 1.602176634e-19 
-    bar2Pa = 100000
 
-    born = np.loadtxt(f'born-{T}.out')
-    stre = np.loadtxt(f'vir-{T}.out')
-    stre[:, 1:] = -stre[:, 1:]*bar2Pa  # -> Pa
-    stre_voigt = stre[:, [1, 2, 3, 6, 5, 4]]
-    try:
-        mean_born = np.mean(born[:, 1:], axis=0)
-    except IndexError:
-        mean_born = born[1:]
+def read_natoms(filename='check.data'):
+    # number of atoms from the header of a write_data file
+    with open(filename) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2 and parts[1] == 'atoms':
+                return int(parts[0])
+    raise ValueError(f"No atom count in {filename}")
+
+
+def merge_stats(a, b):
+    # merge (count, mean, co-moment) of two sample sets (Chan et al.), element-wise over leading axes
+    n_a, mean_a, M2_a = a
+    n_b, mean_b, M2_b = b
+    n = n_a + n_b
+    w = np.divide(n_b, n, out=np.zeros(np.shape(n)), where=n > 0)
+    delta = mean_b - mean_a
+    mean = mean_a + delta * w[..., None]
+    M2 = M2_a + M2_b + delta[..., :, None] * delta[..., None, :] * (n_a * w)[..., None, None]
+    return n, mean, M2
+
+
+def chunk_stats(x, group, ngroups):
+    # (count, mean, co-moment) of the rows of x per group; group is sorted, as the steps are
+    n = np.bincount(group, minlength=ngroups).astype(float)
+    mean = np.zeros((ngroups, x.shape[1]))
+    M2 = np.zeros((ngroups, x.shape[1], x.shape[1]))
+    present, starts = np.unique(group, return_index=True)
+    mean[present] = np.add.reduceat(x, starts, axis=0) / n[present, None]
+    dx = x - mean[group]
+    M2[present] = np.add.reduceat(dx[:, :, None] * dx[:, None, :], starts, axis=0)
+    return n, mean, M2
 
-    CB = eV2J/vol*reduce_Born(mean_born)  # -> J/m^3=Pa
-    Cs = vol/kbT*np.cov(stre_voigt.T)
+
+def born_windows(filename):
+    """
+    fix ave/time ... ave running writes the running average of c_born every nthermo
+    steps; the average of each output window is k*A_k - (k-1)*A_(k-1).
+    Returns (steps (W,), window means (W,21)).
+    """
+    born = np.atleast_2d(np.loadtxt(filename))
+    steps, A = born[:, 0], born[:, 1:]
+    k = np.arange(1, len(A) + 1)[:, None]
+    windows = k * A
+    windows[1:] -= (k[:-1] * A[:-1])
+    return steps, windows
+
+
+def stress_stats(filename, steps, chunksize=200000):
+    """
+    Single pass over vir-{T}.out in chunks: count, mean and co-moment of the six
+    Voigt stresses (Pa) in each Born output window (step_(k-1), step_k].
+    """
+    ngroups = len(steps)
+    stats = (np.zeros(ngroups), np.zeros((ngroups, 6)), np.zeros((ngroups, 6, 6)))
+    for chunk in pd.read_csv(filename, sep=r'\s+', comment='#', header=None, chunksize=chunksize):
+        vir = chunk.to_numpy(dtype=float)
+        stre_voigt = -vir[:, [1, 2, 3, 6, 5, 4]] * bar2Pa   # -> Pa
+        group = np.minimum(np.searchsorted(steps, vir[:, 0], side='left'), ngroups - 1)
+        stats = merge_stats(stats, chunk_stats(stre_voigt, group, ngroups))
+    return stats
+
+
+def elastic_constants(born, stats, N, vol, T):
+    # C = <C^b> - V/kT cov(sigma) + NkT/V delta, from the Born average and the stress statistics of one block
+    kbT = T*kb  # J
+    n, _, M2 = stats
+    CB = eV2J/vol*reduce_Born(born)  # -> J/m^3=Pa
+    Cs = vol/kbT*M2/(n - 1)
     Ct = N*kbT/vol * compute_delta()
-    C = CB - Cs + Ct
+    return CB, Cs, Ct, CB - Cs + Ct
+
+
+def cubic(C):
+    # C11, C12, C44 of (..., 6, 6) matrices, averaged over the equivalent components
+    C11 = (C[..., 0, 0] + C[..., 1, 1] + C[..., 2, 2]) / 3
+    C12 = (C[..., 0, 1] + C[..., 0, 2] + C[..., 1, 2]) / 3
+    C44 = (C[..., 3, 3] + C[..., 4, 4] + C[..., 5, 5]) / 3
+    return np.stack([C11, C12, C44], axis=-1)
+
+
+def merge_windows(stats, rows):
+    # (count, mean, co-moment) of the windows in rows taken together
+    merged = (np.zeros(()), np.zeros(6), np.zeros((6, 6)))
+    for w in rows:
+        merged = merge_stats(merged, tuple(s[w] for s in stats))
+    return merged
+
+
+def block_estimate(windows, stats, N, vol, T, nblocks=10):
+    """
+    Elastic constants from all Born windows and the stress statistics of each, and their
+    standard errors from block averaging: consecutive windows are merged into nblocks
+    blocks, error = std over the blocks / sqrt(nblocks).
+    Returns (CB, Cs, Ct, C, eC, (C11, C12, C44), errors of (C11, C12, C44), count).
+    """
+    total = merge_windows(stats, range(len(windows)))
+    CB, Cs, Ct, C = elastic_constants(windows.mean(axis=0), total, N, vol, T)
+
+    blocks = [b for b in np.array_split(np.arange(len(windows)), min(nblocks, len(windows))) if b.size]
+    C_blocks = np.array([elastic_constants(windows[b].mean(axis=0), merge_windows(stats, b), N, vol, T)[3]
+                         for b in blocks])
+    if len(C_blocks) > 1:
+        eC = C_blocks.std(axis=0, ddof=1) / np.sqrt(len(C_blocks))
+        e_cubic = cubic(C_blocks).std(axis=0, ddof=1) / np.sqrt(len(C_blocks))
+    else:
+        eC = np.full((6, 6), np.nan)
+        e_cubic = np.full(3, np.nan)
+    return CB, Cs, Ct, C, eC, cubic(C), e_cubic, int(total[0])
+
+
+def write_matrices(T, CB, Cs, Ct, C, eC):
     write_matrix(CB, f'born_matrixi-{T}.out')
     write_matrix(Cs, f'stre_matrix-{T}.out')
     write_matrix(Ct, f'temp_matrix-{T}.out')
     write_matrix(C, f'full_matrix-{T}.out')
-    C11 = np.mean([C[0,0], C[1,1], C[2,2]]) * 10**-9
-    C12 = np.mean([C[0,1], C[0,2], C[1,2]]) * 10**-9
-    C44 = np.mean([C[3,3], C[4,4], C[5,5]]) * 10**-9
-    eC11 = np.std([C[0,0], C[1,1], C[2,2]]) * 10**-9
-    eC12 = np.std([C[0,1], C[0,2], C[1,2]]) * 10**-9
-    eC44 = np.std([C[3,3], C[4,4], C[5,5]]) * 10**-9
-    print(C*10**-9)
-    print("C11 = {:f} ± {:f}; C12 = {:f} ± {:f}; C44 = {:f} ± {:f}".format(C11, eC11, C12, eC12, C44, eC44))
+    write_matrix(eC, f'full_matrix_err-{T}.out')
+
+
+def compute(T, N, vol, nblocks=10, chunksize=200000):
+    steps, windows = born_windows(f'born-{T}.out')
+    stats = stress_stats(f'vir-{T}.out', steps, chunksize)
+    CB, Cs, Ct, C, eC, Cc, eCc, nsamples = block_estimate(windows, stats, N, vol, T, nblocks)
+    write_matrices(T, CB, Cs, Ct, C, eC)
+    return C, eC, Cc, eCc, nsamples, min(nblocks, len(windows))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Elastic constants from Born matrix and stress fluctuations.')
+    parser.add_argument('-T', type=int, nargs='+', help='temperatures (default: every T in vol.txt with a vir-T.out)')
+    parser.add_argument('--vol', default='vol.txt', help='"T volume(m^3)" lines printed by in.metal')
+    parser.add_argument('--data', default='check.data', help='write_data file giving the number of atoms')
+    parser.add_argument('--blocks', type=int, default=10, help='number of blocks for the error bars')
+    parser.add_argument('--chunk', type=int, default=200000, help='rows of vir-T.out read at a time')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='temperatures processed in parallel')
+    args = parser.parse_args()
+
+    vols = read_volumes(args.vol)
+    N = read_natoms(args.data)
+    temps = args.T or [T for T in sorted(vols) if os.path.exists(f'vir-{T}.out')]
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(compute, T, N, vols[T], args.blocks, args.chunk) for T in temps]
+        results = [f.result() for f in futures]
+
+    with open('Cij-T.txt', 'w') as f:
+        f.write("# T(K) C11 eC11 C12 eC12 C44 eC44 (GPa), errors from block averaging\n")
+        for T, (C, eC, Cc, eCc, nsamples, nb) in zip(temps, results):
+            Cc, eCc = Cc * 10**-9, eCc * 10**-9
+            print(f"T = {T} K, {nsamples} stress samples, {nb} blocks")
+            print(C*10**-9)
+            print("C11 = {:f} ± {:f}; C12 = {:f} ± {:f}; C44 = {:f} ± {:f}".format(
+                Cc[0], eCc[0], Cc[1], eCc[1], Cc[2], eCc[2]))
+            f.write(f"{T} {Cc[0]:.6f} {eCc[0]:.6f} {Cc[1]:.6f} {eCc[1]:.6f} {Cc[2]:.6f} {eCc[2]:.6f}\n")
 
     return
 
@@ -116,4 +256,3 @@ if __name__ == "__main__":
         main()
     except KeyboardInterrupt:
         raise SystemExit("User interruption.")
-
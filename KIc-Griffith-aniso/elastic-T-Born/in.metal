@@ -13,7 +13,7 @@ units           metal
 variable        nsteps index 100000    # length of run
 variable        nthermo index  1000    # thermo output interval 
 variable        nlat equal 15           # size of box
-variable        T    equal 300  # Temperature in K
+variable        T    index 300  # Temperature in K
 variable        rho  equal 3.1652       # Lattice spacing in A
 
 atom_style      atomic
@@ -104,7 +104,10 @@ thermo_modify line multi
 
 fix     1 all nvt temp $T $T 100
 
+# ---- production run ----
+# born_converge.py runs this part in chunks until C11, C12 and C44 have converged
 run         ${nsteps}
+# ---- end of production run ----
 
 # Compute vector averages
 # Note the indice switch.
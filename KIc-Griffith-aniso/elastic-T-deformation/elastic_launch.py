@@ -0,0 +1,150 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : elastic_launch.py
+# Time       ：2026/10/19 15:10
+# Author     ：oWoo
+# Description：in.elastic with the 12 strained runs at the same time. in.equil writes the
+#              equilibrated restart and the reference stress, then the 12 runs of in.strain
+#              (6 Voigt directions x negative/positive) start from that restart, as separate
+#              jobs (--mode jobs) or as the partitions of one LAMMPS run (--mode partition).
+#              Their averaged stresses are combined here into the 6x6 C matrix with the same
+#              formulas and cfac as displace.mod, and written to Cij-{T}.txt as in.elastic.
+# Usage:
+#   python elastic_launch.py [-T 300 1600] [--np 4] [--mode jobs|partition]
+"""
+import argparse
+import os
+import shlex
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# the 12 strained runs
+runs = [(d, s) for d in range(1, 7) for s in (-1, 1)]
+# f_avp = pxx pyy pzz pxy pxz pyz -> Voigt order pxx pyy pzz pyz pxz pxy
+voigt_stress = [0, 1, 2, 5, 4, 3]
+
+
+def lammps(args, np_, extra, log):
+    # run LAMMPS in the folder of the inputs (potential.mod and param.mod are included from there)
+    cmd = shlex.split(args.mpiexec.format(np=np_)) + shlex.split(args.lmp) + extra + ['-log', log, '-screen', 'none']
+    env = dict(os.environ, OMP_NUM_THREADS='1')
+    proc = subprocess.run(cmd, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)}: exit code {proc.returncode}, see {HERE}/{log}\n{proc.stderr[-2000:]}")
+
+
+def read_line(filename):
+    with open(f'{HERE}/{filename}', 'r') as f:
+        return [float(v) for v in f.read().split()]
+
+
+def strain_name(T, d, s):
+    return f"strain-{T}-{d}{'m' if s < 0 else 'p'}"
+
+
+def equil(args, T):
+    lammps(args, args.np, ['-var', 'temp', str(T), '-var', 'restart', f'restart.equil-{T}',
+                           '-var', 'out', f'equil-{T}.txt', '-in', 'in.equil'], f'log.equil-{T}')
+
+
+def strain_jobs(args, pool, T):
+    futures = [pool.submit(lammps, args, args.np,
+                           ['-var', 'temp', str(T), '-var', 'dir', str(d), '-var', 'sign', str(s),
+                            '-var', 'restart', f'restart.equil-{T}', '-var', 'out', f'{strain_name(T, d, s)}.txt',
+                            '-in', 'in.strain'], f'log.{strain_name(T, d, s)}')
+               for d, s in runs]
+    for future in futures:
+        future.result()
+
+
+def strain_partitions(args, T):
+    # one LAMMPS run, one partition of args.np ranks per strained run; dir/sign/out are world variables
+    wrapper = f'strain-{T}.in'
+    with open(f'{HERE}/{wrapper}', 'w') as f:
+        f.write(f"variable dir world {' '.join(str(d) for d, _ in runs)}\n")
+        f.write(f"variable sign world {' '.join(str(s) for _, s in runs)}\n")
+        f.write(f"variable out world {' '.join(strain_name(T, d, s) + '.txt' for d, s in runs)}\n")
+        f.write(f"variable restart index restart.equil-{T}\n")
+        f.write("include in.strain\n")
+    lammps(args, len(runs) * args.np, ['-partition', f'{len(runs)}x{args.np}', '-var', 'temp', str(T),
+                                       '-in', wrapper], f'log.strain-{T}')
+
+
+def combine(T):
+    """
+    C_ij = -(p_i - p0_i) / (+-up) * cfac for stress component i and strain direction j,
+    averaged over the negative and positive runs (displace.mod), then symmetrised (in.elastic).
+    Returns (up, C 6x6 as computed, C symmetrised).
+    """
+    ref = read_line(f'equil-{T}.txt')
+    up, cfac = ref[1], ref[2]
+    p0 = np.array(ref[6:12])[voigt_stress]
+    C = np.zeros((6, 6))
+    for d, s in runs:
+        _, sign, _, *p = read_line(f'{strain_name(T, d, s)}.txt')
+        p = np.array(p)[voigt_stress]
+        C[:, d - 1] += 0.5 * (-(p - p0) / (sign * up) * cfac)
+    return up, C, 0.5 * (C + C.T)
+
+
+def write_cij(T, up, Call, cunits='GPa'):
+    # same lines as the prints at the end of in.elastic
+    C11 = (Call[0, 0] + Call[1, 1] + Call[2, 2]) / 3.0
+    C12 = (Call[0, 1] + Call[0, 2] + Call[1, 2]) / 3.0
+    C44 = (Call[3, 3] + Call[4, 4] + Call[5, 5]) / 3.0
+    with open(f'{HERE}/Cij-{T}.txt', 'a') as f:
+        f.write("=========================================\n")
+        f.write(f"Temp = {T}K, deformation = {up:.15g}\n\n")
+        for group in ([(0, 0), (1, 1), (2, 2)], [(0, 1), (0, 2), (1, 2)], [(3, 3), (4, 4), (5, 5)],
+                      [(0, 3), (0, 4), (0, 5)], [(1, 3), (1, 4), (1, 5)], [(2, 3), (2, 4), (2, 5)],
+                      [(3, 4), (3, 5), (4, 5)]):
+            for i, j in group:
+                f.write(f"Elastic Constant C{i + 1}{j + 1}all = {Call[i, j]:.15g} {cunits}\n")
+        f.write("-----------------------------------------\n")
+        f.write(f"C11 = {C11:.15g} {cunits}\n")
+        f.write(f"C12 = {C12:.15g} {cunits}\n")
+        f.write(f"C44 = {C44:.15g} {cunits}\n")
+        f.write(f"Bulk Modulus = {(C11 + 2 * C12) / 3.0:.15g} {cunits}\n")
+        f.write(f"Shear Modulus 1 = {C44:.15g} {cunits}\n")
+        f.write(f"Shear Modulus 2 = {(C11 - C12) / 2.0:.15g} {cunits}\n")
+        f.write(f"Poisson Ratio = {1.0 / (1.0 + C11 / C12):.15g}\n")
+    return C11, C12, C44
+
+
+def pipeline(args, pool, T):
+    pool.submit(equil, args, T).result()
+    if args.mode == 'partition':
+        strain_partitions(args, T)
+    else:
+        strain_jobs(args, pool, T)
+    up, _, Call = combine(T)
+    return write_cij(T, up, Call)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Finite-temperature elastic constants with concurrent strained runs.')
+    parser.add_argument('-T', nargs='+', default=['300'], help='temperatures (the temp variable of in.elastic)')
+    parser.add_argument('--np', type=int, default=1, help='MPI ranks per run')
+    parser.add_argument('--cores', type=int, default=os.cpu_count(), help='ranks on the node in total (--mode jobs)')
+    parser.add_argument('--mode', default='jobs', choices=['jobs', 'partition'])
+    parser.add_argument('--mpiexec', default='mpiexec.openmpi -np {np}', help='MPI launcher, {np} is the ranks per run')
+    parser.add_argument('--lmp', default='lmp_g++_openmpi')
+    args = parser.parse_args()
+    # 300.0 -> 300, so the files are Cij-300.txt as in.elastic writes them
+    args.T = [f'{float(T):g}' for T in args.T]
+
+    slots = max(1, args.cores // args.np)
+    with ThreadPoolExecutor(max_workers=slots) as pool, ThreadPoolExecutor(max_workers=len(args.T)) as temps:
+        futures = {T: temps.submit(pipeline, args, pool, T) for T in args.T}
+        for T, future in futures.items():
+            try:
+                C11, C12, C44 = future.result()
+                print(f"T = {T}K: C11 = {C11:.4f}, C12 = {C12:.4f}, C44 = {C44:.4f} GPa (Cij-{T}.txt)")
+            except RuntimeError as e:
+                print(f"Error: T = {T}K: {e}")
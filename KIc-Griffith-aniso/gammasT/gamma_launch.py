@@ -0,0 +1,146 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : gamma_launch.py
+# Time       ：2026/10/19 13:30
+# Author     ：oWoo
+# Description：Surface energy sweep (in.s) over orientation data files x temperatures,
+#              with many small LAMMPS jobs on the node at the same time instead of one
+#              64-rank job after another. Every job runs in its own folder runs/<ori>_<T>
+#              (in.s writes delta.data and prints its result there), and the results are
+#              gathered by this script into gammasT.txt and gammasT.csv, so no two jobs
+#              append to the same file. Finished jobs are not run again as long as
+#              job.json in their folder holds the hash of the same inputs (potential,
+#              data file, in.s, T).
+# Usage:
+#   python gamma_launch.py [--data W_100.lmp W_110.lmp ...] [-T 300 1600] [--np 1] [--cores 64]
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+eVA2_to_Jm2 = 16.02176634
+
+
+def label(data):
+    # orientation label from the data file name: W_100.lmp -> 100
+    stem = os.path.splitext(os.path.basename(data))[0]
+    return stem.rsplit('_', 1)[-1]
+
+
+def job_key(data, T, args):
+    # sha256 of the contents of the potential, the data file and in.s, and of T
+    h = hashlib.sha256(f'{label(data)} {T}'.encode())
+    for filename in (args.pot, data, args.input):
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()
+
+
+def job_inputs(run_dir):
+    # key of the inputs the result in run_dir was computed with, or None
+    if not os.path.exists(f'{run_dir}/job.json'):
+        return None
+    with open(f'{run_dir}/job.json', 'r') as f:
+        return json.load(f).get('key')
+
+
+def read_result(run_dir):
+    # "ori T E0 E1 gamma" line printed by in.s, or None if the job has not finished
+    out = f'{run_dir}/gamma.txt'
+    if not os.path.exists(out):
+        return None
+    with open(out, 'r') as f:
+        lines = [line.split() for line in f if line.strip()]
+    if not lines or len(lines[-1]) < 5:
+        return None
+    ori, T, E0, E1, gamma = lines[-1][:5]
+    return {'ori': ori, 'T': int(float(T)), 'E0': float(E0), 'E1': float(E1), 'gamma': float(gamma)}
+
+
+def run_job(data, T, args):
+    ori = label(data)
+    run_dir = f'{args.runs}/{ori}_{T}'
+    key = job_key(data, T, args)
+    if not args.force and job_inputs(run_dir) == key and read_result(run_dir) is not None:
+        return read_result(run_dir), 'cached'
+    os.makedirs(run_dir, exist_ok=True)
+    for name in ('gamma.txt', 'job.json'):
+        if os.path.exists(f'{run_dir}/{name}'):
+            os.remove(f'{run_dir}/{name}')
+
+    cmd = shlex.split(args.mpiexec.format(np=args.np)) + shlex.split(args.lmp) + [
+        '-var', 'ori', ori, '-var', 'T', str(T),
+        '-var', 'data', os.path.abspath(data), '-var', 'pot', os.path.abspath(args.pot),
+        '-var', 'out', 'gamma.txt', '-in', os.path.abspath(args.input), '-log', 'log.lammps', '-screen', 'none']
+    env = dict(os.environ, OMP_NUM_THREADS='1')
+    proc = subprocess.run(cmd, cwd=run_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    result = read_result(run_dir)
+    if proc.returncode != 0 or result is None:
+        raise RuntimeError(f"{run_dir}: LAMMPS exit code {proc.returncode}, see {run_dir}/log.lammps\n"
+                           f"{proc.stderr[-2000:]}")
+    with open(f'{run_dir}/job.json', 'w') as f:
+        json.dump({'key': key, 'pot': os.path.abspath(args.pot), 'data': os.path.abspath(data)}, f, indent=1)
+    return result, 'done'
+
+
+def write_tables(results, txt, csv_file):
+    results = sorted(results, key=lambda r: (r['ori'], r['T']))
+    with open(txt, 'w') as f:
+        f.write("zori temp(K) E0 E1 Es(eV/A2)\n")
+        for r in results:
+            f.write(f"{r['ori']} {r['T']} {r['E0']:.10g} {r['E1']:.10g} {r['gamma']:.10g}\n")
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ori', 'T(K)', 'E0(eV)', 'E1(eV)', 'Es(eV/A2)', 'Es(J/m2)'])
+        for r in results:
+            writer.writerow([r['ori'], r['T'], r['E0'], r['E1'], r['gamma'], r['gamma'] * eVA2_to_Jm2])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent surface energy runs of in.s.')
+    parser.add_argument('--data', nargs='+', default=[f'{HERE}/W_{ori}.lmp' for ori in (100, 110, 111)],
+                        help='orientation data files, the label is the part after the last "_"')
+    parser.add_argument('-T', type=int, nargs='+', default=[300, 1600])
+    parser.add_argument('--np', type=int, default=1, help='MPI ranks per job')
+    parser.add_argument('--cores', type=int, default=os.cpu_count(), help='ranks on the node in total')
+    parser.add_argument('--mpiexec', default='mpiexec.openmpi -np {np}', help='MPI launcher, {np} is the ranks per job')
+    parser.add_argument('--lmp', default='lmp_g++_openmpi')
+    parser.add_argument('--pot', default=f'{HERE}/w_eam3.fs')
+    parser.add_argument('--input', default=f'{HERE}/in.s')
+    parser.add_argument('--runs', default='runs', help='folder of the job folders')
+    parser.add_argument('--output', default='gammasT.txt')
+    parser.add_argument('--force', action='store_true', help='run finished jobs again')
+    args = parser.parse_args()
+
+    labels = [label(d) for d in args.data]
+    if len(set(labels)) != len(labels):
+        raise SystemExit(f"Error: data files with the same label: {labels}")
+
+    jobs = [(data, T) for data in args.data for T in args.T]
+    slots = max(1, args.cores // args.np)
+    print(f"{len(jobs)} jobs, {slots} at a time with {args.np} ranks each")
+
+    results = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=slots) as pool:
+        futures = {pool.submit(run_job, data, T, args): (data, T) for data, T in jobs}
+        for future, (data, T) in futures.items():
+            try:
+                result, status = future.result()
+                results.append(result)
+                print(f"{label(data)} {T}K: Es = {result['gamma']:.6f} eV/A2 ({status})", flush=True)
+            except RuntimeError as e:
+                print(f"Error: {e}")
+                failed += 1
+
+    write_tables(results, args.output, os.path.splitext(args.output)[0] + '.csv')
+    print(f"{len(results)} results written to {args.output}" + (f", {failed} jobs failed" if failed else ""))
@@ -2,10 +2,14 @@ units       metal
 boundary    p p p
 atom_style  atomic
 
-read_data   W_${ori}.lmp
+variable    data index W_${ori}.lmp      # orientation data file
+variable    pot index w_eam3.fs
+variable    out index gammasT.txt
+
+read_data   ${data}
 
 pair_style  eam/fs
-pair_coeff  * * w_eam3.fs W
+pair_coeff  * * ${pot} W
 
 minimize    1e-15 1e-15 100000 100000
 
@@ -38,5 +42,5 @@ variable    E1 equal ${E11}
 
 variable    gamma equal (${E1}-${E0})/2/(xhi-xlo)/(yhi-ylo)
 
-print       "${ori} $T ${E0} ${E1} ${gamma}" append gammasT.txt screen no
+print       "${ori} $T ${E0} ${E1} ${gamma}" append ${out} screen no
 
@@ -1,5 +1,7 @@
 #!/usr/bin/bash
 
+workers=1    # worker processes per potential (process.py -j)
+
 for dir in */; do
     folder=${dir%/}
     echo $folder
@@ -7,5 +9,5 @@ for dir in */; do
         continue
     fi
 
-    python process.py "$folder" > $folder/proc-log 2>&1 &
+    python process.py "$folder" -j $workers > $folder/proc-log 2>&1 &
 done
@@ -7,6 +7,12 @@ K_final_array=(3) # units:MPa*sqrt(m)
 dK=0.1
 potential="eam-2018--Setyawan-W-Gao-N-Kurtz-R-J--W-Re"
 p_name="WRe_Setyawan_set145.eam.alloy"
+inproc=0    # 1: run the K ramp in-process with kramp.py
+detect=1    # 1: detect critical events online (detect.py) and stop the ramp early
+confirm=2   # later steps that must show the event again before stopping
+adaptive=0  # 1: coarse steps of dK and bisection around Kc with scheduler.py
+resolution=0.01 # dK at which the bisection stops
+warm=0      # 1: start each initial configuration from the nearest temperature already equilibrated (warm_start.py)
 
 for i in ${!index_array[@]}; do
     index=${index_array[$i]}
@@ -18,7 +24,7 @@ for i in ${!index_array[@]}; do
             echo "$index $Temp $K_initial $K_final"
             sbatch --job-name="crack-${index}-${Temp}-2018" \
                    --output="${potential}/log/$index-$Temp-log" \
-                   --export=ALL,Temp=$Temp,index=$index,K_initial=$K_initial,K_final=$K_final,dK=$dK,potential=$potential,p_name=$p_name submit.sh
+                   --export=ALL,Temp=$Temp,index=$index,K_initial=$K_initial,K_final=$K_final,dK=$dK,potential=$potential,p_name=$p_name,inproc=$inproc,detect=$detect,confirm=$confirm,adaptive=$adaptive,resolution=$resolution,warm=$warm submit.sh
         done
     done
 done
@@ -0,0 +1,465 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : campaign.py
+# Time       ：2026/10/19 09:20
+# Author     ：oWoo
+# Description：Campaign manager for the K-tests of batch-run.sh. The campaign is a
+#              dependency graph of tasks kept in a SQLite file:
+#                  init:{potential}:{idx}:{T}            in.crack1-aniso-ini (built once, shared,
+#                                                        and taken from prep_cache.py when cached)
+#                  ramp:{potential}:{idx}:{T}:{Ka}-{Kb}  K-ramp segment with kramp.py
+#                  proc:{potential}                      process.py
+#              Ready tasks are run by a local pool (optionally with a fake LAMMPS
+#              for testing) or submitted to SLURM. Failed tasks are retried, and a
+#              ramp segment restarts from the last step of the record file whose
+#              configuration exists, so an interrupted campaign resumes with `run`.
+# Usage:
+#   python campaign.py plan <db> <potential> <p_name> [--index 1 2 ...] [--temp 300 1600] [--K_final 3] [--dK 0.1] [--segment 1] [--warm]
+#   python campaign.py run <db> [--executor local|slurm|fake] [--workers 4] [--launcher "mpirun -np 16"] [--max-retries 2]
+#   python campaign.py status <db>
+#   python campaign.py retry <db>              # failed tasks back to pending
+"""
+import argparse
+import json
+import os
+import re
+import shlex
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import prep_cache
+import warm_start
+from checkpoint import CheckpointStore, write_frame_dump, write_frame_data
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SLURM_HEADER = """#!/usr/bin/bash
+
+#SBATCH -N 1
+#SBATCH -p tyhcnormal
+#SBATCH --ntasks-per-node=64
+#SBATCH --cpus-per-task=1
+
+ulimit -s unlimited
+ulimit -l unlimited
+
+# load the environment
+module purge
+source /work/home/jyzhang/apprepo/lammps/stable.29Aug2024-intelmpi2021/scripts/env.sh
+export UCX_IB_ADDR_TYPE=ib_global
+export I_MPI_PMI_LIBRARY=/opt/gridview/slurm/lib/libpmi.so
+source /work/home/jyzhang/apprepo/miniconda3/etc/profile.d/conda.sh
+conda activate base
+"""
+
+
+# ------------ state ------------
+class Campaign:
+    """
+    tasks(id, kind, params, deps, state, attempts, job, message, updated);
+    state: pending / running / done / failed.
+    """
+    def __init__(self, db_file):
+        self.db = sqlite3.connect(db_file)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY, kind TEXT, params TEXT, deps TEXT,
+            state TEXT DEFAULT 'pending', attempts INTEGER DEFAULT 0,
+            job TEXT, message TEXT, updated REAL)""")
+        self.db.commit()
+
+    def add(self, task_id, kind, params, deps=()):
+        # a task that is already in the campaign (e.g. a shared init) is kept as it is
+        self.db.execute("INSERT OR IGNORE INTO tasks (id, kind, params, deps, updated) VALUES (?, ?, ?, ?, ?)",
+                        (task_id, kind, json.dumps(params), json.dumps(list(deps)), time.time()))
+        self.db.commit()
+        return task_id
+
+    def add_deps(self, task_id, deps):
+        # more dependencies for a task; a finished task has to run again
+        task = self.task(task_id)
+        new = [d for d in deps if d not in task['deps']]
+        if new:
+            self.set(task_id, deps=json.dumps(task['deps'] + new),
+                     state='pending' if task['state'] == 'done' else task['state'])
+
+    def task(self, task_id):
+        row = self.db.execute("SELECT id, kind, params, deps, state, attempts, job, message FROM tasks WHERE id = ?",
+                              (task_id,)).fetchone()
+        return None if row is None else self._task(row)
+
+    def tasks(self, state=None):
+        sql = "SELECT id, kind, params, deps, state, attempts, job, message FROM tasks"
+        rows = self.db.execute(sql + " WHERE state = ?", (state,)) if state else self.db.execute(sql)
+        return [self._task(row) for row in rows]
+
+    @staticmethod
+    def _task(row):
+        return {'id': row[0], 'kind': row[1], 'params': json.loads(row[2]), 'deps': json.loads(row[3]),
+                'state': row[4], 'attempts': row[5], 'job': row[6], 'message': row[7]}
+
+    def set(self, task_id, **fields):
+        fields['updated'] = time.time()
+        keys = ', '.join(f'{k} = ?' for k in fields)
+        self.db.execute(f"UPDATE tasks SET {keys} WHERE id = ?", (*fields.values(), task_id))
+        self.db.commit()
+
+    def ready(self):
+        done = {t['id'] for t in self.tasks('done')}
+        return [t for t in self.tasks('pending') if all(d in done for d in t['deps'])]
+
+    def counts(self):
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+
+
+def plan(campaign, potential, p_name, indices, temps, K_final, dK, segment, warm=False):
+    # init -> ramp segments -> proc, for every (idx, T); with warm, the inits of an idx
+    # run from the lowest T up, each warm-started from the one before (warm_start.py)
+    last = []
+    edges = np.round(np.append(np.arange(0, K_final, segment), K_final), 6)
+    for idx in indices:
+        init = []
+        for T in sorted(temps) if warm else temps:
+            prev = campaign.add(f'init:{potential}:{idx}:{T}', 'init',
+                                dict(potential=potential, p_name=p_name, idx=idx, T=T, warm=warm), init[-1:])
+            init.append(prev)
+            for Ka, Kb in zip(edges[:-1], edges[1:]):
+                prev = campaign.add(f'ramp:{potential}:{idx}:{T}:{Ka:g}-{Kb:g}', 'ramp',
+                                    dict(potential=potential, p_name=p_name, idx=idx, T=T,
+                                         K_initial=float(Ka), K_final=float(Kb), dK=dK), [prev])
+            last.append(prev)
+    proc = campaign.add(f'proc:{potential}', 'proc', dict(potential=potential), last)
+    campaign.add_deps(proc, last)
+
+
+# ------------ what a task runs ------------
+def ramp_start(potential, idx, T, K_initial):
+    """
+    K to start a ramp segment from: the last step of the record file at or above
+    K_initial whose configuration exists (dump or checkpoint store). Lines after
+    it are dropped from the record. Returns None for a fresh ramp.
+    """
+    record = f'{potential}/log/{idx}-{T}-record'
+    if not os.path.exists(record):
+        return None
+    dump_dir = f'{potential}/dump/{idx}/{T}'
+    store = CheckpointStore(potential, idx, T)
+    with open(record, 'r') as f:
+        lines = f.readlines()
+    keep, start = 1, None
+    for n, line in enumerate(lines[1:], 1):
+        parts = line.split()
+        if not parts or parts[0].startswith('#'):
+            continue
+        step, K = int(parts[0]), float(parts[1])
+        if not (os.path.exists(f'{dump_dir}/W_{idx}_{T}_{step}_eq.data') or store.has(step)):
+            break
+        keep = n + 1
+        if K >= K_initial - 1e-9:
+            start = K
+    if start is None:
+        return None if K_initial == 0 else K_initial
+    with open(record, 'w') as f:
+        f.writelines(lines[:keep])
+    return start
+
+
+def prepare(task, fake=False):
+    """
+    Files a task needs before it starts. Returns the argv to run, or None
+    when the task has nothing left to do.
+    """
+    p = task['params']
+    python = sys.executable
+    if task['kind'] == 'init':
+        potential, idx, T = p['potential'], p['idx'], p['T']
+        if os.path.exists(f'{potential}/config/dynamic/W_{idx}_{T}.data'):
+            return None
+        for d in ('config/static', 'config/dynamic', 'log', 'dump'):
+            os.makedirs(f'{potential}/{d}', exist_ok=True)
+        if not fake and prep_cache.fetch(potential, p['p_name'], idx, T) is not None:
+            return None
+        if fake:
+            return [python, 'campaign.py', 'fake-init', potential, str(idx), str(T)]
+        if p.get('warm') and task['attempts'] == 0 and warm_start.sources(potential, idx, T):
+            # first attempt only: a retry after a failed warm start runs in.crack1-aniso-ini
+            return [python, 'warm_start.py', str(idx), str(T), potential, p['p_name']]
+        return ['lmp_mpi', '-var', 'T', str(T), '-var', 'idx', str(idx), '-var', 'potential', potential,
+                '-var', 'p_name', p['p_name'], '-in', 'in.crack1-aniso-ini']
+
+    if task['kind'] == 'ramp':
+        potential, idx, T = p['potential'], p['idx'], p['T']
+        start = ramp_start(potential, idx, T, p['K_initial'])
+        if start is None:
+            # fresh ramp: step 0 is the equilibrated configuration, as in submit.sh
+            dump_dir = f'{potential}/dump/{idx}/{T}'
+            shutil.rmtree(dump_dir, ignore_errors=True)
+            os.makedirs(dump_dir)
+            shutil.copy(f'{potential}/config/dynamic/W_{idx}_{T}.data', f'{dump_dir}/W_{idx}_{T}_0_eq.data')
+            start = 0
+        if start >= p['K_final'] - 1e-9:
+            return None
+        argv = [python, 'kramp.py', str(idx), str(T), f'{start:g}', f"{p['K_final']:g}", f"{p['dK']:g}",
+                potential, p['p_name']]
+        return argv + ['--mock'] if fake else argv
+
+    if fake:
+        return [python, 'campaign.py', 'fake-proc', p['potential']]
+    return [python, 'process.py', p['potential']]
+
+
+def finish(task, fake=False):
+    # after a task succeeded: a configuration prepared by in.crack1-aniso-ini goes to the
+    # preparation cache (a warm-started one depends on its starting temperature)
+    if task['kind'] != 'init' or fake:
+        return
+    p = task['params']
+    warm = warm_start.warm_record(p['potential'], p['idx'], p['T'])
+    if warm is None or warm[-1] != '1':
+        prep_cache.store(p['potential'], p['p_name'], p['idx'], p['T'], campaign=task['id'])
+
+
+def log_file(task):
+    potential = task['params']['potential']
+    os.makedirs(f'{potential}/campaign', exist_ok=True)
+    name = re.sub(r'[^\w.-]+', '_', task['id'])
+    return f'{potential}/campaign/{name}.log'
+
+
+# ------------ executors ------------
+class LocalExecutor:
+    # pool of worker threads, each running one task process at a time
+    def __init__(self, workers=4, launcher='', fake=False):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.launcher = shlex.split(launcher)
+        self.fake = fake
+        self.jobs = {}
+        self.count = 0
+
+    def submit(self, task, argv):
+        if not self.fake and task['kind'] != 'proc':
+            argv = self.launcher + argv
+        self.count += 1
+        job = f'local-{os.getpid()}-{self.count}'
+        self.jobs[job] = self.pool.submit(self._run, argv, log_file(task))
+        return job
+
+    @staticmethod
+    def _run(argv, log):
+        with open(log, 'a') as f:
+            f.write(f"$ {' '.join(argv)}\n")
+            f.flush()
+            return subprocess.run(argv, cwd=HERE, stdout=f, stderr=subprocess.STDOUT).returncode
+
+    def adopt(self, job):
+        # processes of an earlier manager are gone
+        return False
+
+    def poll(self):
+        # {job: True/False} of the jobs that finished since the last poll
+        finished = {}
+        for job, fut in list(self.jobs.items()):
+            if fut.done():
+                finished[job] = fut.result() == 0
+                del self.jobs[job]
+        return finished
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class SlurmExecutor:
+    # one sbatch job per task, states from sacct
+    failed_states = ('FAILED', 'CANCELLED', 'TIMEOUT', 'OUT_OF_MEMORY', 'NODE_FAIL', 'PREEMPTED', 'BOOT_FAIL', 'DEADLINE')
+
+    def __init__(self, launcher='srun --mpi=pmix_v3'):
+        self.launcher = shlex.split(launcher)
+        self.jobs = set()
+
+    def submit(self, task, argv):
+        if task['kind'] != 'proc':
+            argv = self.launcher + argv
+        log = log_file(task)
+        script = log[:-len('.log')] + '.sh'
+        with open(script, 'w') as f:
+            f.write(SLURM_HEADER)
+            f.write(f"\ncd {shlex.quote(HERE)}\n{' '.join(shlex.quote(a) for a in argv)}\n")
+        out = subprocess.run(['sbatch', '--parsable', f"--job-name={task['id']}", f'--output={os.path.abspath(log)}',
+                              script], capture_output=True, text=True, check=True)
+        job = out.stdout.strip().split(';')[0]
+        self.jobs.add(job)
+        return job
+
+    def adopt(self, job):
+        self.jobs.add(job)
+        return True
+
+    def poll(self):
+        finished = {}
+        for job in list(self.jobs):
+            out = subprocess.run(['sacct', '-j', job, '-X', '--noheader', '--parsable2', '--format=State'],
+                                 capture_output=True, text=True)
+            state = out.stdout.strip().split('\n')[0].split(' ')[0] if out.stdout.strip() else ''
+            if state == 'COMPLETED':
+                finished[job] = True
+            elif state in self.failed_states:
+                finished[job] = False
+            else:
+                continue
+            self.jobs.discard(job)
+        return finished
+
+    def close(self):
+        pass
+
+
+def run(campaign, executor, max_retries=2, interval=30, fake=False):
+    running = {}
+    for task in campaign.tasks('running'):
+        if task['job'] and executor.adopt(task['job']):
+            running[task['job']] = task['id']
+        else:
+            campaign.set(task['id'], state='pending', job=None)
+
+    while True:
+        for job, ok in executor.poll().items():
+            task = campaign.task(running.pop(job))
+            if ok:
+                try:
+                    finish(task, fake)
+                except OSError as e:
+                    print(f"warning {task['id']}: {e}", flush=True)
+                campaign.set(task['id'], state='done', message=None)
+                print(f"done    {task['id']}", flush=True)
+            elif task['attempts'] <= max_retries:
+                campaign.set(task['id'], state='pending', message=f'job {job} failed')
+                print(f"retry   {task['id']} (attempt {task['attempts']} failed)", flush=True)
+            else:
+                campaign.set(task['id'], state='failed', message=f'job {job} failed')
+                print(f"failed  {task['id']}", flush=True)
+
+        ready = campaign.ready()
+        for task in ready:
+            try:
+                argv = prepare(task, fake)
+            except (OSError, ValueError) as e:
+                campaign.set(task['id'], state='failed', message=str(e))
+                print(f"failed  {task['id']}: {e}", flush=True)
+                continue
+            if argv is None:
+                campaign.set(task['id'], state='done', message='nothing to do')
+                print(f"done    {task['id']} (nothing to do)", flush=True)
+                continue
+            job = executor.submit(task, argv)
+            running[job] = task['id']
+            campaign.set(task['id'], state='running', job=job, attempts=task['attempts'] + 1)
+            print(f"start   {task['id']} ({job})", flush=True)
+
+        if not running and not ready:
+            break
+        if not ready:
+            time.sleep(interval)
+    executor.close()
+    blocked = campaign.tasks('pending')
+    if blocked:
+        print(f"{len(blocked)} tasks wait for failed tasks (python campaign.py retry <db>, then run).")
+    return campaign.counts()
+
+
+# ------------ fake LAMMPS for testing the campaign ------------
+def fake_init(potential, idx, T, a=3.165, n=(4, 30, 20), seed=0):
+    # small BCC W slab with the crack types of in.crack1-aniso-ini, written where in.crack1-aniso-ini writes
+    g = np.mgrid[0:n[0], 0:n[1], 0:n[2]].reshape(3, -1).T * a
+    x = np.vstack([g, g + a / 2])
+    x = x + np.random.default_rng(seed + idx * 7919 + T).normal(0, 0.05, x.shape)
+    box = np.array([[0, n[0] * a], [-40, n[1] * a + 40], [-40, n[2] * a + 40]])
+    y0, z0 = box[1].mean(), box[2].mean()
+    types = np.ones(len(x), dtype=np.int32)
+    types[(x[:, 1] < y0) & (x[:, 2] > z0)] = 2
+    types[(x[:, 1] < y0) & (x[:, 2] <= z0)] = 3
+    y, z = x[:, 1], x[:, 2]
+    types[(y < y.min() + 12) | (y > y.max() - 12) | (z < z.min() + 12) | (z > z.max() - 12)] = 4
+    frame = {'timestep': 0, 'boundary': 'pp pp pp', 'box': box, 'ids': np.arange(1, len(x) + 1),
+             'types': types, 'masses': np.full(len(x), 183.84), 'x': x, 'v': np.zeros_like(x)}
+    write_frame_data(f'{potential}/config/static/W_{idx}_ini.data', frame, ntypes=4)
+    write_frame_dump(f'{potential}/config/dynamic/W_{idx}_{T}.data', frame)
+
+    apq = f'{potential}/p_func/apq.txt'
+    if not os.path.exists(apq):
+        os.makedirs(f'{potential}/p_func', exist_ok=True)
+        block = ("a1 = 0.000000 + 1.050000j\na2 = 0.000000 + 0.950000j\np1 = -0.002000 + 0.000000j\n"
+                 "p2 = -0.002000 + 0.000000j\nq1 = 0.000000 + -0.004000j\nq2 = 0.000000 + -0.004000j\n")
+        text = ('-' * 30 + '\n').join(f'System {i}:\n{block}' for i in range(1, 8))
+        with open(apq + '.tmp', 'w') as f:
+            f.write(text)
+        os.replace(apq + '.tmp', apq)
+
+
+def fake_proc(potential):
+    for record in sorted(os.listdir(f'{potential}/log')):
+        if record.endswith('-record'):
+            with open(f'{potential}/log/{record}', 'r') as f:
+                print(record, sum(1 for line in f) - 1, 'steps')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Campaign manager for the K-tests.')
+    sub = parser.add_subparsers(dest='action', required=True)
+    p_plan = sub.add_parser('plan', help='add the tasks of a potential to the campaign')
+    p_plan.add_argument('db')
+    p_plan.add_argument('potential')
+    p_plan.add_argument('p_name')
+    p_plan.add_argument('--index', type=int, nargs='+', default=list(range(1, 8)))
+    p_plan.add_argument('--temp', type=int, nargs='+', default=[300, 1600])
+    p_plan.add_argument('--K_final', type=float, default=3, help='units: MPa*m^1/2')
+    p_plan.add_argument('--dK', type=float, default=0.1, help='units: MPa*m^1/2')
+    p_plan.add_argument('--segment', type=float, default=1, help='K range of one ramp task')
+    p_plan.add_argument('--warm', action='store_true', help='warm-start each T from the T below (warm_start.py)')
+    p_run = sub.add_parser('run', help='run the campaign until every task is done or failed')
+    p_run.add_argument('db')
+    p_run.add_argument('--executor', default='local', choices=['local', 'slurm', 'fake'])
+    p_run.add_argument('--workers', type=int, default=4, help='tasks at a time (local/fake)')
+    p_run.add_argument('--launcher', default=None, help='MPI launcher of LAMMPS and kramp.py')
+    p_run.add_argument('--max-retries', type=int, default=2)
+    p_run.add_argument('--interval', type=float, default=None, help='seconds between polls')
+    for name in ('status', 'retry'):
+        sub.add_parser(name).add_argument('db')
+    for name, n in (('fake-init', 3), ('fake-proc', 1)):
+        p = sub.add_parser(name)
+        p.add_argument('args', nargs=n)
+    args = parser.parse_args()
+
+    if args.action == 'fake-init':
+        fake_init(args.args[0], int(args.args[1]), int(args.args[2]))
+        sys.exit(0)
+    if args.action == 'fake-proc':
+        fake_proc(args.args[0])
+        sys.exit(0)
+
+    db = os.path.abspath(args.db)
+    os.chdir(HERE)      # potentials are relative to the scripts, as in batch-run.sh
+    campaign = Campaign(db)
+    if args.action == 'plan':
+        plan(campaign, args.potential, args.p_name, args.index, args.temp, args.K_final, args.dK, args.segment,
+             args.warm)
+    elif args.action == 'run':
+        if args.executor == 'slurm':
+            executor = SlurmExecutor(args.launcher or 'srun --mpi=pmix_v3')
+        else:
+            executor = LocalExecutor(args.workers, args.launcher or '', fake=args.executor == 'fake')
+        interval = args.interval if args.interval is not None else (60 if args.executor == 'slurm' else 1)
+        run(campaign, executor, args.max_retries, interval, fake=args.executor == 'fake')
+    elif args.action == 'retry':
+        for task in campaign.tasks('failed'):
+            campaign.set(task['id'], state='pending', attempts=0)
+    for task in campaign.tasks():
+        if task['state'] == 'failed':
+            print(f"failed  {task['id']}: {task['message']}")
+    print(' '.join(f'{k}: {v}' for k, v in sorted(campaign.counts().items())))
@@ -0,0 +1,184 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : checkpoint.py
+# Time       ：2026/10/18 16:05
+# Author     ：oWoo
+# Description：Compressed binary store of K-ramp configurations, keyed by
+#              (potential, crack system, T, step). Step 0 is stored in full, every
+#              other step as positions relative to step 0, so any step is read
+#              with two small files. Steps can be exported to LAMMPS read_data
+#              or write_dump format on demand.
+# Usage:
+#   python checkpoint.py import <potential> <index> <T> [--dtype float32] [--remove]
+#   python checkpoint.py export <potential> <index> <T> <step> <output> [--format data|dump]
+"""
+import argparse
+import glob
+import os
+import re
+
+import numpy as np
+
+from lmpio import read_dump, dump_column, write_data
+
+
+# ------------ frames: dict(timestep, boundary, box, ids, types, masses, x, v) ------------
+def read_frame(filename):
+    # write_dump ... custom id type mass x y z vx vy vz modify sort id
+    dump = read_dump(filename)
+    return {
+        'timestep': dump['timestep'],
+        'boundary': dump['boundary'],
+        'box': dump['box'],
+        'ids': dump_column(dump, 'id').astype(np.int64),
+        'types': dump_column(dump, 'type').astype(np.int32),
+        'masses': dump_column(dump, 'mass'),
+        'x': dump_column(dump, 'x', 'y', 'z'),
+        'v': dump_column(dump, 'vx', 'vy', 'vz'),
+    }
+
+
+def write_frame_dump(filename, frame):
+    with open(filename, 'w') as f:
+        f.write(f"ITEM: TIMESTEP\n{frame['timestep']}\n")
+        f.write(f"ITEM: NUMBER OF ATOMS\n{len(frame['ids'])}\n")
+        f.write(f"ITEM: BOX BOUNDS {frame['boundary']}\n")
+        for lo, hi in frame['box']:
+            f.write(f"{lo:.16g} {hi:.16g}\n")
+        f.write("ITEM: ATOMS id type mass x y z vx vy vz\n")
+        table = np.column_stack([frame['ids'], frame['types'], frame['masses'], frame['x'], frame['v']])
+        np.savetxt(f, table, fmt=['%d', '%d'] + ['%.16g'] * 7)
+
+
+def write_frame_data(filename, frame, ntypes=None):
+    # LAMMPS read_data format, atom_style atomic
+    types = frame['types']
+    masses = {int(t): frame['masses'][np.argmax(types == t)] for t in np.unique(types)}
+    ids = frame['ids']
+    write_data(filename, frame['box'],
+               np.column_stack([ids, types, frame['x']]),
+               masses=masses,
+               velocities=np.column_stack([ids, frame['v']]),
+               ntypes=ntypes,
+               title=f"LAMMPS data file via checkpoint.py, timestep = {frame['timestep']}")
+
+
+class CheckpointStore:
+    """
+    {potential}/ckpt/{idx}/{T}/step-{step}.npz
+    step 0 holds ids, types, masses and full float64 positions; step k holds
+    x - x0 and v in the store dtype (float32 by default) plus its own box.
+    """
+    def __init__(self, potential, idx, T, dtype='float32'):
+        self.dir = f'{potential}/ckpt/{idx}/{T}'
+        self.dtype = np.dtype(dtype)
+        self._base = None
+
+    def path(self, step):
+        return f'{self.dir}/step-{int(step):05d}.npz'
+
+    def has(self, step):
+        return os.path.exists(self.path(step))
+
+    def steps(self):
+        names = glob.glob(f'{self.dir}/step-*.npz')
+        return sorted(int(re.search(r'step-(\d+)\.npz$', n).group(1)) for n in names)
+
+    def base(self):
+        if self._base is None:
+            if not self.has(0):
+                raise FileNotFoundError(self.path(0))
+            with np.load(self.path(0)) as f:
+                self._base = {k: f[k] for k in f.files}
+        return self._base
+
+    def _save(self, step, **arrays):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = self.path(step) + '.tmp.npz'
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, self.path(step))
+
+    def put(self, step, frame):
+        order = np.argsort(frame['ids'], kind='stable')
+        ids = frame['ids'][order]
+        x = np.asarray(frame['x'], dtype=float)[order]
+        v = np.asarray(frame['v'], dtype=float)[order]
+        meta = dict(timestep=frame['timestep'], boundary=np.array(frame['boundary']), box=frame['box'])
+        if step == 0:
+            self._save(0, ids=ids, types=frame['types'][order], masses=frame['masses'][order],
+                       x=x, v=v.astype(self.dtype), **meta)
+            self._base = None
+            return
+        base = self.base()
+        if not np.array_equal(base['ids'], ids):
+            raise ValueError(f"Atom ids of step {step} do not match step 0.")
+        # velocities are not correlated with step 0, only the positions are delta-encoded
+        self._save(step, dx=(x - base['x']).astype(self.dtype), v=v.astype(self.dtype), **meta)
+
+    def get(self, step):
+        base = self.base()
+        if step == 0:
+            rec = base
+            x = base['x'].copy()
+        else:
+            if not self.has(step):
+                raise FileNotFoundError(self.path(step))
+            with np.load(self.path(step)) as f:
+                rec = {k: f[k] for k in f.files}
+            x = base['x'] + rec['dx']
+        return {
+            'timestep': int(rec['timestep']),
+            'boundary': str(rec['boundary']),
+            'box': np.array(rec['box']),
+            'ids': base['ids'],
+            'types': base['types'],
+            'masses': base['masses'],
+            'x': x,
+            'v': rec['v'].astype(float),
+        }
+
+    def import_dump(self, step, filename, remove=False):
+        self.put(step, read_frame(filename))
+        if remove:
+            os.remove(filename)
+
+    def export_data(self, step, filename):
+        write_frame_data(filename, self.get(step))
+
+    def export_dump(self, step, filename):
+        write_frame_dump(filename, self.get(step))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Binary checkpoint store of K-ramp configurations.')
+    sub = parser.add_subparsers(dest='action', required=True)
+    p_imp = sub.add_parser('import', help='import W_{idx}_{T}_{step}_eq.data dumps into the store')
+    p_exp = sub.add_parser('export', help='write one step as a LAMMPS data or dump file')
+    for p in (p_imp, p_exp):
+        p.add_argument('potential')
+        p.add_argument('index', type=int)
+        p.add_argument('T', type=int)
+    p_imp.add_argument('--dtype', default='float32', choices=['float32', 'float64'])
+    p_imp.add_argument('--remove', action='store_true', help='delete the text dumps (except step 0) once stored')
+    p_exp.add_argument('step', type=int)
+    p_exp.add_argument('output')
+    p_exp.add_argument('--format', default='data', choices=['data', 'dump'])
+    args = parser.parse_args()
+
+    if args.action == 'import':
+        store = CheckpointStore(args.potential, args.index, args.T, args.dtype)
+        dump_dir = f'{args.potential}/dump/{args.index}/{args.T}'
+        files = glob.glob(f'{dump_dir}/W_{args.index}_{args.T}_*_eq.data')
+        steps = sorted(int(re.search(r'_(\d+)_eq\.data$', n).group(1)) for n in files)
+        for step in steps:
+            store.import_dump(step, f'{dump_dir}/W_{args.index}_{args.T}_{step}_eq.data',
+                              remove=args.remove and step != 0)
+        print(f"Imported {len(steps)} steps into {store.dir}")
+    else:
+        store = CheckpointStore(args.potential, args.index, args.T)
+        if args.format == 'data':
+            store.export_data(args.step, args.output)
+        else:
+            store.export_dump(args.step, args.output)
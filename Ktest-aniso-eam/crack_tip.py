@@ -0,0 +1,196 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : crack_tip.py
+# Time       ：2026/10/18 21:10
+# Author     ：oWoo
+# Description：Crack-tip tracker without OVITO. Surface atoms are found from
+#              coordination numbers (cKDTree) in a window around the tip of the
+#              previous frame, instead of an alpha-shape surface of the whole cell.
+#              crack_length = tip - (min y + 12), the same reference as pre_l in
+#              process.py, so the cleavage criterion l - pre_l > 2 is unchanged.
+#              EmissionPrefilter is a centrosymmetry check of the tip region against
+#              step 0, used to skip DXA on frames without new defects.
+# Usage:
+#   python crack_tip.py W_1_300_1_eq.data W_1_300_2_eq.data ...
+"""
+import sys
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from kfield import match_ids
+
+
+def periodic_tree(x, Lx, pad):
+    """
+    cKDTree of positions x, periodic along x only: y and z are padded by more
+    than pad so that no periodic image is closer than pad there.
+    Returns (tree, shifted positions).
+    """
+    pts = np.array(x, dtype=float)
+    pts[:, 0] = np.mod(pts[:, 0], Lx)
+    pts[pts[:, 0] >= Lx, 0] -= Lx
+    pts[:, 1:] -= pts[:, 1:].min(axis=0)
+    boxsize = np.concatenate([[Lx], pts[:, 1:].max(axis=0) + 2 * pad + 1])
+    return cKDTree(pts, boxsize=boxsize), pts
+
+
+def coordination(x, types, Lx, cutoff):
+    """
+    Neighbour count of every atom within cutoff, periodic along x only.
+    Pairs of type 2 and 3 are not counted (neigh_modify exclude group upper lower).
+    """
+    tree, _ = periodic_tree(x, Lx, cutoff)
+    pairs = tree.query_pairs(cutoff, output_type='ndarray')
+    t = types[pairs]
+    pairs = pairs[~(((t[:, 0] == 2) & (t[:, 1] == 3)) | ((t[:, 0] == 3) & (t[:, 1] == 2)))]
+    return np.bincount(pairs.ravel(), minlength=len(x))
+
+
+def centrosymmetry(x, rows, Lx, k=8, skin=6.0):
+    """
+    Centrosymmetry parameter of the atoms x[rows] from their k nearest
+    neighbours (sum of the k/2 smallest |r_i + r_j|^2 over the neighbour
+    pairs, as compute centro/atom), periodic along x. Only the atoms within
+    skin of the bounding box of rows are put in the tree.
+    """
+    rows = np.asarray(rows)
+    if rows.size == 0:
+        return np.zeros(0)
+    lo = x[rows, 1:].min(axis=0) - skin
+    hi = x[rows, 1:].max(axis=0) + skin
+    sub = np.flatnonzero(np.all((x[:, 1:] >= lo) & (x[:, 1:] <= hi), axis=1))
+    tree, pts = periodic_tree(x[sub], Lx, skin)
+    pos = pts[np.searchsorted(sub, rows)]
+    _, nb = tree.query(pos, k + 1)
+    d = pts[nb[:, 1:]] - pos[:, None, :]
+    d[..., 0] -= Lx * np.round(d[..., 0] / Lx)
+    iu, ju = np.triu_indices(k, 1)
+    q = np.sum((d[:, iu] + d[:, ju])**2, axis=-1)
+    q.sort(axis=1)
+    return q[:, :k // 2].sum(axis=1)
+
+
+class EmissionPrefilter:
+    """
+    Cheap check before DXA. Counts the fully coordinated atoms within radius Å
+    of the crack tip (inside the 12 Å buffer) whose centrosymmetry parameter
+    exceeds the threshold, minus the same count for these atoms in the
+    reference (step 0) frame. The threshold is csp_min or twice the 99.9%
+    quantile of the reference, whichever is larger, so it follows the thermal
+    noise at T. Frames whose indicator stays below n_min are taken as
+    dislocation free. Defaults are for W: k=14 takes both the 1st and 2nd
+    shells, which thermal noise mixes in BCC; surface atoms (fewer than
+    cn_surface neighbours) are left out as in CrackTipTracker.
+    """
+    def __init__(self, reference, radius=50.0, csp_min=4.0, n_min=5, cutoff=3.8, cn_surface=13, k=14,
+                 buffer=12.0):
+        self.reference = reference
+        self.radius = radius
+        self.csp_min = csp_min
+        self.n_min = n_min
+        self.cutoff = cutoff
+        self.cn_surface = cn_surface
+        self.k = k
+        self.buffer = buffer
+
+    def indicator(self, frame, tip):
+        x = frame['x']
+        types = frame['types']
+        y, z = x[:, 1], x[:, 2]
+        z_c = frame['box'][2].mean()
+        Lx = frame['box'][0, 1] - frame['box'][0, 0]
+        r2 = (y - tip)**2 + (z - z_c)**2
+        region = ((r2 <= self.radius**2) & (types != 4) &
+                  (y >= y.min() + self.buffer) & (y <= y.max() - self.buffer) &
+                  (z >= z.min() + self.buffer) & (z <= z.max() - self.buffer))
+        sub = np.flatnonzero(region | (r2 <= (self.radius + self.cutoff)**2))
+        cn = coordination(x[sub], types[sub], Lx, self.cutoff)
+        rows = sub[region[sub] & (cn >= self.cn_surface)]
+
+        ref = self.reference
+        ref_rows = match_ids(ref['ids'], frame['ids'][rows])
+        ref_Lx = ref['box'][0, 1] - ref['box'][0, 0]
+        csp_ref = centrosymmetry(ref['x'], ref_rows, ref_Lx, self.k)
+        if csp_ref.size == 0:
+            return 0
+        threshold = max(self.csp_min, 2 * np.quantile(csp_ref, 0.999))
+        n_now = np.count_nonzero(centrosymmetry(x, rows, Lx, self.k) > threshold)
+        return int(n_now - np.count_nonzero(csp_ref > threshold))
+
+    def passes(self, frame, tip):
+        return self.indicator(frame, tip) >= self.n_min
+
+
+class CrackTipTracker:
+    """
+    Tip of the crack along +y on the plane z = (zlo+zhi)/2, frame after frame.
+    Atoms with fewer than cn_surface neighbours within cutoff are surface atoms
+    (defaults for BCC W: 14 neighbours up to the 2nd shell, cutoff between the
+    2nd and 3rd shells). The tip is the largest y of the surface atoms inside
+    the 12 Å boundary buffer and within +-window Å of the previous tip and of
+    the crack plane; the window is doubled while the tip sits on its edge.
+    """
+    def __init__(self, window=30.0, cutoff=3.8, cn_surface=13, buffer=12.0):
+        self.window = window
+        self.cutoff = cutoff
+        self.cn_surface = cn_surface
+        self.buffer = buffer
+        self.tip = None         # y of the tip in the previous frame
+        self.widened = 0        # number of times the window had to be widened
+
+    def update(self, frame):
+        """
+        frame: dict with box (3,2), types and x (see checkpoint.read_frame).
+        Returns dict(tip, crack_length, surface_count, window).
+        """
+        x = frame['x']
+        types = frame['types']
+        y, z = x[:, 1], x[:, 2]
+        y_lo, y_hi = y.min() + self.buffer, y.max() - self.buffer
+        z_lo, z_hi = z.min() + self.buffer, z.max() - self.buffer
+        z_c = frame['box'][2].mean()
+        y_c = frame['box'][1].mean() if self.tip is None else self.tip
+        Lx = frame['box'][0, 1] - frame['box'][0, 0]
+
+        w = self.window
+        while True:
+            full = w >= max(y_hi - y_lo, z_hi - z_lo)
+            core = ((y >= max(y_lo, y_c - w)) & (y <= min(y_hi, y_c + w)) &
+                    (z >= max(z_lo, z_c - w)) & (z <= min(z_hi, z_c + w)))
+            skin = ((np.abs(y - y_c) <= w + self.cutoff) & (np.abs(z - z_c) <= w + self.cutoff))
+            sub = np.flatnonzero(skin | core)
+            cn = coordination(x[sub], types[sub], Lx, self.cutoff)
+            surf = sub[core[sub] & (cn < self.cn_surface)]
+
+            if surf.size:
+                n = surf[np.argmax(y[surf])]
+                tip = y[n]
+                # tip on the right edge of a window that does not reach the buffer: it may be further
+                if full or tip < min(y_hi, y_c + w) - self.cutoff:
+                    break
+            elif full:
+                tip = y_lo
+                break
+            w *= 2
+            self.widened += 1
+
+        self.tip = tip
+        return {
+            'tip': tip,
+            'crack_length': tip - y_lo,
+            'surface_count': int(surf.size),
+            'window': w,
+        }
+
+
+if __name__ == '__main__':
+    from checkpoint import read_frame
+
+    tracker = CrackTipTracker()
+    print('file tip crack-length surface-atoms')
+    for filename in sys.argv[1:]:
+        res = tracker.update(read_frame(filename))
+        print(f"{filename} {res['tip']:.5f} {res['crack_length']:.5f} {res['surface_count']}")
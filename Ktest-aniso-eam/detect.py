@@ -0,0 +1,164 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : detect.py
+# Time       ：2026/10/18 22:40
+# Author     ：oWoo
+# Description：Online critical-event detection, run after every relax of the K ramp.
+#              Cleavage comes from the crack-tip tracker (l - pre_l > 2, as process.py),
+#              dislocation emission from DXA (process.count_dislocation), run only on
+#              the frames that pass the centrosymmetry prefilter. The event is written
+#              to the record file as "# event ..."; the ramp is ended once it has been
+#              found again on `confirm` more steps. An event missing from a later step
+#              is cleared ("# cleared ...") and the search starts again.
+#              process.py still gives the final Kc from the stored frames.
+# Usage:
+#   python detect.py <index> <T> <step> <potential> [--confirm 2] [--reset] [--no-dxa]
+#   exit code 10: stop the ramp
+"""
+import argparse
+import json
+import os
+import sys
+
+from checkpoint import CheckpointStore, read_frame
+from crack_tip import CrackTipTracker, EmissionPrefilter
+
+STOP = 10
+
+
+def load_step(potential, idx, T, step):
+    # relaxed configuration of a step: text dump, or the checkpoint store
+    dumpfile = f'{potential}/dump/{idx}/{T}/W_{idx}_{T}_{step}_eq.data'
+    if os.path.exists(dumpfile):
+        return read_frame(dumpfile)
+    return CheckpointStore(potential, idx, T).get(step)
+
+
+def dislocation_count(frame):
+    # DXA of process.py on the frame in memory; OVITO is only imported for frames that pass the prefilter
+    from process import count_dislocation
+    return count_dislocation(frame)
+
+
+def frame_event(frame, crack_length, tip, prefilter, dxa=False):
+    """
+    Critical event of a relaxed frame, same order as process.py: dislocation emission
+    first, then cleavage. Emission needs the prefilter, and DXA dislocations with dxa.
+    """
+    ly = frame['box'][1, 1] - frame['box'][1, 0]
+    pre_l = ly / 2 - 40 - 12
+    if prefilter.passes(frame, tip) and (not dxa or dislocation_count(frame) > 0):
+        return 'disl-emission'
+    if crack_length - pre_l > 2:
+        return 'cleavage'
+    return None
+
+
+class OnlineDetector:
+    """
+    State in {potential}/log/{idx}-{T}-detect.json (tip of the last frame,
+    event, event step/K and the number of later steps that showed it again),
+    so the detector survives between the relax calls of submit.sh.
+    """
+    def __init__(self, potential, idx, T, confirm=2, dxa=True):
+        self.potential = potential
+        self.idx = idx
+        self.T = T
+        self.confirm = confirm
+        self.dxa = dxa
+        self.record = f'{potential}/log/{idx}-{T}-record'
+        self.state_file = f'{potential}/log/{idx}-{T}-detect.json'
+        self.reset(remove=False)
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                self.state.update(json.load(f))
+        self._prefilter = None
+
+    def reset(self, remove=True):
+        self.state = {'tip': None, 'event': None, 'event_step': None, 'event_K': None, 'confirmed': 0}
+        if remove and os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+    def save(self):
+        tmp = self.state_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, self.state_file)
+
+    def prefilter(self):
+        if self._prefilter is None:
+            self._prefilter = EmissionPrefilter(load_step(self.potential, self.idx, self.T, 0))
+        return self._prefilter
+
+    def update(self, step, K, frame):
+        """
+        Check the relaxed frame of step (loaded at K). Returns True when the
+        ramp should stop: an event was found and `confirm` later steps showed it again.
+        """
+        state = self.state
+        tracker = CrackTipTracker()
+        tracker.tip = state['tip']
+        res = tracker.update(frame)
+        state['tip'] = float(res['tip'])
+        event = frame_event(frame, res['crack_length'], res['tip'], self.prefilter(), self.dxa)
+
+        if state['event'] is not None and event != state['event']:
+            # not found again: a false alarm, or a different event that is confirmed on its own
+            with open(self.record, 'a') as f:
+                f.write(f"# cleared {state['event']} step {step} K {K}\n")
+            print(f"Online detection: {state['event']} of step {state['event_step']} not found at step {step}, "
+                  f"cleared.", flush=True)
+            state.update(event=None, event_step=None, event_K=None, confirmed=0)
+        if state['event'] is None:
+            if event is not None:
+                state.update(event=event, event_step=int(step), event_K=K, confirmed=0)
+                with open(self.record, 'a') as f:
+                    f.write(f"# event {event} step {step} K {K}\n")
+                print(f"Online detection: {event} at step {step}, K={K}.", flush=True)
+        else:
+            state['confirmed'] += 1
+        self.save()
+
+        stop = state['event'] is not None and state['confirmed'] >= self.confirm
+        if stop:
+            print(f"Online detection: {state['confirmed']} steps after {state['event']} "
+                  f"at K={state['event_K']}, ending the ramp.", flush=True)
+        return stop
+
+
+def record_K(record, step):
+    # K of a step in the record file
+    with open(record, 'r') as f:
+        next(f)
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] == str(step):
+                return parts[1]
+    raise ValueError(f"No K found for step {step} in {record}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Online critical-event detection after a relax of the K ramp.')
+    parser.add_argument('index', type=int)
+    parser.add_argument('T', type=int)
+    parser.add_argument('step', type=int)
+    parser.add_argument('potential')
+    parser.add_argument('--confirm', type=int, default=2, help='later steps that must show the event before the ramp ends')
+    parser.add_argument('--reset', action='store_true', help='forget the state of a previous ramp and exit')
+    parser.add_argument('--no-dxa', action='store_true', help='dislocation emission from the prefilter alone (no OVITO)')
+    args = parser.parse_args()
+
+    detector = OnlineDetector(args.potential, args.index, args.T, args.confirm, dxa=not args.no_dxa)
+    if args.reset:
+        detector.reset()
+        sys.exit(0)
+
+    try:
+        K = record_K(detector.record, args.step)
+        stop = detector.update(args.step, K, load_step(args.potential, args.index, args.T, args.step))
+    except FileNotFoundError as e:
+        print(f"Error: Input file not found:{e.filename}")
+        sys.exit(1)
+    sys.exit(STOP if stop else 0)
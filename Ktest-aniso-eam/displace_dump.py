@@ -8,11 +8,12 @@
 # Description：Apply displacement increments corresponding to stress intensity factor increment
 # Input: system index, T, delta_K (units: MPa*m^1/2), step
 """
-import numpy as np
+import os
 import sys
-import cmath
 import re
-import math
+
+from kfield import k_field_displacement, match_ids, cached_kernel
+from checkpoint import CheckpointStore, read_frame, write_frame_data
 
 
 def parse_system_data(filename, index):
@@ -44,69 +45,28 @@ def parse_system_data(filename, index):
 
     return a1, a2, p1, p2, q1, q2
 
-def displace_atoms(forg, fin, fout, dK, coeff):
-    a1 = coeff[0]
-    a2 = coeff[1]
-    p1 = coeff[2]
-    p2 = coeff[3]
-    q1 = coeff[4]
-    q2 = coeff[5]
-
-    flag = True
-    with open(forg, 'r') as f0:
-        lines0 = f0.readlines()
-        ylo = float(lines0[6].strip().split()[0])
-        yhi = float(lines0[6].strip().split()[1])
-        zlo = float(lines0[7].strip().split()[0])
-        zhi = float(lines0[7].strip().split()[1])
-        yhalf = (ylo + yhi) / 2
-        zhalf = (zlo + zhi) / 2
-
-    with open(fin, 'r') as f1, open(fout, 'w') as f2:
-        for i, line in enumerate(f1, 1):
-            if i < 10:
-                f2.write(line)
-            else:
-                if line.strip() == "":
-                    flag = False     # flag = True, this line refers to the position of atom.
-
-                if flag:
-                    parts = line.split()
-                    atom_type = parts[1]
-
-                    if atom_type == '4':         # This atom is in the boundary
-                        y = float(parts[4])
-                        z = float(parts[5])
-
-                        i0 = i - 1
-                        y0 = float(lines0[i0].strip().split()[4])
-                        z0 = float(lines0[i0].strip().split()[5])
-
-                        dy = y0 - yhalf
-                        dz = z0 - zhalf
-                        r = np.sqrt(dy**2 + dz**2)
-                        theta = math.atan2(dz, dy)
-
-                        term1 = a1 * p2 * cmath.sqrt(np.cos(theta) + a2 * np.sin(theta))
-                        term2 = a2 * p1 * cmath.sqrt(np.cos(theta) + a1 * np.sin(theta))
-                        term3 = a1 * q2 * cmath.sqrt(np.cos(theta) + a2 * np.sin(theta))
-                        term4 = a2 * q1 * cmath.sqrt(np.cos(theta) + a1 * np.sin(theta))
-
-                        Cplx1 = (term1 - term2) / (a1 - a2)
-                        Cplx2 = (term3 - term4) / (a1 - a2)
-                        newy = y + dK * np.sqrt(2*r/math.pi) * Cplx1.real
-                        newz = z + dK * np.sqrt(2*r/math.pi) * Cplx2.real
-
-                        parts[4] = str(newy)
-                        parts[5] = str(newz)
-
-                        new_line = " ".join(parts) + "\n"
-                        f2.write(new_line)
-                    else:
-                        f2.write(line)
-                else:
-                    f2.write(line)
+def build_kernel(forg, coeff):
+    # displacement per unit K of the boundary atoms, from the reference (step 0) configuration
+    frame0 = read_frame(forg)
+    yhalf, zhalf = frame0['box'][1:].mean(axis=1)
+    bd = frame0['types'] == 4           # atoms in the boundary
+    uy, uz = k_field_displacement(frame0['x'][bd, 1], frame0['x'][bd, 2], yhalf, zhalf, coeff)
+    return frame0['ids'][bd], uy, uz
+
+
+def displace_atoms(forg, fin, fout, dK, coeff, kernel_file=None):
+    # fin: dump file of the current step, or a frame loaded from the checkpoint store
+    if kernel_file is None:
+        ids, uy, uz = build_kernel(forg, coeff)
+    else:
+        ids, uy, uz = cached_kernel(kernel_file, forg, coeff, build_kernel)
 
+    frame = read_frame(fin) if isinstance(fin, str) else fin
+    rows = match_ids(frame['ids'], ids)
+    frame['x'][rows, 1] += dK * uy
+    frame['x'][rows, 2] += dK * uz
+    # read_data file for in.crack1-aniso-rlx, no atomsk conversion needed
+    write_frame_data(fout, frame, ntypes=4)
 
 
 if __name__ == '__main__':
@@ -129,11 +89,16 @@ if __name__ == '__main__':
         coeff = parse_system_data(f'{potential}/p_func/apq.txt', idx)
         origin_datafile = f'{potential}/dump/{idx}/{T}/W_{idx}_{T}_0_eq.data'
         old_datafile = f'{potential}/dump/{idx}/{T}/W_{idx}_{T}_{step}_eq.data'
+        kernel_file = f'{potential}/kernel/W_{idx}_{T}.npz'
 
         step += 1
 
-        new_datafile = f'{potential}/dump/{idx}/{T}/W_{idx}_{T}_{step}.data'
-        displace_atoms(origin_datafile, old_datafile, new_datafile, dK, coeff)
+        new_datafile = f'{potential}/dump/{idx}/{T}/W_{idx}_{T}_{step}.lmp'
+        if not os.path.exists(old_datafile):
+            store = CheckpointStore(potential, idx, T)
+            if store.has(step - 1):
+                old_datafile = store.get(step - 1)
+        displace_atoms(origin_datafile, old_datafile, new_datafile, dK, coeff, kernel_file)
 
     except FileNotFoundError as e:
         print(f"Error: Input file not found:{e.filename}")
@@ -0,0 +1,219 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : kramp.py
+# Time       ：2026/10/18 14:20
+# Author     ：oWoo
+# Description：In-process K-ramp driver. One LAMMPS instance is kept alive for the
+#              whole ramp: boundary displacements are scattered into memory and the
+#              relax of in.crack1-aniso-rlx is continued, instead of starting python,
+#              atomsk and lmp_mpi again on every K step.
+# Input: system index, T, K_initial, K_final, dK (units: MPa*m^1/2), potential, p_name
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from displace_dump import parse_system_data, build_kernel
+from kfield import cached_kernel
+from checkpoint import CheckpointStore, read_frame, write_frame_dump
+from lmpio import read_dump_header
+from detect import OnlineDetector
+
+
+class LammpsBackend:
+    # thin wrapper around the LAMMPS python module
+    def __init__(self, cmdargs=None):
+        from lammps import lammps
+        self.lmp = lammps(cmdargs=cmdargs or ['-log', 'none', '-screen', 'none'])
+        self.rank = self.lmp.extract_setting('world_rank')
+
+    def command(self, cmd):
+        self.lmp.command(cmd)
+
+    def bcast(self, obj):
+        # value of rank 0 on every rank
+        from mpi4py import MPI
+        return MPI.COMM_WORLD.bcast(obj, root=0)
+
+    def local_positions(self):
+        # ids and a writable view of the positions of the atoms owned by this rank
+        nlocal = self.lmp.extract_setting('nlocal')
+        ids = self.lmp.numpy.extract_atom('id')[:nlocal]
+        x = self.lmp.numpy.extract_atom('x')[:nlocal]
+        return ids, x
+
+    def close(self):
+        self.lmp.close()
+
+
+class MockBackend:
+    # stand-in for testing: loads the dump given to read_dump, 'run' does nothing
+    def __init__(self):
+        self.rank = 0
+        self.history = []
+        self.frame = None
+
+    def command(self, cmd):
+        self.history.append(cmd)
+        words = cmd.split()
+        if words[0] == 'read_dump':
+            self.frame = read_frame(words[1])
+        elif words[0] == 'write_dump':
+            write_frame_dump(words[3], self.frame)
+
+    def bcast(self, obj):
+        return obj
+
+    def local_positions(self):
+        return self.frame['ids'], self.frame['x']
+
+    def close(self):
+        pass
+
+
+def apply_kernel(ids, x, kernel, dK):
+    # add dK * kernel to the local atoms that are in the kernel (boundary atoms)
+    kernel_ids, uy, uz = kernel
+    order = np.argsort(kernel_ids)
+    pos = np.clip(np.searchsorted(kernel_ids[order], ids), 0, len(order) - 1)
+    rows = order[pos]
+    hit = kernel_ids[rows] == ids
+    x[hit, 1] += dK * uy[rows[hit]]
+    x[hit, 2] += dK * uz[rows[hit]]
+
+
+def setup(backend, potential, p_name, idx, T, start_file):
+    # same system as in.crack1-aniso-rlx, but the configuration comes from the dump of the start step
+    timestep = read_dump_header(start_file)['timestep']
+    for cmd in [
+        'units metal',
+        'atom_style atomic',
+        'dimension 3',
+        'boundary p p p',
+        f'read_data {potential}/config/static/W_{idx}_ini.data',
+        f'read_dump {start_file} {timestep} x y z vx vy vz box yes replace yes',
+        'reset_timestep 0',
+        'pair_style eam/alloy',
+        f'pair_coeff * * {potential}/p_func/{p_name} W W W W',
+        'group upper type 2',
+        'group lower type 3',
+        'neigh_modify exclude group upper lower',
+        'group bd type 4',
+        'group mobile subtract all bd',
+        'compute myTemp mobile temp',
+        'compute pemb mobile pe/atom',
+        'compute pe all reduce sum c_pemb',
+        'thermo 100',
+        'thermo_style custom step temp etotal pe c_pe pzz',
+        'thermo_modify temp myTemp',
+        'velocity bd set 0.0 0.0 0.0',
+        'fix 1 bd setforce 0.0 0.0 0.0',
+        'fix bd_nve bd nve',
+        f'fix mb_nvt mobile nvt temp {T} {T} $(100*dt)',
+        'fix_modify mb_nvt temp myTemp',
+    ]:
+        backend.command(cmd)
+
+
+def find_step(record, K):
+    # step at which the record file reached K, as the awk lookup in submit.sh
+    with open(record, 'r') as f:
+        next(f)
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and not parts[0].startswith('#') and abs(float(parts[1]) - K) < 1e-9:
+                return int(parts[0])
+    raise ValueError(f"No step found for K={K} in {record}")
+
+
+def shared_kernel(backend, kernel_file, forg, coeff):
+    # kernel built (or loaded) and saved by rank 0 only, then sent to the other ranks
+    kernel = cached_kernel(kernel_file, forg, coeff, build_kernel) if backend.rank == 0 else None
+    return backend.bcast(kernel)
+
+
+def run_ramp(backend, potential, p_name, idx, T, K_initial, K_final, dK, nrun=15000, store=None, detector=None):
+    # store: CheckpointStore that takes over the relaxed dumps (the text files are removed)
+    # detector: OnlineDetector that ends the ramp after a confirmed critical event
+    dump_dir = f'{potential}/dump/{idx}/{T}'
+    record = f'{potential}/log/{idx}-{T}-record'
+    coeff = parse_system_data(f'{potential}/p_func/apq.txt', idx)
+    kernel = shared_kernel(backend, f'{potential}/kernel/W_{idx}_{T}.npz', f'{dump_dir}/W_{idx}_{T}_0_eq.data', coeff)
+
+    if K_initial == 0:
+        now_step = 0
+        if backend.rank == 0:
+            with open(record, 'w') as f:
+                f.write('step K\n')
+            if detector is not None:
+                detector.reset()
+    else:
+        now_step = find_step(record, K_initial)
+    now_K = K_initial
+    max_iter = int(round((K_final - K_initial) / dK)) + now_step
+
+    start_file = f'{dump_dir}/W_{idx}_{T}_{now_step}_eq.data'
+    if not os.path.exists(start_file) and store is not None and store.has(now_step):
+        if backend.rank == 0:       # read_dump only reads the file on rank 0
+            store.export_dump(now_step, start_file)
+    setup(backend, potential, p_name, idx, T, start_file)
+    while now_step < max_iter:
+        ids, x = backend.local_positions()
+        apply_kernel(ids, x, kernel, dK * 100000)      # m^1/2 to Å^1/2
+        now_step += 1
+        now_K = round(now_K + dK, 6)
+        if backend.rank == 0:
+            with open(record, 'a') as f:
+                f.write(f'{now_step} {now_K:.6f}\n')
+
+        backend.command(f'run {nrun}')
+        dumpfile = f'{dump_dir}/W_{idx}_{T}_{now_step}_eq.data'
+        backend.command(f'write_dump all custom {dumpfile} id type mass x y z vx vy vz modify sort id')
+        stop = False
+        if detector is not None:
+            if backend.rank == 0:
+                stop = detector.update(now_step, f'{now_K:.6f}', read_frame(dumpfile))
+            stop = backend.bcast(stop)
+        if store is not None and backend.rank == 0:
+            store.import_dump(now_step, dumpfile, remove=True)
+        if backend.rank == 0:
+            print(f"now_step: {now_step}  now_K: {now_K:.6f}  relaxation finished.", flush=True)
+        if stop:
+            break
+    return now_step, now_K
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-process K ramp with one LAMMPS instance.')
+    parser.add_argument('index', type=int)
+    parser.add_argument('T', type=int)
+    parser.add_argument('K_initial', type=float)
+    parser.add_argument('K_final', type=float)
+    parser.add_argument('dK', type=float, help='units: MPa*m^1/2')
+    parser.add_argument('potential')
+    parser.add_argument('p_name')
+    parser.add_argument('--nrun', type=int, default=15000, help='relaxation steps per K increment')
+    parser.add_argument('--store', action='store_true', help='keep the relaxed steps in the binary checkpoint store')
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float64'], help='checkpoint store precision')
+    parser.add_argument('--confirm', type=int, default=None,
+                        help='detect critical events online and end the ramp this many steps after one')
+    parser.add_argument('--mock', action='store_true', help='use the mock backend instead of LAMMPS')
+    args = parser.parse_args()
+
+    backend = MockBackend() if args.mock else LammpsBackend()
+    store = CheckpointStore(args.potential, args.index, args.T, args.dtype) if args.store else None
+    detector = OnlineDetector(args.potential, args.index, args.T, args.confirm) if args.confirm is not None else None
+    try:
+        if store is not None and backend.rank == 0 and not store.has(0):
+            store.import_dump(0, f'{args.potential}/dump/{args.index}/{args.T}/W_{args.index}_{args.T}_0_eq.data')
+        run_ramp(backend, args.potential, args.p_name, args.index, args.T,
+                 args.K_initial, args.K_final, args.dK, args.nrun, store, detector)
+    except FileNotFoundError as e:
+        print(f"Error: Input file not found:{e.filename}")
+        sys.exit(1)
+    finally:
+        backend.close()
@@ -0,0 +1,236 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : materials.py
+# Time       ：2026/10/19 16:40
+# Author     ：oWoo
+# Description：Material properties of one potential as functions of T: C11, C12, C44 (GPa)
+#              and the surface energy of each plane family (J/m2), each a polynomial in T
+#              fitted (least squares, weighted by the error bars when given) to the
+#              temperatures computed so far:
+#                  elastic-T-Born/Cij-T.txt            (compute_born.py, born_converge.py)
+#                  elastic-T-deformation/Cij-{T}.txt   (in.elastic, elastic_launch.py)
+#                  gammasT/gammasT.txt                 (in.s, gamma_launch.py)
+#              The fitted model is saved as json and evaluated (arrays of T too) by
+#              KIc.py and apq.py (--material), within the temperatures each property was
+#              fitted to unless extrapolate is set. The same file is in Ktest-aniso-eam
+#              and Ktest-aniso-meam-spline.
+# Usage:
+#   python materials.py fit W.json --born Cij-T.txt --deformation Cij-300.txt Cij-1600.txt --gammas gammasT.txt
+#   python materials.py eval W.json -T 0 300 600 900
+"""
+import argparse
+import json
+import re
+
+import numpy as np
+
+eVA2_to_Jm2 = 16.02176634
+elastic_names = ('C11', 'C12', 'C44')
+
+
+def family(s):
+    # '{110}', '110', 'W_110', '10,1,1', '(1 1 0)' or (1, 1, 0) -> (1, 1, 0), the sorted absolute Miller
+    # indices of the plane family; without commas or spaces every digit is an index
+    if isinstance(s, str):
+        s = s.rsplit('_', 1)[-1]
+        s = [int(v) for v in re.findall(r'-?\d+' if re.search(r'[,\s]', s.strip()) else r'-?\d', s)]
+    return tuple(sorted((abs(int(v)) for v in s), reverse=True))
+
+
+def family_key(f):
+    # json key of a plane family: (1, 1, 0) -> '110'
+    f = family(f)
+    return ''.join(str(v) for v in f) if max(f) < 10 else ','.join(str(v) for v in f)
+
+
+# ------------ readers ------------
+def read_born(filename):
+    # Cij-T.txt of compute_born.py: T C11 eC11 C12 eC12 C44 eC44 -> [(T, (C11, C12, C44), (errors))]
+    points = []
+    data = np.atleast_2d(np.loadtxt(filename, comments='#'))
+    for row in data:
+        points.append((row[0], tuple(row[[1, 3, 5]]), tuple(row[[2, 4, 6]])))
+    return points
+
+
+def read_deformation(filename):
+    # Cij-{T}.txt of in.elastic / elastic_launch.py; the last block of the file is used
+    T = None
+    values = {}
+    with open(filename, 'r') as f:
+        for line in f:
+            m = re.match(r'Temp = ([-+\d.eE]+)K', line)
+            if m:
+                T = float(m.group(1))
+                values = {}
+                continue
+            m = re.match(r'(C11|C12|C44) = ([-+\d.eE]+)', line)
+            if m:
+                values[m.group(1)] = float(m.group(2))
+    if T is None or len(values) < 3:
+        raise ValueError(f"No C11, C12, C44 found in {filename}")
+    return [(T, tuple(values[n] for n in elastic_names), None)]
+
+
+def read_gammas(filename):
+    # gammasT.txt of in.s / gamma_launch.py: zori temp(K) E0 E1 Es(eV/A2) -> [(family, T, J/m2)]
+    points = []
+    with open(filename, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            try:
+                T, gamma = float(parts[1]), float(parts[4])
+            except ValueError:
+                continue        # header
+            points.append((family(parts[0]), T, gamma * eVA2_to_Jm2))
+    return points
+
+
+# ------------ model ------------
+def fit_poly(T, y, err=None, degree=2):
+    # polynomial coefficients (highest power first), degree lowered to the number of points - 1
+    T = np.asarray(T, dtype=float)
+    y = np.asarray(y, dtype=float)
+    deg = min(degree, len(np.unique(T)) - 1)
+    w = None if err is None or np.any(np.asarray(err) <= 0) else 1 / np.asarray(err, dtype=float)
+    return np.polyfit(T, y, deg, w=w).tolist()
+
+
+class MaterialModel:
+    """
+    C11, C12, C44 and surface energies as polynomials in T. Data points are
+    collected with add_elastic / add_surface, fitted by fit(), and the model is
+    saved to / loaded from json (only the fit and the data points are stored).
+    """
+    def __init__(self, name='', degree=2):
+        self.name = name
+        self.degree = degree
+        self.elastic_points = []        # (T, (C11, C12, C44), errors or None)
+        self.surface_points = []        # (family, T, gamma)
+        self.coeffs = {}                # 'C11', 'C12', 'C44', 'gamma-110', ... -> polynomial
+        self.ranges = {}                # same keys -> (T min, T max) of the fitted points
+        self.T_range = None
+        self.extrapolate = False        # evaluate outside the fitted temperatures
+
+    def add_elastic(self, points):
+        self.elastic_points.extend((float(T), tuple(map(float, C)), None if e is None else tuple(map(float, e)))
+                                   for T, C, e in points)
+
+    def add_surface(self, points):
+        self.surface_points.extend((family(f), float(T), float(g)) for f, T, g in points)
+
+    def fit(self):
+        if not self.elastic_points:
+            raise ValueError("No elastic constants to fit")
+        T = [p[0] for p in self.elastic_points]
+        for n, name in enumerate(elastic_names):
+            y = [p[1][n] for p in self.elastic_points]
+            err = None if any(p[2] is None for p in self.elastic_points) else [p[2][n] for p in self.elastic_points]
+            self.coeffs[name] = fit_poly(T, y, err, self.degree)
+            self.ranges[name] = (min(T), max(T))
+        for f in sorted(set(p[0] for p in self.surface_points)):
+            points = [p for p in self.surface_points if p[0] == f]
+            key = f'gamma-{family_key(f)}'
+            self.coeffs[key] = fit_poly([p[1] for p in points], [p[2] for p in points], degree=self.degree)
+            self.ranges[key] = (min(p[1] for p in points), max(p[1] for p in points))
+        T_all = T + [p[1] for p in self.surface_points]
+        self.T_range = (min(T_all), max(T_all))
+        return self
+
+    def check_range(self, key, T):
+        # ValueError for temperatures outside the ones key was fitted to, unless extrapolate
+        T_min, T_max = self.ranges.get(key, self.T_range)
+        T = np.asarray(T, dtype=float)
+        if not self.extrapolate and (np.any(T < T_min - 1e-6) or np.any(T > T_max + 1e-6)):
+            asked = f'{T.min():g}' if T.min() == T.max() else f'{T.min():g}-{T.max():g}'
+            raise ValueError(f"{key} of {self.name or 'the model'} is fitted to T = {T_min:g}-{T_max:g} K, "
+                             f"not {asked} K (extrapolate to evaluate it anyway)")
+
+    def elastic(self, T):
+        # (C11, C12, C44) at T (scalar or array), unit: GPa
+        for name in elastic_names:
+            self.check_range(name, T)
+        return tuple(np.polyval(self.coeffs[name], T) for name in elastic_names)
+
+    def planes(self):
+        return [family(key[len('gamma-'):].replace(',', ' ')) for key in self.coeffs if key.startswith('gamma-')]
+
+    def gamma(self, plane, T):
+        # surface energy of the family of plane at T, unit: J/m2; ValueError if the family was never computed
+        key = f'gamma-{family_key(plane)}'
+        if key not in self.coeffs:
+            raise ValueError(f"no surface energy of {{{family_key(plane)}}} in {self.name or 'the model'}")
+        self.check_range(key, T)
+        return np.polyval(self.coeffs[key], T)
+
+    def gammas(self, T):
+        # {plane family: J/m2} at a scalar T, as KIc.sweep takes it
+        return {f: float(self.gamma(f, T)) for f in self.planes()}
+
+    def save(self, filename):
+        data = {'name': self.name, 'degree': self.degree, 'T_range': self.T_range, 'coeffs': self.coeffs,
+                'ranges': self.ranges,
+                'elastic_points': self.elastic_points,
+                'surface_points': [(family_key(f), T, g) for f, T, g in self.surface_points]}
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=1)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        model = cls(data['name'], data['degree'])
+        model.add_elastic(data['elastic_points'])
+        model.add_surface((key.replace(',', ' '), T, g) for key, T, g in data['surface_points'])
+        model.coeffs = data['coeffs']
+        model.T_range = data['T_range']
+        model.ranges = {key: tuple(r) for key, r in data.get('ranges', {}).items()}
+        return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='C(T) and surface energy(T) model of a potential.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('fit', help='fit the model to the computed temperatures')
+    p.add_argument('model', help='json file to write')
+    p.add_argument('--born', nargs='*', default=[], help='Cij-T.txt of compute_born.py')
+    p.add_argument('--deformation', nargs='*', default=[], help='Cij-{T}.txt of in.elastic')
+    p.add_argument('--gammas', nargs='*', default=[], help='gammasT.txt of in.s')
+    p.add_argument('--degree', type=int, default=2, help='polynomial degree in T')
+    p.add_argument('--name', default='')
+    p = sub.add_parser('eval', help='print the model at some temperatures')
+    p.add_argument('model')
+    p.add_argument('-T', type=float, nargs='+', required=True)
+    p.add_argument('--extrapolate', action='store_true', help='evaluate outside the fitted temperatures')
+    args = parser.parse_args()
+
+    if args.cmd == 'fit':
+        model = MaterialModel(args.name, args.degree)
+        for filename in args.born:
+            model.add_elastic(read_born(filename))
+        for filename in args.deformation:
+            model.add_elastic(read_deformation(filename))
+        for filename in args.gammas:
+            model.add_surface(read_gammas(filename))
+        model.fit().save(args.model)
+        print(f"{len(model.elastic_points)} elastic and {len(model.surface_points)} surface energy points, "
+              f"T = {model.T_range[0]:g}-{model.T_range[1]:g} K -> {args.model}")
+    else:
+        model = MaterialModel.load(args.model)
+        model.extrapolate = args.extrapolate
+        T = np.array(args.T)
+        planes = model.planes()
+        try:
+            C11, C12, C44 = model.elastic(T)
+            for f in planes:
+                model.gamma(f, T)
+        except ValueError as e:
+            parser.error(str(e))
+        print('T(K) C11 C12 C44 (GPa) ' + ' '.join(f'{{{family_key(f)}}}(J/m2)' for f in planes))
+        for n, t in enumerate(T):
+            print(f"{t:g} {C11[n]:.4f} {C12[n]:.4f} {C44[n]:.4f} " +
+                  ' '.join(f'{model.gamma(f, t):.5f}' for f in planes))
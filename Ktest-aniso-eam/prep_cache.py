@@ -0,0 +1,156 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : prep_cache.py
+# Time       ：2026/10/19 17:30
+# Author     ：oWoo
+# Description：Content-addressed cache of the in.crack1-aniso-ini outputs
+#              (config/static/W_{idx}_ini.data and config/dynamic/W_{idx}_{T}.data).
+#              The key is the sha256 of the input script, T, idx, the contents of the
+#              potential file and of input/W_{idx}.lmp, so the folder name of the
+#              potential does not matter: any campaign asking for the same preparation
+#              gets the stored outputs copied into its own config folders. The cache
+#              folder is $PREP_CACHE, or prep-cache next to the scripts.
+# Usage:
+#   python prep_cache.py fetch <index> <T> <potential> <p_name>    # exit code 0: copied from the cache, 1: not cached
+#   python prep_cache.py store <index> <T> <potential> <p_name>    # after in.crack1-aniso-ini
+#   python prep_cache.py list
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE = os.environ.get('PREP_CACHE', f'{HERE}/prep-cache')
+SCRIPT = 'in.crack1-aniso-ini'
+
+
+def outputs(potential, idx, T):
+    # files written by in.crack1-aniso-ini, as names in a cache entry -> paths in the potential folder
+    return {'static.data': f'{potential}/config/static/W_{idx}_ini.data',
+            'dynamic.data': f'{potential}/config/dynamic/W_{idx}_{T}.data'}
+
+
+def inputs(potential, p_name, idx, script=SCRIPT):
+    # files in.crack1-aniso-ini reads
+    return {'script': script, 'potential': f'{potential}/p_func/{p_name}', 'lmp': f'input/W_{idx}.lmp'}
+
+
+def file_hash(filename):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def prep_key(potential, p_name, idx, T, script=SCRIPT):
+    # sha256 of the file contents (not their paths) and of the variables of the run
+    h = hashlib.sha256()
+    h.update(json.dumps({'T': f'{float(T):g}', 'idx': int(idx)}).encode())
+    for name, filename in sorted(inputs(potential, p_name, idx, script).items()):
+        h.update(f'{name}:{file_hash(filename)}'.encode())
+    return h.hexdigest()
+
+
+def entry_dir(key, cache=CACHE):
+    return f'{cache}/{key[:2]}/{key}'
+
+
+def copy_file(src, dst):
+    # through a temporary file, so a reader never sees half a file
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    tmp = f'{dst}.tmp-{os.getpid()}'
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def fetch(potential, p_name, idx, T, cache=CACHE, script=SCRIPT):
+    """
+    Copies the cached outputs of the preparation into the potential folder.
+    Returns the key on a hit, None if the preparation is not cached.
+    """
+    key = prep_key(potential, p_name, idx, T, script)
+    entry = entry_dir(key, cache)
+    if not os.path.exists(f'{entry}/meta.json'):
+        return None
+    for name, dst in outputs(potential, idx, T).items():
+        copy_file(f'{entry}/{name}', dst)
+    return key
+
+
+def store(potential, p_name, idx, T, cache=CACHE, script=SCRIPT, **meta):
+    """
+    Stores the outputs of a finished preparation. The entry is built in a
+    temporary folder and renamed, so concurrent stores of the same key are safe.
+    Returns the key.
+    """
+    key = prep_key(potential, p_name, idx, T, script)
+    entry = entry_dir(key, cache)
+    if os.path.exists(f'{entry}/meta.json'):
+        return key
+    files = outputs(potential, idx, T)
+    for filename in files.values():
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f"{filename} does not exist, nothing to store")
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f'.{key[:8]}-', dir=os.path.dirname(entry))
+    for name, src in files.items():
+        shutil.copyfile(src, f'{tmp}/{name}')
+    info = dict(key=key, idx=int(idx), T=float(T), potential=potential, p_name=p_name, created=time.time(),
+                inputs={name: file_hash(f) for name, f in inputs(potential, p_name, idx, script).items()}, **meta)
+    with open(f'{tmp}/meta.json', 'w') as f:
+        json.dump(info, f, indent=1)
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        # stored by another job in the meantime
+        shutil.rmtree(tmp, ignore_errors=True)
+    return key
+
+
+def entries(cache=CACHE):
+    found = []
+    if not os.path.isdir(cache):
+        return found
+    for prefix in sorted(os.listdir(cache)):
+        for key in sorted(os.listdir(f'{cache}/{prefix}')) if os.path.isdir(f'{cache}/{prefix}') else []:
+            meta = f'{cache}/{prefix}/{key}/meta.json'
+            if os.path.exists(meta):
+                with open(meta, 'r') as f:
+                    found.append(json.load(f))
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cache of the in.crack1-aniso-ini outputs.')
+    parser.add_argument('--cache', default=CACHE, help='cache folder (default: $PREP_CACHE or ./prep-cache)')
+    sub = parser.add_subparsers(dest='action', required=True)
+    for name in ('fetch', 'store'):
+        p = sub.add_parser(name)
+        p.add_argument('index', type=int)
+        p.add_argument('T', type=int)
+        p.add_argument('potential')
+        p.add_argument('p_name')
+    sub.add_parser('list')
+    args = parser.parse_args()
+
+    if args.action == 'list':
+        for meta in entries(args.cache):
+            print(f"{meta['key'][:12]} idx={meta['idx']} T={meta['T']:g} {meta['potential']}/{meta['p_name']} "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(meta['created']))}")
+    elif args.action == 'fetch':
+        key = fetch(args.potential, args.p_name, args.index, args.T, args.cache)
+        if key is None:
+            print(f"W_{args.index}_{args.T}: not in the preparation cache")
+            sys.exit(1)
+        print(f"W_{args.index}_{args.T}: copied from the preparation cache ({key[:12]})")
+    else:
+        key = store(args.potential, args.p_name, args.index, args.T, args.cache)
+        print(f"W_{args.index}_{args.T}: stored in the preparation cache ({key[:12]})")
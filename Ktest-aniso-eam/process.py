@@ -9,23 +9,46 @@
 """
 
 from ovito.io import import_file
+from ovito.data import DataCollection, Particles, SimulationCell
+from ovito.pipeline import Pipeline, StaticSource
 from ovito.modifiers import ConstructSurfaceModifier
 from ovito.modifiers import DislocationAnalysisModifier
 import numpy as np
 import os
 import matplotlib.pyplot as plt
-import sys
+import argparse
+import functools
+import json
+from concurrent.futures import ProcessPoolExecutor
 
-os.environ['OVITO_GUI_MODE'] = '0'
+from checkpoint import CheckpointStore, read_frame
+from crack_tip import CrackTipTracker, EmissionPrefilter
 
-def measure_crack_length(input_file):
+os.environ['OVITO_GUI_MODE'] = '0'
 
-    pipeline = import_file(input_file)
-    modifier1 = ConstructSurfaceModifier(method=ConstructSurfaceModifier.Method.AlphaShape, radius=2.7, smoothing_level=8, select_surface_particles=True)
-    pipeline.modifiers.append(modifier1)
+def open_pipeline(input_file):
+    # input_file: path of a data file, (path, i, j, step) of the checkpoint store, or a frame
+    if isinstance(input_file, str):
+        return import_file(input_file)
+    if isinstance(input_file, tuple):
+        path, i, j, step = input_file
+        input_file = CheckpointStore(path, i, j).get(step)
 
-    data = pipeline.compute()
+    frame = input_file
+    data = DataCollection()
+    cell = SimulationCell(pbc=(True, True, True))
+    cell[:, :3] = np.diag(frame['box'][:, 1] - frame['box'][:, 0])
+    cell[:, 3] = frame['box'][:, 0]
+    data.objects.append(cell)
+    particles = Particles()
+    particles.create_property('Particle Identifier', data=frame['ids'])
+    particles.create_property('Particle Type', data=frame['types'])
+    particles.create_property('Position', data=frame['x'])
+    data.objects.append(particles)
+    return Pipeline(source=StaticSource(data=data))
 
+def crack_length_of(data):
+    # y-extent of the surface atoms inside the 12Å boundary buffer
     bd_lf = min(data.particles.positions[:,1]) + 12  # 12Å buffer
     bd_rt = max(data.particles.positions[:,1]) - 12 
     bd_hi = max(data.particles.positions[:,2]) - 12  # 12Å buffer
@@ -44,25 +67,430 @@ def measure_crack_length(input_file):
     return crack_length
 
 
-def precracked_length(input_file):
-    pipeline = import_file(input_file)
+def analyze_frame(input_file, dxa=True, prefilter=None):
+    """
+    Load one configuration once and run surface construction, crack-length
+    measurement and (optionally) dislocation analysis on it.
+    prefilter: (path, i, j) to gate DXA with check_dislocation.
+    Returns dict(pre_l, crack_length, disl_count, dxa_stage); disl_count is None without dxa.
+    """
+    pipeline = open_pipeline(input_file)
+    pipeline.modifiers.append(ConstructSurfaceModifier(method=ConstructSurfaceModifier.Method.AlphaShape, radius=2.7, smoothing_level=8, select_surface_particles=True))
+    if dxa and prefilter is None:
+        # DXA uses all particles, the surface selection does not restrict it
+        pipeline.modifiers.append(DislocationAnalysisModifier(input_crystal_structure=DislocationAnalysisModifier.Lattice.BCC))
     data = pipeline.compute()
+
     ly = data.cell[1,1]
-    pre_l  = ly / 2 - 40 - 12
-    
-    return pre_l 
+    rec = {
+        'pre_l': ly / 2 - 40 - 12,
+        'crack_length': crack_length_of(data),
+        'disl_count': None,
+        'dxa_stage': None,
+    }
+    if dxa and prefilter is None:
+        rec['disl_count'], rec['dxa_stage'] = len(data.dislocations.lines), 'dxa'
+    elif dxa:
+        rec['disl_count'], rec['dxa_stage'] = check_dislocation(input_file, rec['crack_length'], prefilter)
+    return rec
+
 
 def count_dislocation(input_file):
-    pipeline = import_file(input_file)
+    pipeline = open_pipeline(input_file)
     modifier = DislocationAnalysisModifier(input_crystal_structure=DislocationAnalysisModifier.Lattice.BCC)
     pipeline.modifiers.append(modifier)
     data = pipeline.compute()
 
     return len(data.dislocations.lines)
 
-if __name__ == "__main__":
+
+@functools.lru_cache(maxsize=4)
+def emission_prefilter(path, i, j):
+    # EmissionPrefilter with the step-0 configuration of system i at temperature j as reference
+    reference = f'{path}/dump/{i}/{j}/W_{i}_{j}_0_eq.data'
+    if not os.path.exists(reference):
+        reference = (path, i, j, 0)
+    return EmissionPrefilter(load_frame(reference))
+
+
+def check_dislocation(input_file, crack_length, prefilter=None):
+    """
+    count_dislocation gated by the emission_prefilter of prefilter = (path, i, j).
+    Returns (disl_count, stage): stage 'prefilter' when the frame was rejected
+    without DXA (disl_count 0), 'dxa' when DXA ran.
+    """
+    if prefilter is not None:
+        frame = load_frame(input_file)
+        tip = frame['x'][:, 1].min() + 12 + crack_length
+        if not emission_prefilter(*prefilter).passes(frame, tip):
+            return 0, 'prefilter'
+        input_file = frame
+    return count_dislocation(input_file), 'dxa'
+
+
+def needs_dxa(rec, prefilter=None):
+    # no dislocation count yet, or one from the prefilter while running without it
+    return rec['disl_count'] is None or (prefilter is None and rec.get('dxa_stage') == 'prefilter')
+
+
+def stage_counts(records):
+    # frames rejected by the prefilter, frames DXA found free of dislocations, frames with dislocations
+    stages = [(r.get('dxa_stage'), r['disl_count']) for r in records]
+    return (sum(stage == 'prefilter' for stage, _ in stages),
+            sum(stage == 'dxa' and n == 0 for stage, n in stages),
+            sum(stage == 'dxa' and n > 0 for stage, n in stages))
+
+
+def load_frame(input_file):
+    # frame dict of a dump file path, a (path, i, j, step) checkpoint step, or a frame
+    if isinstance(input_file, str):
+        return read_frame(input_file)
+    if isinstance(input_file, tuple):
+        path, i, j, step = input_file
+        return CheckpointStore(path, i, j).get(step)
+    return input_file
+
+
+def analyze_frame_native(input_file, tracker, dxa=True, prefilter=None):
+    """
+    analyze_frame with the crack length from CrackTipTracker instead of the
+    alpha-shape surface: the frame is read with lmpio/checkpoint and OVITO is
+    only used for DXA, on the frame already in memory.
+    Returns dict(pre_l, crack_length, disl_count, dxa_stage, tip).
+    """
+    frame = load_frame(input_file)
+    res = tracker.update(frame)
+    ly = frame['box'][1, 1] - frame['box'][1, 0]
+    disl_count, stage = check_dislocation(frame, res['crack_length'], prefilter) if dxa else (None, None)
+    return {
+        'pre_l': ly / 2 - 40 - 12,
+        'crack_length': res['crack_length'],
+        'disl_count': disl_count,
+        'dxa_stage': stage,
+        'tip': res['tip'],
+    }
+
+
+def track_frames(sources, tips):
+    # native analysis of consecutive frames with one tracker; frames whose tip is known only move the window
+    tracker = CrackTipTracker()
+    recs = []
+    for source, tip in zip(sources, tips):
+        if tip is not None:
+            tracker.tip = tip
+            recs.append(None)
+        else:
+            recs.append(analyze_frame_native(source, tracker, dxa=False))
+    return recs
+
+
+def list_frames(path, i, j):
+    # (step, K, datafile or checkpoint step) of every step in the record file that has a configuration
+    record_file = f"{path}/log/{i}-{j}-record"
+    store = CheckpointStore(path, i, j)
+    frames = []
+    with open(record_file, 'r') as fin:
+        next(fin)
+        for line in fin:
+            if not line.strip() or line.startswith('#'):
+                continue
+            step = line.split()[0]
+            K = line.split()[1]
+            datafile = f'{path}/dump/{i}/{j}/W_{i}_{j}_{step}_eq.data'
+
+            if not os.path.exists(datafile):
+                if not store.has(step):
+                    print(f"Data file {datafile} does not exist. Skipping step {step}!!!")
+                    continue
+                datafile = (path, i, j, int(step))
+            frames.append((step, K, datafile))
+    # records of scheduler.py hold a step tree: frames in the order of K
+    frames.sort(key=lambda f: float(f[1]))
+    return frames
+
+
+def source_key(source, native=False):
+    # identity of the file(s) behind a frame: path, size and mtime (+ the crack-length method)
+    if isinstance(source, str):
+        files = [source]
+    else:
+        store = CheckpointStore(*source[:3])
+        files = [store.path(0), store.path(source[3])]
+    key = []
+    for fn in files:
+        st = os.stat(fn)
+        key.append(f'{fn}:{st.st_size}:{st.st_mtime_ns}')
+    if native:
+        key.append('native')
+    return ' '.join(key)
+
+
+class FrameCache:
+    """
+    {path}/log/[proc]{i}-{j}-cache.json: analysis results of every step, kept
+    across runs. An entry is reused while the file behind the step is
+    unchanged (same path, size and mtime), so reruns during a running ramp
+    only analyze the new steps.
+    """
+    def __init__(self, path, i, j, enabled=True):
+        self.file = f"{path}/log/[proc]{i}-{j}-cache.json"
+        self.enabled = enabled
+        self.entries = {}
+        if enabled and os.path.exists(self.file):
+            try:
+                with open(self.file, 'r') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                print(f"Cache file {self.file} is corrupted. Rebuilding it.")
+
+    def get(self, step, key):
+        # cached dict(pre_l, crack_length, disl_count[, dxa_stage, tip]) of the step, None when missing or stale
+        entry = self.entries.get(step)
+        if entry is None or entry['key'] != key:
+            return None
+        return {k: entry[k] for k in ('pre_l', 'crack_length', 'disl_count', 'dxa_stage', 'tip') if k in entry}
+
+    def put(self, step, key, rec):
+        self.entries[step] = {
+            'key': key,
+            'pre_l': float(rec['pre_l']),
+            'crack_length': float(rec['crack_length']),
+            'disl_count': None if rec['disl_count'] is None else int(rec['disl_count']),
+        }
+        if rec.get('dxa_stage') is not None:
+            self.entries[step]['dxa_stage'] = rec['dxa_stage']
+        if rec.get('tip') is not None:
+            self.entries[step]['tip'] = float(rec['tip'])
+
+    def save(self):
+        if not self.enabled:
+            return
+        tmp = self.file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.file)
+
+
+def cached_analysis(cache, step, source, dxa, tracker=None, prefilter=None):
+    """
+    analyze_frame (analyze_frame_native with a tracker) through the cache;
+    a cached entry without DXA only needs check_dislocation.
+    """
+    key = source_key(source, native=tracker is not None)
+    rec = cache.get(step, key)
+    if rec is not None and 'tip' in rec and tracker is not None:
+        tracker.tip = rec['tip']
+    if rec is None:
+        if tracker is None:
+            rec = analyze_frame(source, dxa=dxa, prefilter=prefilter)
+        else:
+            rec = analyze_frame_native(source, tracker, dxa=dxa, prefilter=prefilter)
+    elif dxa and needs_dxa(rec, prefilter):
+        rec['disl_count'], rec['dxa_stage'] = check_dislocation(source, rec['crack_length'], prefilter)
+    else:
+        return rec
+    cache.put(step, key, rec)
+    cache.save()
+    return rec
+
+
+def detect_event(rec, pre_l):
+    # critical event of one analyzed frame: dislocation emission first, then cleavage
+    if rec['disl_count'] > 0:
+        return 'disl-emission'
+    if pre_l is not None and (rec['crack_length'] - pre_l) > 2:
+        return 'cleavage'
+    return None
+
+
+def report_event(event_type, K):
+    if event_type == 'disl-emission':
+        print(f"Dislocation emission detected at K={K}.")
+    else:
+        print(f"Cleavage detected at K={K}.")
+
+
+def process_system(path, i, j, use_cache=True, native=False, prefilter=False):
+    """
+    Analyze every frame of system i at temperature j, each loaded once.
+    DXA runs until the first critical event and on the last frame.
+    Results of unchanged frames come from the FrameCache.
+    native: crack length from CrackTipTracker instead of the OVITO surface.
+    prefilter: DXA only on frames that pass the EmissionPrefilter.
+    Returns (records, kc, event_type, final_dislocation_count, pre_l).
+    """
+    frames = list_frames(path, i, j)
+    cache = FrameCache(path, i, j, use_cache)
+    tracker = CrackTipTracker() if native else None
+    prefilter = (path, i, j) if prefilter else None
+    records = []
+    pre_l = None
+    kc = None
+    event_type = None
+    for n, (step, K, datafile) in enumerate(frames):
+        last = n == len(frames) - 1
+        rec = cached_analysis(cache, step, datafile, dxa=(kc is None or last),
+                              tracker=tracker, prefilter=prefilter)
+        rec.update(step=step, K=K)
+        records.append(rec)
+
+        if step == '1':
+            pre_l = rec['pre_l']
+
+        if kc is None:
+            event_type = detect_event(rec, pre_l)
+            if event_type is not None:
+                kc = K
+                report_event(event_type, K)
+
+    final_dislocation_count = records[-1]['disl_count'] if records else None
+    return records, kc, event_type, final_dislocation_count, pre_l
+
+
+def process_parallel(path, jobs, workers, use_cache=True, native=False, prefilter=False):
+    """
+    Same results as process_system for every (i, j) in jobs, with the frame
+    analyses of all systems, temperatures and steps spread over a process pool.
+    Crack lengths are computed for every frame first; DXA then only runs on
+    the frames up to the first cleavage and on the last frame, and the
+    critical-K detection is a sequential reduction per (i, j).
+    Frames found in the FrameCache are not analyzed again. With native, the
+    crack tip of each (i, j) is tracked frame by frame in one task per (i, j).
+    """
+    frames = {job: list_frames(path, *job) for job in jobs}
+    caches = {job: FrameCache(path, *job, use_cache) for job in jobs}
+    keys = [(job, n) for job in jobs for n in range(len(frames[job]))]
+    source_keys = {key: source_key(frames[key[0]][key[1]][2], native) for key in keys}
+    records = {}
+    for key in keys:
+        rec = caches[key[0]].get(frames[key[0]][key[1]][0], source_keys[key])
+        if rec is not None:
+            records[key] = rec
+    print(f"{len(records)} of {len(keys)} frames found in the cache.")
+
+    def store(key, rec):
+        records[key] = rec
+        caches[key[0]].put(frames[key[0]][key[1]][0], source_keys[key], rec)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if native:
+            futures = {}
+            for job in jobs:
+                job_keys = [(job, n) for n in range(len(frames[job]))]
+                if all(key in records for key in job_keys):
+                    continue
+                tips = [records[key].get('tip') if key in records else None for key in job_keys]
+                futures[job] = pool.submit(track_frames, [f[2] for f in frames[job]], tips)
+            for job, fut in futures.items():
+                for n, rec in enumerate(fut.result()):
+                    if rec is not None:
+                        store((job, n), rec)
+        else:
+            futures = {key: pool.submit(analyze_frame, frames[key[0]][key[1]][2], False)
+                       for key in keys if key not in records}
+            for key, fut in futures.items():
+                store(key, fut.result())
+        for cache in caches.values():
+            cache.save()
+
+        dxa_keys = []
+        for job in jobs:
+            pre_l = None
+            cut = len(frames[job]) - 1
+            for n, (step, K, _) in enumerate(frames[job]):
+                if step == '1':
+                    pre_l = records[(job, n)]['pre_l']
+                if pre_l is not None and (records[(job, n)]['crack_length'] - pre_l) > 2:
+                    cut = n
+                    break
+            dxa_keys += [(job, n) for n in range(cut + 1)]
+            if cut < len(frames[job]) - 1:
+                dxa_keys.append((job, len(frames[job]) - 1))
+        prefilters = {job: (path, *job) if prefilter else None for job in jobs}
+        futures = {key: pool.submit(check_dislocation, frames[key[0]][key[1]][2],
+                                    records[key]['crack_length'], prefilters[key[0]])
+                   for key in dxa_keys if needs_dxa(records[key], prefilters[key[0]])}
+        for key, fut in futures.items():
+            records[key]['disl_count'], records[key]['dxa_stage'] = fut.result()
+            store(key, records[key])
+        for cache in caches.values():
+            cache.save()
+
+    results = {}
+    for job in jobs:
+        print("==========================")
+        print(f"Processing system {job[0]} at {job[1]}K")
+        recs = []
+        pre_l = None
+        kc = None
+        event_type = None
+        for n, (step, K, _) in enumerate(frames[job]):
+            rec = records[(job, n)]
+            rec.update(step=step, K=K)
+            recs.append(rec)
+            if step == '1':
+                pre_l = rec['pre_l']
+            if kc is None:
+                event_type = detect_event(rec, pre_l)
+                if event_type is not None:
+                    kc = K
+                    report_event(event_type, K)
+        final_dislocation_count = recs[-1]['disl_count'] if recs else None
+        results[job] = (recs, kc, event_type, final_dislocation_count, pre_l)
+    return results
+
+
+def write_results(path, i, j, result, kcfout):
+    records, kc, event_type, final_dislocation_count, pre_l = result
+    new_record = f"{path}/log/[proc]{i}-{j}-record"
+    with open(new_record, 'w') as fout:
+        fout.write('step K crack-length\n')
+        for rec in records:
+            fout.write(f"{rec['step']} {rec['K']} {rec['crack_length']:.5f}\n")
+
+    if kc is None:
+        print(f"No critical K found!")
+        kcfout.write(f"{i} {j} - no-event {final_dislocation_count}\n")
+    else:
+        kcfout.write(f"{i} {j} {kc} {event_type} {final_dislocation_count}\n")
+
+    print(f"Finished processing.")
+    if not records:
+        return
+
+    Ks = np.loadtxt(new_record, skiprows=1, usecols=1, ndmin=1)
+    crack_lengths = np.loadtxt(new_record, skiprows=1, usecols=2, ndmin=1)
     
-    potential = sys.argv[1]
+    plt.figure()
+    plt.plot(Ks, crack_lengths, '-o')
+    plt.minorticks_on()
+    plt.xlabel(r'K ($\mathrm{MPa\sqrt{m}}$)')
+    plt.ylabel('Crack Length (Å)')
+    if pre_l is not None:
+        plt.axhline(y=pre_l, color='r', linestyle='--', label='precrack length')
+    if kc is not None:
+        plt.axvline(x=float(kc), color='g', linestyle='--', label=f'{event_type}')
+    plt.title(f'System {i} at {j}K')
+    plt.legend()
+    plt.savefig(f'{path}/pic/{i}-{j}.png')        
+    plt.close()
+    print("Plot saved.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Crack length and critical-event detection of the K-ramp frames.')
+    parser.add_argument('potential')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of worker processes (1: serial, 0: all cores)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='analyze every frame again instead of reusing [proc]{i}-{j}-cache.json')
+    parser.add_argument('--native', action='store_true',
+                        help='crack length from the KD-tree crack-tip tracker (crack_tip.py) instead of the OVITO surface')
+    parser.add_argument('--prefilter', action='store_true',
+                        help='run DXA only on frames whose crack-tip centrosymmetry changed against step 0')
+    args = parser.parse_args()
+
+    potential = args.potential
     path = f'/work/home/jyzhang/bdt-W/{potential}'
     crack_systems = [i for i in range(1,8)]
     Temp = ['300', '1600']
@@ -73,72 +501,34 @@ if __name__ == "__main__":
 
     Kc_file = f'{path}/Kc.txt'
     os.makedirs(f'{path}/pic', exist_ok=True)
-    
+
+    jobs = []
+    for i in crack_systems:
+        for j in Temp:
+            record_file = f"{path}/log/{i}-{j}-record"
+            if not os.path.exists(record_file):
+                print(f"Record file {record_file} does not exist. Skipping!!!")
+                continue
+            jobs.append((i, j))
+
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    if workers > 1:
+        results = process_parallel(path, jobs, workers, not args.no_cache, args.native, args.prefilter)
+
+    rejected = np.zeros(3, dtype=int)
     with open(Kc_file, 'w') as kcfout:
         kcfout.write('crack-system Temp Kc event-type disl-count\n') 
-        for i in crack_systems:
-            for j in Temp:
+        for i, j in jobs:
+            if workers > 1:
+                result = results[(i, j)]
+            else:
                 print("==========================")
                 print(f"Processing system {i} at {j}K")
+                result = process_system(path, i, j, not args.no_cache, args.native, args.prefilter)
+            write_results(path, i, j, result, kcfout)
+            counts = stage_counts(result[0])
+            rejected += counts
+            print(f"DXA gate: {counts[0]} frames rejected by the prefilter, {counts[1]} by DXA, {counts[2]} with dislocations.")
 
-                record_file = f"{path}/log/{i}-{j}-record"
-                if not os.path.exists(record_file):
-                    print(f"Record file {record_file} does not exist. Skipping!!!")
-                    continue
-
-                new_record = f"{path}/log/[proc]{i}-{j}-record"
-                flag_b = 0
-                flag_d = 0
-                with open(record_file, 'r') as fin, open(new_record, 'w') as fout:
-                    fout.write('step K crack-length\n')
-                    next(fin)
-
-                    for line in fin:
-                        step = line.split()[0]
-                        K = line.split()[1]
-                        datafile = f'{path}/dump/{i}/{j}/W_{i}_{j}_{step}_eq.data'
-
-                        if not os.path.exists(datafile):
-                            print(f"Data file {datafile} does not exist. Skipping step {step}!!!")
-                            continue
-
-                        if step == '1':
-                            pre_l = precracked_length(datafile)
-                        
-                        l = measure_crack_length(datafile)
-                        fout.write(f"{step} {K} {l:.5f}\n")
-
-                        if flag_d == 0 and flag_b == 0:
-                            if count_dislocation(datafile) > 0:
-                                flag_d = 1
-                                kc = K
-                                event_type = 'disl-emission'
-                                print(f"Dislocation emission detected at K={K}.")
-                            elif (l - pre_l) > 2:
-                                flag_b = 1
-                                kc = K
-                                event_type = 'cleavage'
-                                print(f"Cleavage detected at K={K}.")
-
-                    if kc is None:
-                        print(f"No critical K found!")
-                        kcfout.write(f"{i} {j} - no-event -\n")
-                    final_dislocation_count = count_dislocation(datafile)
-                    kcfout.write(f"{i} {j} {kc} {event_type} {final_dislocation_count}\n")
-
-                print(f"Finished processing.")
-
-                Ks = np.loadtxt(new_record, skiprows=1, usecols=1)
-                crack_lengths = np.loadtxt(new_record, skiprows=1, usecols=2)
-                
-                plt.figure()
-                plt.plot(Ks, crack_lengths, '-o')
-                plt.minorticks_on()
-                plt.xlabel(r'K ($\mathrm{MPa\sqrt{m}}$)')
-                plt.ylabel('Crack Length (Å)')
-                plt.axhline(y=pre_l, color='r', linestyle='--', label='precrack length')
-                plt.axvline(x=float(kc), color='g', linestyle='--', label=f'{event_type}')
-                plt.title(f'System {i} at {j}K')
-                plt.legend()
-                plt.savefig(f'{path}/pic/{i}-{j}.png')        
-                print("Plot saved.")
+    print("==========================")
+    print(f"DXA gate, all systems: {rejected[0]} frames rejected by the prefilter, {rejected[1]} by DXA, {rejected[2]} with dislocations.")
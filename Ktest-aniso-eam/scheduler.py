@@ -0,0 +1,152 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : scheduler.py
+# Time       ：2026/10/18 23:30
+# Author     ：oWoo
+# Description：Adaptive K stepping. The ramp takes coarse steps of dK; when a relaxed
+#              step shows a critical event, LAMMPS goes back to the last step without
+#              an event (its checkpoint) and dK is halved, until dK <= resolution.
+#              Every relaxed step is written to the record file with its parent, so the
+#              record holds the step tree:
+#                  step K parent dK event
+#              Steps are numbered in the order they were relaxed; process.py sorts
+#              the frames by K. Dislocation emission is confirmed with DXA before a
+#              step counts as an event (frames that pass the prefilter only).
+# Input: system index, T, K_initial, K_final, dK, resolution (units: MPa*m^1/2), potential, p_name
+"""
+import argparse
+import os
+import sys
+
+from kramp import LammpsBackend, MockBackend, setup, apply_kernel, find_step, shared_kernel
+from displace_dump import parse_system_data
+from checkpoint import CheckpointStore, read_frame
+from crack_tip import CrackTipTracker, EmissionPrefilter
+from detect import frame_event, load_step
+from lmpio import read_dump_header
+
+
+def restore(backend, dump_dir, idx, T, step, store=None):
+    # load the relaxed configuration of step back into LAMMPS (positions, velocities and box)
+    dumpfile = f'{dump_dir}/W_{idx}_{T}_{step}_eq.data'
+    if not os.path.exists(dumpfile) and store is not None and backend.rank == 0:
+        store.export_dump(step, dumpfile)
+    backend.bcast(None)     # the file is there before any rank reads it
+    timestep = read_dump_header(dumpfile)['timestep']
+    backend.command(f'read_dump {dumpfile} {timestep} x y z vx vy vz box yes replace yes')
+
+
+def run_schedule(backend, potential, p_name, idx, T, K_initial, K_final, dK, resolution, nrun=15000, store=None,
+                 dxa=True):
+    """
+    Returns (K below the event, K of the event) with dK <= resolution between
+    them, or None when K_final is reached without an event.
+    dxa: emission events confirmed by DXA, not by the prefilter alone.
+    """
+    dump_dir = f'{potential}/dump/{idx}/{T}'
+    record = f'{potential}/log/{idx}-{T}-record'
+    coeff = parse_system_data(f'{potential}/p_func/apq.txt', idx)
+    kernel = shared_kernel(backend, f'{potential}/kernel/W_{idx}_{T}.npz', f'{dump_dir}/W_{idx}_{T}_0_eq.data', coeff)
+
+    if K_initial == 0:
+        cur_step = 0
+        last_step = 0
+        if backend.rank == 0:
+            with open(record, 'w') as f:
+                f.write('step K parent dK event\n')
+    else:
+        cur_step = find_step(record, K_initial)
+        with open(record, 'r') as f:
+            last_step = max(int(line.split()[0]) for line in list(f)[1:] if line.strip() and not line.startswith('#'))
+    cur_K = K_initial
+
+    start_file = f'{dump_dir}/W_{idx}_{T}_{cur_step}_eq.data'
+    if not os.path.exists(start_file) and store is not None and store.has(cur_step):
+        if backend.rank == 0:       # read_dump only reads the file on rank 0
+            store.export_dump(cur_step, start_file)
+    setup(backend, potential, p_name, idx, T, start_file)
+
+    tracker = CrackTipTracker()
+    tips = {}
+    prefilter = EmissionPrefilter(load_step(potential, idx, T, 0)) if backend.rank == 0 else None
+    K_event = None      # lowest K relaxed so far that showed an event
+    event_type = None
+    while round(cur_K + dK, 6) <= K_final + 1e-9:
+        new_K = round(cur_K + dK, 6)
+        if K_event is not None and new_K >= K_event - 1e-9:
+            # the event is already known at or below new_K: no need to relax it again
+            if dK <= resolution + 1e-9:
+                break
+            dK = round(dK / 2, 6)
+            continue
+
+        ids, x = backend.local_positions()
+        apply_kernel(ids, x, kernel, dK * 100000)      # m^1/2 to Å^1/2
+        last_step += 1
+
+        backend.command(f'run {nrun}')
+        dumpfile = f'{dump_dir}/W_{idx}_{T}_{last_step}_eq.data'
+        backend.command(f'write_dump all custom {dumpfile} id type mass x y z vx vy vz modify sort id')
+
+        event = None
+        if backend.rank == 0:
+            frame = read_frame(dumpfile)
+            tracker.tip = tips.get(cur_step)
+            res = tracker.update(frame)
+            tips[last_step] = res['tip']
+            event = frame_event(frame, res['crack_length'], res['tip'], prefilter, dxa)
+            with open(record, 'a') as f:
+                f.write(f'{last_step} {new_K:.6f} {cur_step} {dK:.6f} {event or "-"}\n')
+            if store is not None:
+                store.import_dump(last_step, dumpfile, remove=True)
+            print(f"step: {last_step}  K: {new_K:.6f}  parent: {cur_step}  dK: {dK:.6f}  event: {event or '-'}", flush=True)
+        event = backend.bcast(event)
+
+        if event is None:
+            cur_step, cur_K = last_step, new_K
+            continue
+        K_event, event_type = new_K, event
+        if dK <= resolution + 1e-9:
+            break
+        # back to the last step without an event, with half the increment
+        dK = round(dK / 2, 6)
+        restore(backend, dump_dir, idx, T, cur_step, store)
+
+    if K_event is None:
+        return None
+    if backend.rank == 0:
+        print(f"Critical K between {cur_K:.6f} and {K_event:.6f} ({event_type}).", flush=True)
+    return cur_K, K_event
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Adaptive K ramp with bisection around the critical K.')
+    parser.add_argument('index', type=int)
+    parser.add_argument('T', type=int)
+    parser.add_argument('K_initial', type=float)
+    parser.add_argument('K_final', type=float)
+    parser.add_argument('dK', type=float, help='coarse increment, units: MPa*m^1/2')
+    parser.add_argument('resolution', type=float, help='dK at which the bisection stops, units: MPa*m^1/2')
+    parser.add_argument('potential')
+    parser.add_argument('p_name')
+    parser.add_argument('--nrun', type=int, default=15000, help='relaxation steps per K increment')
+    parser.add_argument('--store', action='store_true', help='keep the relaxed steps in the binary checkpoint store')
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float64'], help='checkpoint store precision')
+    parser.add_argument('--no-dxa', action='store_true', help='dislocation emission from the prefilter alone (no OVITO)')
+    parser.add_argument('--mock', action='store_true', help='use the mock backend instead of LAMMPS')
+    args = parser.parse_args()
+
+    backend = MockBackend() if args.mock else LammpsBackend()
+    store = CheckpointStore(args.potential, args.index, args.T, args.dtype) if args.store else None
+    try:
+        if store is not None and backend.rank == 0 and not store.has(0):
+            store.import_dump(0, f'{args.potential}/dump/{args.index}/{args.T}/W_{args.index}_{args.T}_0_eq.data')
+        run_schedule(backend, args.potential, args.p_name, args.index, args.T,
+                     args.K_initial, args.K_final, args.dK, args.resolution, args.nrun, store, not args.no_dxa)
+    except FileNotFoundError as e:
+        print(f"Error: Input file not found:{e.filename}")
+        sys.exit(1)
+    finally:
+        backend.close()
@@ -13,7 +13,6 @@ module purge
 source /work/home/jyzhang/apprepo/lammps/stable.29Aug2024-intelmpi2021/scripts/env.sh
 export UCX_IB_ADDR_TYPE=ib_global
 export I_MPI_PMI_LIBRARY=/opt/gridview/slurm/lib/libpmi.so
-export PATH=$PATH:/work/home/jyzhang/bin/atomsk
 source /work/home/jyzhang/apprepo/miniconda3/etc/profile.d/conda.sh
 conda activate base
 
@@ -34,18 +33,28 @@ if (( $(echo "$K_initial == 0" | bc -l) )); then
         rm "$record"
     fi
     echo "step K" >> $record
+    python detect.py ${index} ${Temp} 0 ${potential} --reset
     now_step=0
     now_K=0
     ini_data="$potential/config/dynamic/W_${index}_${Temp}.data"
     
     #--------------- generate initial data at T ---------------
-    if [ ! -f "$ini_data" ]; then
+    if [ ! -f "$ini_data" ] && python prep_cache.py fetch ${index} ${Temp} ${potential} ${p_name} >> $outlog; then
+        # same script, T, idx, potential file and input .lmp prepared before (prep_cache.py)
+        echo "Took the initial configuration at temperature $Temp with K=0 from the preparation cache." >> $outlog
+        echo >> $outlog
+    elif [ ! -f "$ini_data" ] && [[ "$warm" == "1" ]] && srun --mpi=pmix_v3 python warm_start.py ${index} ${Temp} ${potential} ${p_name} >> $outlog; then
+        # rescaled from the nearest equilibrated temperature of this crack system, short NPT (warm_start.py)
+        echo "Warm-started the initial configuration at temperature $Temp with K=0." >> $outlog
+        echo >> $outlog
+    elif [ ! -f "$ini_data" ]; then
         srun --mpi=pmix_v3 lmp_mpi -var T ${Temp} -var idx ${index} -var potential $potential -var p_name $p_name -in in.crack1-aniso-ini
     
         if [[ $? -ne 0 ]]; then
             echo "Initiaization failed!!!" >> $outlog
             exit 2
         fi
+        python prep_cache.py store ${index} ${Temp} ${potential} ${p_name} >> $outlog
     
         echo "Generated the initial configuration at temperature $Temp with K=0." >> $outlog
         echo >> $outlog
@@ -76,6 +85,36 @@ elif [ -f "$record" ]; then
 fi
 
 # ------------- Apply K incrementally ---------------
+if [[ "$adaptive" == "1" ]]; then
+    # coarse steps of dK, then bisection down to resolution around the critical K (scheduler.py)
+    echo "Start to apply K adaptively..." >> $outlog
+    srun --mpi=pmix_v3 python scheduler.py ${index} ${Temp} ${K_initial} ${K_final} ${dK} ${resolution} ${potential} ${p_name} >> $outlog
+    if [[ $? -ne 0 ]]; then
+        echo "Adaptive K ramp failed!!!" >> $outlog
+        exit 4
+    fi
+    echo "Finished job: Temp=$Temp, index=$index, K_initial=$K_initial, K_final=$K_final" >> $outlog
+    echo "~~~~~~~*******~~~~~~" >> $outlog
+    exit 0
+fi
+
+if [[ "$inproc" == "1" ]]; then
+    # keep one LAMMPS instance alive for the whole ramp (kramp.py)
+    echo "Start to apply K incrementally in-process..." >> $outlog
+    detect_opt=""
+    if [[ "$detect" == "1" ]]; then
+        detect_opt="--confirm ${confirm}"
+    fi
+    srun --mpi=pmix_v3 python kramp.py ${index} ${Temp} ${K_initial} ${K_final} ${dK} ${potential} ${p_name} ${detect_opt} >> $outlog
+    if [[ $? -ne 0 ]]; then
+        echo "In-process K ramp failed!!!" >> $outlog
+        exit 4
+    fi
+    echo "Finished job: Temp=$Temp, index=$index, K_initial=$K_initial, K_final=$K_final" >> $outlog
+    echo "~~~~~~~*******~~~~~~" >> $outlog
+    exit 0
+fi
+
 max_iter=$(echo "($K_final - $K_initial) / $dK + $now_step" | bc)
 echo "maxiter: $max_iter" >> $outlog
 echo >> $outlog
@@ -93,8 +132,7 @@ while [[ $now_step -lt $max_iter ]]; do
     echo "now_step: $now_step" >> $outlog
     echo "now_K: $now_K" >> $outlog
 
-    datafile="$potential/dump/${index}/${Temp}/W_${index}_${Temp}_${now_step}.data"
-    lmpfile="$potential/dump/${index}/${Temp}/W_${index}_${Temp}_${now_step}.lmp"
+    lmpfile="$potential/dump/${index}/${Temp}/W_${index}_${Temp}_${now_step}.lmp"    # written by displace_dump.py in read_data format
 
     if [[ $status -ne 0 ]]; then
 	    echo "Displace atoms failed!!!" >> $outlog
@@ -102,15 +140,7 @@ while [[ $now_step -lt $max_iter ]]; do
 	    exit 3
     else
         echo "Displace atoms finished." >> $outlog
-        atomsk $datafile $lmpfile
-        if [[ $? -eq 0 ]]; then
-            rm $datafile
-            echo "Convert data format finised." >> $outlog
-            echo >> $outlog
-        else
-            echo "Convert data format failed!!!" >> $outlog
-            exit 4
-        fi
+        echo >> $outlog
     fi
     
     srun --mpi=pmix_v3 lmp_mpi -var T ${Temp} -var idx ${index} -var now_step ${now_step} -var potential $potential -var p_name $p_name -in in.crack1-aniso-rlx
@@ -124,6 +154,20 @@ while [[ $now_step -lt $max_iter ]]; do
         rm $lmpfile
 	    echo >> $outlog
     fi
+
+    # ------------- online critical-event detection ---------------
+    if [[ "$detect" == "1" ]]; then
+        python detect.py ${index} ${Temp} ${now_step} ${potential} --confirm ${confirm} >> $outlog
+        status=$?
+        if [[ $status -eq 10 ]]; then
+            echo "Critical event confirmed, stop applying K." >> $outlog
+            echo >> $outlog
+            break
+        elif [[ $status -ne 0 ]]; then
+            echo "Online detection failed (exit code $status) at step $now_step, K keeps increasing!!!" >> $outlog
+            echo >> $outlog
+        fi
+    fi
     
 done
 
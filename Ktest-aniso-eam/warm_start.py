@@ -0,0 +1,220 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : warm_start.py
+# Time       ：2026/10/19 18:10
+# Author     ：oWoo
+# Description：Warm start of the initial configuration at T: instead of the minimizations
+#              and the 20000 NPT steps of in.crack1-aniso-ini, the equilibrated
+#              configuration of the same crack system at the nearest temperature T0
+#              (config/dynamic/W_{idx}_{T0}.data) is rescaled to T and relaxed with
+#              in.crack1-aniso-warm:
+#                  box and positions  x (1 + strain(T) ) / (1 + strain(T0)), per axis, fitted
+#                                     to the boxes of the temperatures already equilibrated
+#                                     (linear in T), or alpha*(T - T0) if there is only one
+#                  velocities         x sqrt(T / T0)
+#              The NPT run is done in chunks of check steps and stops once the averaged
+#              temperature of the mobile atoms is within ttol of T and the averaged box
+#              lengths changed by less than ltol since the previous chunk. Without
+#              convergence within max_steps no configuration is written (exit code 2),
+#              and submit.sh / campaign.py fall back to in.crack1-aniso-ini.
+# Usage:
+#   python warm_start.py <index> <T> <potential> <p_name> [--from T0] [--alpha 4.5e-6] [--check 1000] [--max-steps 10000]
+#   mpirun -np 64 python warm_start.py ...
+#   exit code 1: no equilibrated temperature to start from, 2: not converged
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+
+import numpy as np
+
+from checkpoint import read_frame, write_frame_data
+from lmpio import read_dump_header
+
+RUN_BEGIN = '# ---- equilibration run ----'
+RUN_END = '# ---- end of equilibration run ----'
+
+
+def split_input(filename):
+    # in.crack1-aniso-warm before and after the equilibration run
+    with open(filename) as f:
+        text = f.read()
+    head, rest = text.split(RUN_BEGIN, 1)
+    _, tail = rest.split(RUN_END, 1)
+    return head, tail
+
+
+def equilibrated(potential, idx):
+    # {T: config/dynamic/W_{idx}_{T}.data} of the temperatures already equilibrated
+    found = {}
+    for filename in glob.glob(f'{potential}/config/dynamic/W_{idx}_*.data'):
+        m = re.fullmatch(rf'W_{idx}_(\d+)\.data', os.path.basename(filename))
+        if m:
+            found[int(m.group(1))] = filename
+    return found
+
+
+def sources(potential, idx, T):
+    # equilibrated temperatures a warm start at T can start from
+    return {t: f for t, f in equilibrated(potential, idx).items() if t != T and t > 0}
+
+
+def nearest(temps, T):
+    # closest temperature, the lower one of a tie
+    return min(temps, key=lambda t: (abs(t - T), t))
+
+
+def expansion(boxes, T0, T, alpha=4.5e-6):
+    """
+    Ratio of the box lengths at T and at T0, per axis. boxes: {T: (lx, ly, lz)}.
+    With two or more temperatures the lengths are fitted linearly in T,
+    otherwise the linear thermal expansion coefficient alpha (1/K) is used.
+    """
+    if len(boxes) < 2:
+        return np.full(3, 1 + alpha * (T - T0))
+    temps = sorted(boxes)
+    L = np.array([boxes[t] for t in temps])
+    ratio = np.empty(3)
+    for axis in range(3):
+        fit = np.polyfit(temps, L[:, axis], 1)
+        ratio[axis] = np.polyval(fit, T) / np.polyval(fit, T0)
+    return ratio
+
+
+def rescale(frame, ratio, T0, T):
+    # box and positions scaled about the box centre, velocities to T
+    box = frame['box']
+    centre = box.mean(axis=1)
+    frame = dict(frame)
+    frame['box'] = centre[:, None] + (box - centre[:, None]) * ratio[:, None]
+    frame['x'] = centre + (frame['x'] - centre) * ratio
+    frame['v'] = frame['v'] * np.sqrt(T / T0)
+    return frame
+
+
+def prepare(potential, idx, T, src, T0=None, alpha=4.5e-6):
+    """
+    Writes the rescaled configuration of the nearest equilibrated temperature to src
+    (read_data format). Returns (T0, ratio), or None if there is nothing to start from.
+    """
+    found = sources(potential, idx, T)
+    if T0 is None:
+        if not found:
+            return None
+        T0 = nearest(found, T)
+    elif T0 not in found:
+        return None
+    boxes = {}
+    for t, filename in found.items():
+        box = read_dump_header(filename)['box']
+        boxes[t] = box[:, 1] - box[:, 0]
+    ratio = expansion(boxes, T0, T, alpha)
+    frame = rescale(read_frame(found[T0]), ratio, T0, T)
+    write_frame_data(src, frame, ntypes=4)
+    return T0, ratio
+
+
+def warm_record(potential, idx, T):
+    # last line of log/warm-start.txt for (idx, T): idx T T0 steps temp lx ly lz converged, or None
+    record = None
+    filename = f'{potential}/log/warm-start.txt'
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            for line in f:
+                words = line.split()
+                if len(words) == 9 and int(words[0]) == idx and int(words[1]) == T:
+                    record = words
+    return record
+
+
+def equilibrate(lmp, T, head, tail, check, min_steps, max_steps, ttol, ltol):
+    """
+    NPT run of in.crack1-aniso-warm in chunks of check steps until converged; the
+    rest of the input (write_dump of the configuration) only runs when it converged.
+    Returns (steps run, converged, [temp, lx, ly, lz] of the last chunk).
+    """
+    from lammps import LMP_STYLE_GLOBAL, LMP_TYPE_VECTOR
+    rank = lmp.extract_setting('world_rank')
+
+    lmp.commands_string(head)
+    done = 0
+    prev = None
+    ave = None
+    converged = False
+    while done < max_steps:
+        n = min(check, max_steps - done)
+        lmp.command(f'run {n}' if done == 0 else f'run {n} pre no')
+        done += n
+        # global values of fix ave/time, the same on every rank
+        ave = np.array([lmp.extract_fix('eq_ave', LMP_STYLE_GLOBAL, LMP_TYPE_VECTOR, i) for i in range(4)])
+        if rank == 0:
+            print(f"step {done}: T = {ave[0]:.2f} K, box = {ave[1]:.4f} {ave[2]:.4f} {ave[3]:.4f}", flush=True)
+        if prev is not None and done >= min_steps:
+            converged = abs(ave[0] - T) < ttol * T and bool(np.all(np.abs(ave[1:] - prev[1:]) < ltol * ave[1:]))
+            if converged:
+                break
+        prev = ave
+
+    if converged:
+        lmp.commands_string(tail)
+    return done, converged, ave
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Equilibration at T started from the nearest equilibrated temperature.')
+    parser.add_argument('index', type=int)
+    parser.add_argument('T', type=int)
+    parser.add_argument('potential')
+    parser.add_argument('p_name')
+    parser.add_argument('--from', dest='T0', type=int, default=None, help='start from this temperature (default: nearest)')
+    parser.add_argument('--alpha', type=float, default=4.5e-6,
+                        help='linear thermal expansion coefficient (1/K), used with a single equilibrated temperature')
+    parser.add_argument('--check', type=int, default=1000, help='steps averaged between convergence checks, a multiple of 10')
+    parser.add_argument('--min-steps', type=int, default=2000)
+    parser.add_argument('--max-steps', type=int, default=10000, help='longest NPT run (in.crack1-aniso-ini: 20000)')
+    parser.add_argument('--ttol', type=float, default=0.02, help='relative tolerance of the mobile temperature')
+    parser.add_argument('--ltol', type=float, default=2e-4, help='relative change of the box lengths between checks')
+    parser.add_argument('--input', default='in.crack1-aniso-warm')
+    args = parser.parse_args()
+
+    if args.check % 10:
+        sys.exit(f"Error: --check ({args.check}) must be a multiple of 10")
+
+    idx, T, potential = args.index, args.T, args.potential
+    src = f'{potential}/config/dynamic/W_{idx}_{T}-warm.lmp'
+    from lammps import lammps
+    lmp = lammps(cmdargs=['-log', f'{potential}/log/{idx}-{T}-warm.lammps', '-screen', 'none',
+                          '-var', 'T', str(T), '-var', 'idx', str(idx), '-var', 'potential', potential,
+                          '-var', 'p_name', args.p_name, '-var', 'src', src,
+                          '-var', 'nsteps', str(args.max_steps), '-var', 'check', str(args.check)])
+    rank = lmp.extract_setting('world_rank')
+    if lmp.extract_setting('world_size') > 1:
+        from mpi4py import MPI
+        bcast = MPI.COMM_WORLD.bcast
+    else:
+        bcast = lambda obj, root=0: obj
+
+    start = prepare(potential, idx, T, src, args.T0, args.alpha) if rank == 0 else None
+    start = bcast(start, root=0)
+    if start is None:
+        lmp.close()
+        if rank == 0:
+            print(f"W_{idx}_{T}: no equilibrated temperature to start from")
+        sys.exit(1)
+
+    T0, ratio = start
+    head, tail = split_input(args.input)
+    steps, converged, ave = equilibrate(lmp, T, head, tail, args.check, args.min_steps, args.max_steps,
+                                        args.ttol, args.ltol)
+    if rank == 0:
+        os.remove(src)
+        print(f"W_{idx}_{T}: from {T0} K (box x {' '.join(f'{r:.6f}' for r in ratio)}), {steps} NPT steps, "
+              f"{'converged' if converged else 'NOT converged'}: T = {ave[0]:.2f} K")
+        with open(f'{potential}/log/warm-start.txt', 'a') as f:
+            f.write(f"{idx} {T} {T0} {steps} {ave[0]:.4f} {ave[1]:.6f} {ave[2]:.6f} {ave[3]:.6f} {int(converged)}\n")
+    lmp.close()
+    sys.exit(0 if converged else 2)
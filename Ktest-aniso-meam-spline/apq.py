@@ -7,11 +7,17 @@
 # Author     ：oWoo
 # Description：Read crack systems from Excel, rotate cubic stiffness tensor,
 #              compute stiffness (C), compliance (S), and extract a1, a2, p1, p2, q1, q2.
+#              --material W.json -T 600: C11, C12, C44 and surface energies at T from the
+#              model of materials.py instead of the values below.
 """
+import argparse
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from materials import MaterialModel
+
 # Voigt notation mappings
 voigt_pairs = {
     0: (0, 0),
@@ -109,11 +115,16 @@ def compute_pq(Sp, Sp16, Sp26, a1, a2):
     return p1, p2, q1, q2
 
 
-def process(input, output, apq_output, C11, C12, C44):
-    df = pd.read_excel(input)
+# Voigt index of each (i, j) tensor pair, used to vectorize the conversions
+voigt_index = np.array([[0, 5, 4],
+                        [5, 1, 3],
+                        [4, 3, 2]])
+voigt_i = np.array([voigt_pairs[I][0] for I in range(6)])
+voigt_j = np.array([voigt_pairs[I][1] for I in range(6)])
+
 
-    # Define initial cubic stiffness matrix
-    C_cubic = np.array([
+def cubic_stiffness(C11, C12, C44):
+    return np.array([
         [C11, C12, C12, 0, 0, 0],
         [C12, C11, C12, 0, 0, 0],
         [C12, C12, C11, 0, 0, 0],
@@ -121,49 +132,124 @@ def process(input, output, apq_output, C11, C12, C44):
         [0, 0, 0, 0, C44, 0],
         [0, 0, 0, 0, 0, C44]
     ])
-    S = []
 
-    with open(output, 'w') as f1, open(apq_output, 'w') as f2:
-        for idx, row in df.iterrows():
-            system_id = int(row['No.'])
 
-            a = normalize(np.array([row['a1'], row['a2'], row['a3']]))
-            b = normalize(np.array([row['b1'], row['b2'], row['b3']]))
-            c = normalize(np.array([row['c1'], row['c2'], row['c3']]))
+def rotation_matrices(a, b, c):
+    # a, b, c: (N,3) crack-front, propagation and plane-normal directions
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    c = c / np.linalg.norm(c, axis=1, keepdims=True)
+    return np.stack([a, b, c], axis=2)      # columns are a, b, c, same as np.vstack([a, b, c]).T
+
+
+def rotate_stiffness_batch(C_voigt, R):
+    # C_voigt: (6,6), R: (N,3,3) -> (N,6,6)
+    C_tensor = C_voigt[voigt_index[:, :, None, None], voigt_index[None, None, :, :]]
+    # contract one index at a time, (N*81*3) work per step instead of the full 8-index einsum
+    C_rot = np.einsum('nld,abcd->nabcl', R, C_tensor)
+    C_rot = np.einsum('nkc,nabcl->nabkl', R, C_rot)
+    C_rot = np.einsum('njb,nabkl->najkl', R, C_rot)
+    C_rot = np.einsum('nia,najkl->nijkl', R, C_rot)
+    i, j = voigt_i[:, None], voigt_j[:, None]
+    k, l = voigt_i[None, :], voigt_j[None, :]
+    return 0.25 * (C_rot[:, i, j, k, l] + C_rot[:, j, i, k, l] +
+                   C_rot[:, i, j, l, k] + C_rot[:, j, i, l, k])
+
+
+def extract_Sp_batch(S):
+    # S: (N,6,6) -> Sp (N,3,3), Sp16, Sp26, Sp66 (N,)
+    S33 = S[:, 2, 2]
+    Sp = S[:, :3, :3] - S[:, :3, 2, None] * S[:, None, 2, :3] / S33[:, None, None]
+    Sp16 = S[:, 0, 5] - S[:, 0, 2] * S[:, 2, 5] / S33
+    Sp26 = S[:, 1, 5] - S[:, 1, 2] * S[:, 2, 5] / S33
+    Sp66 = S[:, 5, 5] - S[:, 5, 2] * S[:, 2, 5] / S33
+    return Sp, Sp16, Sp26, Sp66
+
+
+def solve_characteristic_eq_batch(Sp11, Sp12, Sp22, Sp16, Sp26, Sp66):
+    # Batched np.roots: eigenvalues of the (N,4,4) companion matrices, built the same way as np.roots
+    coeffs = np.stack([Sp11,
+                       -2 * Sp16,
+                       2 * Sp12 + Sp66,
+                       -2 * Sp26,
+                       Sp22], axis=1)
+    n = coeffs.shape[0]
+    companion = np.zeros((n, 4, 4))
+    companion[:, 0, :] = -coeffs[:, 1:] / coeffs[:, :1]
+    companion[:, np.arange(1, 4), np.arange(3)] = 1.0
+    return np.linalg.eigvals(companion)
+
+
+def select_upper_roots(roots):
+    # pick the two roots with positive imaginary part, keeping the np.roots order
+    upper = roots.imag > 0
+    if np.any(upper.sum(axis=1) != 2):
+        bad = np.flatnonzero(upper.sum(axis=1) != 2)
+        raise ValueError(f"Characteristic equation does not have two complex roots for rows {bad.tolist()}")
+    order = np.argsort(~upper, axis=1, kind='stable')
+    return roots[np.arange(roots.shape[0]), order[:, 0]], roots[np.arange(roots.shape[0]), order[:, 1]]
+
+
+def compute_apq_batch(C11, C12, C44, R):
+    """
+    Vectorized C, S and a/p/q for a stack of orientations.
+    R: (N,3,3) rotation matrices with columns (a, b, c).
+    Returns C (N,6,6), S (N,6,6) and a1, a2, p1, p2, q1, q2 as (N,) complex arrays.
+    """
+    R = np.asarray(R, dtype=float).reshape(-1, 3, 3)
+    C = rotate_stiffness_batch(cubic_stiffness(C11, C12, C44), R)
+    S = np.linalg.inv(C)
 
-            R = np.vstack([a, b, c]).T
-            C_rot = rotate_stiffness_tensor(C_cubic, R)
-            S_rot = np.linalg.inv(C_rot)
-            S.append(S_rot)
+    Sp, Sp16, Sp26, Sp66 = extract_Sp_batch(S)
+    roots = solve_characteristic_eq_batch(Sp[:, 0, 0], Sp[:, 0, 1], Sp[:, 1, 1], Sp16, Sp26, Sp66)
+    a1, a2 = select_upper_roots(roots)
 
+    Sp11, Sp12, Sp22 = Sp[:, 0, 0], Sp[:, 0, 1], Sp[:, 1, 1]
+    p1 = Sp11 * a1**2 + Sp12 - Sp16 * a1
+    p2 = Sp11 * a2**2 + Sp12 - Sp16 * a2
+    q1 = Sp22 / a1 + Sp12 * a1 - Sp26
+    q2 = Sp22 / a2 + Sp12 * a2 - Sp26
+    return C, S, a1, a2, p1, p2, q1, q2
+
+
+def process(input, output, apq_output, C11, C12, C44):
+    df = pd.read_excel(input)
+
+    R = rotation_matrices(df[['a1', 'a2', 'a3']].to_numpy(dtype=float),
+                          df[['b1', 'b2', 'b3']].to_numpy(dtype=float),
+                          df[['c1', 'c2', 'c3']].to_numpy(dtype=float))
+    C, S, a1, a2, p1, p2, q1, q2 = compute_apq_batch(C11, C12, C44, R)
+
+    with open(output, 'w') as f1, open(apq_output, 'w') as f2:
+        for n, system_id in enumerate(df['No.'].astype(int)):
             f1.write(f"System {system_id}:\n")
             f1.write("C_rotated (GPa):\n")
-            for line in C_rot:
+            for line in C[n]:
                 f1.write("  " + "  ".join(f"{v:10.4f}" for v in line) + "\n")
 
             f1.write("S_rotated (1/GPa):\n")
-            for line in S_rot:
+            for line in S[n]:
                 f1.write("  " + "  ".join(f"{v:10.6f}" for v in line) + "\n")
 
             f1.write("\n" + "=" * 60 + "\n\n")
 
-            Sp, Sp16, Sp26, Sp66 = extract_Sp(S_rot)
-            a_roots = solve_characteristic_eq(Sp[0, 0], Sp[0, 1], Sp[1, 1], Sp16, Sp26, Sp66)
-            positive_a_roots = [root for root in a_roots if root.imag > 0]
-            a1, a2 = positive_a_roots[0], positive_a_roots[1]
-            p1, p2, q1, q2 = compute_pq(Sp, Sp16, Sp26, a1, a2)
-
             f2.write(f"System {system_id}:")
-            f2.write(f"\na1 = {a1.real:.6f} + {a1.imag:.6f}j")
-            f2.write(f"\na2 = {a2.real:.6f} + {a2.imag:.6f}j")
-            f2.write(f"\np1 = {p1.real:.6f} + {p1.imag:.6f}j")
-            f2.write(f"\np2 = {p2.real:.6f} + {p2.imag:.6f}j")
-            f2.write(f"\nq1 = {q1.real:.6f} + {q1.imag:.6f}j")
-            f2.write(f"\nq2 = {q2.real:.6f} + {q2.imag:.6f}j")
+            f2.write(f"\na1 = {a1[n].real:.6f} + {a1[n].imag:.6f}j")
+            f2.write(f"\na2 = {a2[n].real:.6f} + {a2[n].imag:.6f}j")
+            f2.write(f"\np1 = {p1[n].real:.6f} + {p1[n].imag:.6f}j")
+            f2.write(f"\np2 = {p2[n].real:.6f} + {p2[n].imag:.6f}j")
+            f2.write(f"\nq1 = {q1[n].real:.6f} + {q1[n].imag:.6f}j")
+            f2.write(f"\nq2 = {q2[n].real:.6f} + {q2[n].imag:.6f}j")
             f2.write("\n" + "-" * 50 + "\n")
     return S
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='C/S tensors and a/p/q constants of the crack systems.')
+    parser.add_argument('--material', help='json model of materials.py: C11, C12, C44 and surface energies at T')
+    parser.add_argument('-T', type=float, default=300, help='temperature for --material')
+    parser.add_argument('--extrapolate', action='store_true', help='use --material outside its fitted temperatures')
+    args = parser.parse_args()
+
     C11 = 423.283   # unit: GPa
     C12 = 143.104
     C44 = 95.474
@@ -172,10 +258,21 @@ if __name__ == '__main__':
     input = f'{filepath}/crack systems.xlsx'
     output = f'/Users/kaioneer/Documents/BDT data/properties/2012--Park-H-Fellinger-M-R-Lenosky-T-J-et-al--Mo/CS-Park_MEAM_Mo_2012.spline.txt'
     apq_output = f'/Users/kaioneer/Documents/BDT data/properties/2012--Park-H-Fellinger-M-R-Lenosky-T-J-et-al--Mo/apq-Park_MEAM_Mo_2012.spline.txt'
+
+    gammas = list(pd.read_excel(input)['surface energy (J/m2)'])    # unit: J/m2
+    model = MaterialModel.load(args.material) if args.material else None
+    if model is not None:
+        model.extrapolate = args.extrapolate
+        try:
+            C11, C12, C44 = (float(v) for v in model.elastic(args.T))
+            gammas = [float(model.gamma(f, args.T)) for f in pd.read_excel(input)['crack surface']]
+        except ValueError as e:
+            parser.error(str(e))
+        output = output.replace('.txt', f'-{args.T:g}K.txt')
+        apq_output = apq_output.replace('.txt', f'-{args.T:g}K.txt')
     S = process(input, output, apq_output, C11, C12, C44)
 
     # compute theoretical fracture toughness according to the Griffith concept
-    gammas = list(pd.read_excel(input)['surface energy (J/m2)'])    # unit: J/m2
 
     K_I = []
     for i in range(len(gammas)):
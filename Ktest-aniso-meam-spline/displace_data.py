@@ -10,9 +10,10 @@
 """
 import numpy as np
 import sys
-import cmath
 import re
-import math
+
+from kfield import k_field_displacement, match_ids, cached_kernel
+from lmpio import read_data, replace_section
 
 
 def parse_system_data(filename, index):
@@ -44,76 +45,32 @@ def parse_system_data(filename, index):
 
     return a1, a2, p1, p2, q1, q2
 
-def displace_atoms(forg, fin, fout, dK, coeff):
-    a1, a2, p1, p2, q1, q2 = coeff
-
-    flag = True
-    with open(forg, 'r') as f0:
-        lines0 = f0.readlines()
-        ylo = float(lines0[6].strip().split()[0])
-        yhi = float(lines0[6].strip().split()[1])
-        zlo = float(lines0[7].strip().split()[0])
-        zhi = float(lines0[7].strip().split()[1])
-        yhalf = (ylo + yhi) / 2
-        zhalf = (zlo + zhi) / 2
-        ntotal = int(lines0[2].strip().split()[0])
-        atoms = lines0[15:15 + ntotal]
-        id2coord0 = {int(a.strip().split()[0]): (float(a.strip().split()[3]), float(a.strip().split()[4])) for a in atoms}
-
-    with open(fin, 'r') as f1:
-        lines1 = f1.readlines()
-        ntotal1 = int(lines1[2].strip().split()[0])
-        if ntotal1 != ntotal:
-            raise ValueError("Number of atoms in the two files do not match.")
-
-    with open(fout, 'w') as f2:
-        for i, line in enumerate(lines1):
-            
-            if i < 15:
-                f2.write(line)
-            else:
-                if line.strip() == "":
-                    print(i, "Empty line")
-                    flag = False     # flag = True, this line refers to the position of atom.
-
-                if flag:
-                    print(i)
-                    parts = line.split()
-                    atom_id = int(parts[0])
-                    atom_type = lines1[i + 2 * (ntotal + 3)].strip().split()[1]       
-
-                    if atom_type == '4':         # This atom is in the boundary
-                        y = float(parts[3])
-                        z = float(parts[4])
-
-                        y0 = id2coord0[atom_id][0]
-                        z0 = id2coord0[atom_id][1]
-
-                        dy = y0 - yhalf
-                        dz = z0 - zhalf
-                        r = np.sqrt(dy**2 + dz**2)
-                        theta = math.atan2(dz, dy)
-
-                        term1 = a1 * p2 * cmath.sqrt(np.cos(theta) + a2 * np.sin(theta))
-                        term2 = a2 * p1 * cmath.sqrt(np.cos(theta) + a1 * np.sin(theta))
-                        term3 = a1 * q2 * cmath.sqrt(np.cos(theta) + a2 * np.sin(theta))
-                        term4 = a2 * q1 * cmath.sqrt(np.cos(theta) + a1 * np.sin(theta))
-
-                        Cplx1 = (term1 - term2) / (a1 - a2)
-                        Cplx2 = (term3 - term4) / (a1 - a2)
-                        newy = y + dK * np.sqrt(2*r/math.pi) * Cplx1.real
-                        newz = z + dK * np.sqrt(2*r/math.pi) * Cplx2.real
-
-                        parts[3] = str(newy)
-                        parts[4] = str(newz)
-
-                        new_line = " ".join(parts) + "\n"
-                        f2.write(new_line)
-                    else:
-                        f2.write(line)
-                else:
-                    f2.write(line)
+def build_kernel(forg, coeff):
+    # displacement per unit K of the boundary atoms, from the reference (step 0) configuration
+    data0 = read_data(forg, sections=('Atoms', 'groupID'))
+    yhalf, zhalf = data0['box'][1:].mean(axis=1)
+    atoms0 = data0['Atoms']         # Atoms # atomic: id type x y z ix iy iz
+    group = data0['groupID']
+    bd_ids = group[group[:, 1] == 4, 0]          # atoms in the boundary
+
+    rows0 = match_ids(atoms0[:, 0], bd_ids)
+    uy, uz = k_field_displacement(atoms0[rows0, 3], atoms0[rows0, 4], yhalf, zhalf, coeff)
+    return bd_ids.astype(np.int64), uy, uz
+
+
+def displace_atoms(forg, fin, fout, dK, coeff, kernel_file=None):
+    if kernel_file is None:
+        ids, uy, uz = build_kernel(forg, coeff)
+    else:
+        ids, uy, uz = cached_kernel(kernel_file, forg, coeff, build_kernel)
+
+    atoms1 = read_data(fin, sections=('Atoms',))['Atoms']
+    rows = match_ids(atoms1[:, 0], ids)
+    atoms1[rows, 3] += dK * uy
+    atoms1[rows, 4] += dK * uz
 
+    replace_section(fin, fout, 'Atoms', atoms1,
+                    fmt=['%d', '%d', '%.16g', '%.16g', '%.16g'] + ['%d'] * (atoms1.shape[1] - 5))
 
 
 if __name__ == '__main__':
@@ -135,11 +92,12 @@ if __name__ == '__main__':
         coeff = parse_system_data('properties/apq-Park_MEAM_Mo_2012.spline.txt', idx)
         origin_datafile = f'dump/{idx}/{T}/Mo_{idx}_{T}_0_eq.data'
         old_datafile = f'dump/{idx}/{T}/Mo_{idx}_{T}_{step}_eq.data'
+        kernel_file = f'kernel/Mo_{idx}_{T}.npz'
 
         step += 1
 
         new_datafile = f'dump/{idx}/{T}/Mo_{idx}_{T}_{step}.data'
-        displace_atoms(origin_datafile, old_datafile, new_datafile, dK, coeff)
+        displace_atoms(origin_datafile, old_datafile, new_datafile, dK, coeff, kernel_file)
 
     except FileNotFoundError:
         print(f"Error: Input file not found")
@@ -0,0 +1,97 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : kfield.py
+# Time       ：2026/10/18 10:12
+# Author     ：oWoo
+# Description：Vectorized anisotropic K-field displacement kernel, shared by
+#              displace_dump.py (eam) and displace_data.py (meam-spline).
+"""
+import hashlib
+import os
+
+import numpy as np
+
+
+def k_field_displacement(y0, z0, yhalf, zhalf, coeff):
+    """
+    Displacement per unit K of atoms at reference positions (y0, z0),
+    crack tip at (yhalf, zhalf).
+    coeff: (a1, a2, p1, p2, q1, q2), p/q in 1/MPa.
+    Returns (uy, uz) arrays; multiply by K in MPa*Å^1/2.
+    """
+    a1, a2, p1, p2, q1, q2 = coeff
+
+    dy = np.asarray(y0, dtype=float) - yhalf
+    dz = np.asarray(z0, dtype=float) - zhalf
+    r = np.sqrt(dy**2 + dz**2)
+    theta = np.arctan2(dz, dy)
+    cos = np.cos(theta)
+    sin = np.sin(theta)
+
+    sqrt1 = np.sqrt(cos + a1 * sin + 0j)     # principal branch, same as cmath.sqrt
+    sqrt2 = np.sqrt(cos + a2 * sin + 0j)
+
+    Cplx1 = (a1 * p2 * sqrt2 - a2 * p1 * sqrt1) / (a1 - a2)
+    Cplx2 = (a1 * q2 * sqrt2 - a2 * q1 * sqrt1) / (a1 - a2)
+    amp = np.sqrt(2 * r / np.pi)
+    return amp * Cplx1.real, amp * Cplx2.real
+
+
+def match_ids(ids_ref, ids):
+    # row in ids_ref of every entry of ids
+    order = np.argsort(ids_ref, kind='stable')
+    pos = np.searchsorted(ids_ref[order], ids)
+    pos = np.clip(pos, 0, len(order) - 1)
+    rows = order[pos]
+    if np.any(ids_ref[rows] != ids):
+        raise ValueError("Atom ids of the two files do not match.")
+    return rows
+
+
+# ------------ persisted kernel: displacement per unit K of every boundary atom ------------
+def file_digest(filename, chunk=1 << 24):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        while True:
+            block = f.read(chunk)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def kernel_key(forg, coeff):
+    h = hashlib.sha256(file_digest(forg).encode())
+    h.update(repr(tuple(complex(c) for c in coeff)).encode())
+    return h.hexdigest()
+
+
+def save_kernel(kernel_file, key, ids, uy, uz):
+    os.makedirs(os.path.dirname(kernel_file) or '.', exist_ok=True)
+    tmp = kernel_file + '.tmp.npz'
+    np.savez(tmp, key=np.array(key), ids=ids.astype(np.int64), uy=uy, uz=uz)
+    os.replace(tmp, kernel_file)
+
+
+def load_kernel(kernel_file, key):
+    if not os.path.exists(kernel_file):
+        return None
+    with np.load(kernel_file) as f:
+        if str(f['key']) != key:
+            return None
+        return f['ids'], f['uy'], f['uz']
+
+
+def cached_kernel(kernel_file, forg, coeff, build):
+    """
+    Load the kernel of reference file forg from kernel_file, or build it with
+    build(forg, coeff) -> (ids, uy, uz) and store it when missing or stale.
+    """
+    key = kernel_key(forg, coeff)
+    kernel = load_kernel(kernel_file, key)
+    if kernel is None:
+        kernel = build(forg, coeff)
+        save_kernel(kernel_file, key, *kernel)
+    return kernel
@@ -0,0 +1,233 @@
+# !/usr/bin/env python
+# -*-coding:utf-8 -*-
+
+"""
+# File       : lmpio.py
+# Time       ：2026/10/18 19:30
+# Author     ：oWoo
+# Description：Section-aware readers for LAMMPS write_data and write_dump ... custom
+#              files. The file is indexed once (header keywords, section offsets) and
+#              every numeric block is parsed in bulk into an array, optionally
+#              straight from a memory map, instead of readlines() + split() per line.
+#              write_data writes read_data files in bulk from arrays.
+"""
+import io
+import mmap as _mmap
+import re
+from contextlib import contextmanager
+
+import numpy as np
+
+_header_line = re.compile(rb'^[ \t]*[A-Za-z][^\r\n]*', re.M)
+
+
+@contextmanager
+def _open_buffer(filename, mmap=True):
+    # contents of the file, as a read-only memory map closed on leaving the with block
+    with open(filename, 'rb') as f:
+        if not mmap:
+            yield f.read()
+            return
+        with _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ) as buf:
+            yield buf
+
+
+def _next_line(buf, pos):
+    end = buf.find(b'\n', pos)
+    end = len(buf) if end < 0 else end
+    return buf[pos:end].decode(), end + 1
+
+
+def parse_block(body, dtype=float):
+    # whitespace separated numeric block -> (nrows, ncols) array
+    first = body.lstrip().split(b'\n', 1)[0]
+    ncols = len(first.split(b'#', 1)[0].split())
+    if ncols == 0:
+        return np.zeros((0, 0), dtype=dtype)
+    if body.find(b'#') >= 0:
+        body = b'\n'.join(line.split(b'#', 1)[0] for line in body.split(b'\n'))
+    values = np.fromstring(body, sep=' ')
+    return values.reshape(-1, ncols).astype(dtype, copy=False)
+
+
+# ------------ write_dump ... custom ------------
+def index_dump(filename, mmap=True):
+    # byte offsets of every "ITEM: TIMESTEP" in the file (one per frame)
+    with _open_buffer(filename, mmap) as buf:
+        return [m.start() for m in re.finditer(rb'^ITEM: TIMESTEP', buf, re.M)]
+
+
+def read_dump_header(filename, frame=0, mmap=True):
+    return _read_dump(filename, frame, mmap, atoms=False)
+
+
+def read_dump(filename, frame=0, mmap=True):
+    """
+    One frame of a custom dump.
+    Returns dict(timestep, natoms, boundary, box (3,2), tilt, columns, atoms (natoms, ncols)).
+    """
+    return _read_dump(filename, frame, mmap, atoms=True)
+
+
+def _read_dump(filename, frame, mmap, atoms):
+    with _open_buffer(filename, mmap) as buf:
+        return _parse_dump(filename, buf, frame, atoms)
+
+
+def _parse_dump(filename, buf, frame, atoms):
+    starts = [m.start() for m in re.finditer(rb'^ITEM: TIMESTEP', buf, re.M)] if frame else [0]
+    pos = starts[frame]
+
+    _, pos = _next_line(buf, pos)
+    line, pos = _next_line(buf, pos)
+    timestep = int(line.split()[0])
+    _, pos = _next_line(buf, pos)
+    line, pos = _next_line(buf, pos)
+    natoms = int(line.split()[0])
+    line, pos = _next_line(buf, pos)
+    words = line.split()[3:]
+    tilt = None
+    box = np.zeros((3, 2))
+    if words and words[0] == 'xy':          # triclinic: xlo_bound xhi_bound xy
+        words = words[3:]
+        tilt = np.zeros(3)
+    for d in range(3):
+        line, pos = _next_line(buf, pos)
+        values = list(map(float, line.split()))
+        box[d] = values[:2]
+        if tilt is not None:
+            tilt[d] = values[2]
+    line, pos = _next_line(buf, pos)
+    columns = line.split()[2:]
+
+    header = {'timestep': timestep, 'natoms': natoms, 'boundary': ' '.join(words),
+              'box': box, 'tilt': tilt, 'columns': columns}
+    if not atoms:
+        return header
+    end = buf.find(b'ITEM:', pos)
+    end = len(buf) if end < 0 else end
+    header['atoms'] = parse_block(buf[pos:end])
+    if header['atoms'].shape[0] != natoms:
+        raise ValueError(f"{filename}: expected {natoms} atoms, found {header['atoms'].shape[0]}")
+    return header
+
+
+def dump_column(dump, *names):
+    # columns of the atom table by name, e.g. dump_column(d, 'x', 'y', 'z')
+    idx = [dump['columns'].index(n) for n in names]
+    return dump['atoms'][:, idx[0]] if len(idx) == 1 else dump['atoms'][:, idx]
+
+
+# ------------ write_data ------------
+_header_keywords = [
+    ('atoms', 'natoms'), ('atom types', 'ntypes'),
+    ('xlo xhi', 'x'), ('ylo yhi', 'y'), ('zlo zhi', 'z'), ('xy xz yz', 'tilt'),
+]
+
+
+def index_data(filename, mmap=True):
+    """
+    Header of a LAMMPS data file and the byte range of every section.
+    Returns (header dict, {section: (style, start, end)}).
+    """
+    with _open_buffer(filename, mmap) as buf:
+        return _index_data(buf)
+
+
+def _index_data(buf):
+    _, pos = _next_line(buf, 0)              # title line
+    matches = [m for m in _header_line.finditer(buf, pos)]
+    # header keywords ("2000 atoms", "0 31.4 xlo xhi") start with numbers; sections with letters
+    first_section = matches[0].start() if matches else len(buf)
+
+    header = {'box': np.zeros((3, 2)), 'tilt': None}
+    for line in buf[pos:first_section].decode().splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        for key, name in _header_keywords:
+            if line.endswith(key):
+                values = line[:-len(key)].split()
+                if name in ('x', 'y', 'z'):
+                    header['box']['xyz'.index(name)] = list(map(float, values))
+                elif name == 'tilt':
+                    header['tilt'] = np.array(list(map(float, values)))
+                else:
+                    header[name] = int(values[0])
+                break
+
+    sections = {}
+    for n, m in enumerate(matches):
+        title = m.group().decode().strip()
+        name, _, style = title.partition('#')
+        end = matches[n + 1].start() if n + 1 < len(matches) else len(buf)
+        sections[name.strip()] = (style.strip(), m.end(), end)
+    return header, sections
+
+
+def read_data(filename, sections=None, mmap=True):
+    """
+    Header and numeric sections of a write_data file.
+    sections: names to parse (default: all). Returns dict(natoms, ntypes, box, tilt,
+    styles {section: style}, <section>: array), e.g. data['Atoms'], data['groupID'].
+    """
+    with _open_buffer(filename, mmap) as buf:
+        header, index = _index_data(buf)
+        data = dict(header)
+        data['styles'] = {name: style for name, (style, _, _) in index.items()}
+        for name, (style, start, end) in index.items():
+            if sections is None or name in sections:
+                data[name] = parse_block(buf[start:end])
+    return data
+
+
+def replace_section(fin, fout, name, block, fmt, mmap=True):
+    # copy data file fin to fout with the body of one section replaced by block
+    rows = io.BytesIO()
+    np.savetxt(rows, block, fmt=fmt)
+    with _open_buffer(fin, mmap) as buf:
+        _, index = _index_data(buf)
+        _, start, end = index[name]
+        # line ends after the last row as in fin, with a blank line before the next section
+        body = buf[start:end]
+        tail = body[len(body.rstrip()):]
+        if end < len(buf) and tail.count(b'\n') < 2:
+            tail = b'\n\n'
+        with open(fout, 'wb') as f:
+            f.write(buf[:start])
+            f.write(b'\n\n')
+            f.write(rows.getvalue().rstrip())
+            f.write(tail or b'\n')
+            f.write(buf[end:])
+
+
+def write_data(filename, box, atoms, masses=None, velocities=None, extra=None, ntypes=None,
+               tilt=None, title='LAMMPS data file via lmpio.py'):
+    """
+    Write a read_data file (atom_style atomic) in bulk.
+    atoms: (N, 5) id type x y z, or (N, 8) with image flags
+    masses: {type: mass}; velocities: (N, 4) id vx vy vz
+    extra: {section: (N, 2) id value}, e.g. {'groupID': ...} for
+           "read_data ... fix groupID NULL groupID"
+    """
+    if ntypes is None:
+        ntypes = int(atoms[:, 1].max())
+    with open(filename, 'w') as f:
+        f.write(f"{title}\n\n")
+        f.write(f"{len(atoms)} atoms\n{ntypes} atom types\n\n")
+        for (lo, hi), d in zip(box, 'xyz'):
+            f.write(f"{lo:.16g} {hi:.16g} {d}lo {d}hi\n")
+        if tilt is not None:
+            f.write(f"{tilt[0]:.16g} {tilt[1]:.16g} {tilt[2]:.16g} xy xz yz\n")
+        if masses:
+            f.write("\nMasses\n\n")
+            for t in sorted(masses):
+                f.write(f"{int(t)} {masses[t]:.16g}\n")
+        f.write("\nAtoms # atomic\n\n")
+        np.savetxt(f, atoms, fmt=['%d', '%d'] + ['%.16g'] * 3 + ['%d'] * (atoms.shape[1] - 5))
+        if velocities is not None:
+            f.write("\nVelocities\n\n")
+            np.savetxt(f, velocities, fmt=['%d'] + ['%.16g'] * 3)
+        for name, block in (extra or {}).items():
+            f.write(f"\n{name}\n\n")
+            np.savetxt(f, block, fmt=['%d'] + ['%.16g'] * (block.shape[1] - 1))
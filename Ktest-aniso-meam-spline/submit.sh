@@ -13,7 +13,6 @@ module purge
 source /work/home/jyzhang/apprepo/lammps/stable.29Aug2024-intelmpi2021/scripts/env.sh
 export UCX_IB_ADDR_TYPE=ib_global
 export I_MPI_PMI_LIBRARY=/opt/gridview/slurm/lib/libpmi.so
-export PATH=$PATH:/work/home/jyzhang/bin/atomsk
 
 delta_K=0.05
 K_0=1.0
@@ -88,7 +87,7 @@ fi
 echo "Start to apply K incrementally..." >> $outlog
 
 while [[ $now_step -lt $max_iter1 ]]; do
-    python displace_dump.py ${index} ${Temp} ${dK1} ${now_step}
+    python displace_data.py ${index} ${Temp} ${dK1} ${now_step}
     status=$?
 
     ((now_step++))
@@ -97,8 +96,7 @@ while [[ $now_step -lt $max_iter1 ]]; do
     echo "===============================" >> $outlog
     echo "now_step: $now_step" >> $outlog
     echo "now_K: $now_K" >> $outlog
-    datafile="dump/${index}/${Temp}/Mo_${index}_${Temp}_${now_step}.data"
-#     lmpfile="dump/${index}/${Temp}/Mo_${index}_${Temp}_${now_step}.lmp"
+    datafile="dump/${index}/${Temp}/Mo_${index}_${Temp}_${now_step}.data"    # read_data file with the groupID section, written by displace_data.py
 
     if [[ $status -ne 0 ]]; then
     	echo "Displace atoms failed!!!" >> $outlog
@@ -106,14 +104,6 @@ while [[ $now_step -lt $max_iter1 ]]; do
     	exit 3
     else
         echo "Displace atoms finished." >> $outlog
-#         atomsk $datafile $lmpfile
-#         if [[ $? -eq 0 ]]; then
-#             rm $datafile
-#         else
-#             echo "Convert data format failed!!!" >> $outlog
-#             echo >> $outlog
-#             exit 6
-#         fi
     fi
     
     timeout -k 10s ${time_limits}s srun --mpi=pmix_v3 lmp_mpi -var T ${Temp} -var idx ${index} -var now_step ${now_step}  -in in.crack1-aniso-rlx
@@ -127,7 +117,7 @@ while [[ $now_step -lt $max_iter1 ]]; do
 	    echo >> $outlog
 	    exit 4
     else
-        rm $lmpfile
+        rm $datafile
         echo "Relaxation finished." >> $outlog
 	    echo >> $outlog
     fi
@@ -137,6 +127,7 @@ done
 if [[ $flag -eq 1 ]]; then
     while [[ $now_step -lt $max_iter2 ]]; do
         python displace_data.py ${index} ${Temp} ${dK2} ${now_step}
+        status=$?
 
         ((now_step++))
         now_K=$(echo "$now_K + $dK2" | bc)
@@ -145,8 +136,7 @@ if [[ $flag -eq 1 ]]; then
         echo "now_step: $now_step" >> $outlog
         echo "now_K: $now_K" >> $outlog
 
-        datafile="dump/${index}/${Temp}/Mo_${index}_${Temp}_${now_step}.data"
-#         lmpfile="dump/${index}/${Temp}/Mo_${index}_${Temp}_${now_step}.lmp"
+        datafile="dump/${index}/${Temp}/Mo_${index}_${Temp}_${now_step}.data"    # read_data file with the groupID section, written by displace_data.py
 
         if [[ $status -ne 0 ]]; then
             echo "Displace atoms failed!!!" >> $outlog
@@ -154,15 +144,6 @@ if [[ $flag -eq 1 ]]; then
             exit 3
         else
             echo "Displace atoms finished." >> $outlog
-#             atomsk $datafile $lmpfile
-#             if [[ $? -eq 0 ]]; then
-#                 rm $datafile
-#                 echo "Convert data format finished." >> $outlog
-#             else
-#                 echo "Convert data format failed!!!" >> $outlog
-#                 echo >> $outlog
-#                 exit 6
-#             fi
         fi
     
     	timeout -k 10s ${time_limits}s srun --mpi=pmix_v3 lmp_mpi -var T ${Temp} -var idx ${index} -var now_step ${now_step}  -in in.crack1-aniso-rlx
@@ -177,7 +158,7 @@ if [[ $flag -eq 1 ]]; then
 	        echo >> $outlog
 	        exit 4
     	else
-            rm $lmpfile
+            rm $datafile
             echo "Relaxation finished." >> $outlog
 	        echo >> $outlog
     	fi